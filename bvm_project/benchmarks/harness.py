@@ -0,0 +1,98 @@
+# benchmarks/harness.py
+import contextlib
+import io
+import sys
+import time
+
+from bvm.vm import BVM
+from bvm.parallel import ShardState
+from bvm.tracer import Tracer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# VM configurations each benchmark runs under: (name, BVM keyword arguments)
+MODES = (
+    ('interpreter', {'jit_threshold': None}),
+    ('jit', {'jit_threshold': 0}),
+)
+
+GAS_LIMIT = 10**9
+
+
+class CountingTracer(Tracer):
+    """Counts executed instructions"""
+
+    def __init__(self):
+        self.steps = 0
+
+    def step(self, vm, pc, opcode, gas_cost):
+        self.steps += 1
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, or None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def quiet(function, *args):
+    """Call function with its stdout discarded (the compilers print)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+def best_time(function, min_time, repeat):
+    """Calls per round and best seconds per call over `repeat` rounds.
+
+    Like timeit's autorange, the number of calls per round doubles until
+    a round takes at least min_time seconds.
+    """
+    runs = 1
+    while True:
+        elapsed = _time_calls(function, runs)
+        if elapsed >= min_time:
+            break
+        runs *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, _time_calls(function, runs))
+    return runs, best / runs
+
+
+def _time_calls(function, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return time.perf_counter() - start
+
+
+def measure_code(code, min_time, repeat, vm_options, address='bench'):
+    """Time executions of code in a fresh VM.
+
+    Instructions and gas per run come from one traced run first; the
+    timed runs are untraced. A JIT mode is warmed up before timing.
+    """
+    tracer = CountingTracer()
+    result = BVM(ShardState(), tracer=tracer).execute(code, GAS_LIMIT, address)
+    if not result['success']:
+        raise RuntimeError(f"benchmark code failed: {result['error']}")
+    instructions = tracer.steps
+    gas = GAS_LIMIT - result['gas_remaining']
+
+    vm = BVM(ShardState(), **vm_options)
+    vm.execute(code, GAS_LIMIT, address)
+    runs, seconds = best_time(lambda: vm.execute(code, GAS_LIMIT, address), min_time, repeat)
+    return {
+        'runs': runs,
+        'instructions': instructions,
+        'gas': gas,
+        'seconds_per_run': seconds,
+        'instructions_per_sec': instructions / seconds,
+        'gas_per_sec': gas / seconds,
+    }
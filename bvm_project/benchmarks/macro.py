@@ -0,0 +1,73 @@
+# benchmarks/macro.py
+import os
+
+from compilers.compiler import Compiler
+from compilers.c_compiler import CCompiler
+from compilers.CPPCompiler import CPPCompiler
+from compilers.java_compiler import JavaCompiler
+from compilers.JSCompiler import JSCompiler
+
+from .harness import MODES, best_time, measure_code, quiet
+
+CONTRACTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'contracts')
+
+# Sample contracts shipped in contracts/, with the compiler for each
+SAMPLES = (
+    ('math1.py', Compiler),
+    ('math.c', CCompiler),
+    ('math.cpp', CPPCompiler),
+    ('math_contract.java', JavaCompiler),
+    ('ifelse.java', JavaCompiler),
+    ('jscon.js', JSCompiler),
+)
+
+# The samples are straight-line code, so the same summing loop is also
+# run in each language at LOOP_SIZES iterations. Bounds are PUSH1
+# literals, hence at most 255.
+LOOP_SIZES = (10, 100, 250)
+
+LOOPS = (
+    ('loop.py', Compiler,
+     "s = 0\ni = 0\nwhile i < {n}:\n    s = s + i\n    i = i + 1\n"),
+    ('loop.c', CCompiler,
+     "void main() {{\n    int s = 0;\n    for (int i = 0; i < {n}; i++) {{\n"
+     "        s = s + i;\n    }}\n}}\n"),
+    ('loop.cpp', CPPCompiler,
+     "void main() {{\n    int s = 0;\n    for (int i = 0; i < {n}; i++) {{\n"
+     "        s = s + i;\n    }}\n}}\n"),
+    ('loop.java', JavaCompiler,
+     "public class Loop {{\n    public static void main() {{\n        int s = 0;\n"
+     "        for (int i = 0; i < {n}; i++) {{\n            s = s + i;\n        }}\n    }}\n}}\n"),
+    ('loop.js', JSCompiler,
+     "let s = 0;\nfor (let i = 0; i < {n}; i++) {{\n    s = s + i;\n}}\n"),
+)
+
+
+def sources(loop_sizes=LOOP_SIZES):
+    """(name, compiler, source) for every macro-benchmark"""
+    for filename, compiler in SAMPLES:
+        with open(os.path.join(CONTRACTS_DIR, filename)) as f:
+            yield filename, compiler, f.read()
+    for filename, compiler, template in LOOPS:
+        for n in loop_sizes:
+            yield f"{filename}@{n}", compiler, template.format(n=n)
+
+
+def compile_ms(compiler, source, min_time, repeat):
+    """Best compile time in milliseconds, and the bytecode"""
+    bytecode, storage_map = quiet(compiler.compile, source)
+    runs, seconds = best_time(lambda: quiet(compiler.compile, source), min_time, repeat)
+    return seconds * 1e3, bytecode
+
+
+def run(min_time=0.02, repeat=3, loop_sizes=LOOP_SIZES, modes=MODES):
+    """Compile and run every contract; returns {'<mode>/<name>': measurement}"""
+    results = {}
+    for name, compiler, source in sources(loop_sizes):
+        milliseconds, bytecode = compile_ms(compiler, source, min_time, repeat)
+        for mode, options in modes:
+            stats = measure_code(bytecode, min_time, repeat, options)
+            stats['compile_ms'] = milliseconds
+            stats['bytecode_size'] = len(bytecode)
+            results[f"{mode}/{name}"] = stats
+    return results
@@ -0,0 +1,107 @@
+# benchmarks/micro.py
+from bvm.opcodes import Opcode, OPCODE_NAMES, STACK_EFFECTS
+
+from .harness import MODES, measure_code
+
+# Loop iterations per run; the counter is pushed with PUSH1
+ITERATIONS = 200
+
+# Items pushed below the loop counter so DUP16/SWAP16 have operands
+PADDING = 16
+
+BINARY = (
+    Opcode.ADD, Opcode.SUB, Opcode.MUL, Opcode.DIV, Opcode.MOD,
+    Opcode.SDIV, Opcode.SMOD, Opcode.LT, Opcode.GT, Opcode.EQ,
+    Opcode.LTE, Opcode.GTE, Opcode.SLT, Opcode.SGT,
+)
+
+
+def assemble(parts):
+    """Bytes from a list of ints, label names and ('@', label) references"""
+    labels = {}
+    pc = 0
+    for part in parts:
+        if isinstance(part, str):
+            labels[part] = pc
+        else:
+            pc += 1
+    return bytes(
+        labels[part[1]] if isinstance(part, tuple) else part
+        for part in parts if not isinstance(part, str)
+    )
+
+
+def body(opcode):
+    """Stack-neutral loop body exercising opcode, or None if it has none"""
+    if opcode in BINARY:
+        return [Opcode.PUSH1, 7, Opcode.PUSH1, 3, opcode, Opcode.POP]
+    if Opcode.DUP1 <= opcode <= Opcode.DUP16:
+        return [opcode, Opcode.POP]
+    if Opcode.SWAP1 <= opcode <= Opcode.SWAP16:
+        return [opcode, opcode]
+    return {
+        Opcode.ISZERO: [Opcode.PUSH1, 1, Opcode.ISZERO, Opcode.POP],
+        Opcode.PUSH1: [Opcode.PUSH1, 1, Opcode.POP],
+        Opcode.POP: [Opcode.PUSH1, 1, Opcode.POP],
+        Opcode.SLOAD: [Opcode.PUSH1, 1, Opcode.SLOAD, Opcode.POP],
+        Opcode.SSTORE: [Opcode.PUSH1, 5, Opcode.PUSH1, 1, Opcode.SSTORE],
+        Opcode.MLOAD: [Opcode.PUSH1, 0, Opcode.MLOAD, Opcode.POP],
+        Opcode.MSTORE: [Opcode.PUSH1, 5, Opcode.PUSH1, 0, Opcode.MSTORE],
+        Opcode.MSIZE: [Opcode.MSIZE, Opcode.POP],
+        Opcode.JUMPDEST: [Opcode.JUMPDEST],
+        Opcode.JUMP: [Opcode.PUSH1, ('@', 'skip'), Opcode.JUMP, 'skip', Opcode.JUMPDEST],
+        Opcode.JUMPI: [Opcode.PUSH1, 1, Opcode.PUSH1, ('@', 'skip'), Opcode.JUMPI,
+                       'skip', Opcode.JUMPDEST],
+        Opcode.SLOADI: [Opcode.SLOADI, 1, Opcode.POP],
+        Opcode.SSTOREI: [Opcode.PUSH1, 5, Opcode.SSTOREI, 1],
+        Opcode.PUSHPUSHADD: [Opcode.PUSHPUSHADD, 2, 3, Opcode.POP],
+        Opcode.ISZEROJUMPI: [Opcode.PUSH1, 0, Opcode.ISZEROJUMPI, ('@', 'skip'),
+                             'skip', Opcode.JUMPDEST],
+    }.get(opcode)
+
+
+def loop_program(parts, iterations=ITERATIONS):
+    """Run parts `iterations` times in a loop counting down on the stack"""
+    return assemble(
+        [Opcode.PUSH1, 0] * PADDING + [Opcode.PUSH1, iterations, 'loop', Opcode.JUMPDEST]
+        + parts
+        + [Opcode.PUSH1, 1, Opcode.SUB,
+           Opcode.DUP1, Opcode.PUSH1, ('@', 'loop'), Opcode.JUMPI,
+           Opcode.STOP]
+    )
+
+
+def programs(iterations=ITERATIONS):
+    """(name, code) for every opcode with a benchmark body.
+
+    'loop' is the empty loop the others are measured against; STOP ends
+    every run, so its benchmark is a program holding only STOP and
+    measures the fixed cost of one execute() call.
+    """
+    yield 'loop', loop_program([], iterations)
+    yield 'STOP', bytes([Opcode.STOP])
+    for opcode in sorted(STACK_EFFECTS):
+        parts = body(opcode)
+        if parts is not None:
+            yield OPCODE_NAMES.get(opcode, hex(opcode)), loop_program(parts, iterations)
+
+
+def run(min_time=0.02, repeat=3, iterations=ITERATIONS, modes=MODES):
+    """Benchmark every opcode; returns {'<mode>/<name>': measurement}.
+
+    Loop measurements also get ns_per_iteration and net_ns, the time an
+    iteration takes beyond one of the empty loop.
+    """
+    results = {}
+    for mode, options in modes:
+        baseline = None
+        for name, code in programs(iterations):
+            stats = measure_code(code, min_time, repeat, options)
+            if name != 'STOP':
+                per_iteration = stats['seconds_per_run'] * 1e9 / iterations
+                if baseline is None:
+                    baseline = per_iteration
+                stats['ns_per_iteration'] = per_iteration
+                stats['net_ns'] = per_iteration - baseline
+            results[f"{mode}/{name}"] = stats
+    return results
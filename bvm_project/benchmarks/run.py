@@ -0,0 +1,136 @@
+# benchmarks/run.py
+"""Run the BVM benchmark suites and compare them with a stored baseline.
+
+    python -m benchmarks.run --update           # run and store baseline.json
+    python -m benchmarks.run                    # run, compare with baseline.json
+    python -m benchmarks.run --suite micro --quick --output results.json
+
+Only deterministic metrics gate a run: it exits with status 1 when any
+benchmark executes a different number of instructions or amount of gas
+than the baseline. Timings, compile times and peak RSS depend on the
+machine and its load, so changes beyond --tolerance in them are only
+reported, and only against a baseline recorded in the same (--quick or
+full) mode. The baseline is machine-specific and not committed; the run
+exits with status 2 when there is none and --update was not given.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+
+from . import macro, micro
+from .harness import peak_rss_kb
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Metrics reported when they move beyond the tolerance: (name, True if
+# higher is better)
+ADVISORY = (
+    ('instructions_per_sec', True),
+    ('gas_per_sec', True),
+    ('compile_ms', False),
+)
+
+# Metrics that must match the baseline exactly; they fail the run
+EXACT = ('instructions', 'gas')
+
+
+def run_suites(suites, quick=False):
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'quick': quick,
+    }
+    if 'micro' in suites:
+        report['micro'] = micro.run(min_time=0.005, repeat=1) if quick else micro.run()
+    if 'macro' in suites:
+        report['macro'] = macro.run(min_time=0.005, repeat=1) if quick else macro.run()
+    report['peak_rss_kb'] = peak_rss_kb()
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """(regressions, notes) of report against baseline.
+
+    Regressions are changed instruction counts or gas. Notes are timing,
+    compile time and memory changes beyond tolerance, left out when the
+    two runs used different modes.
+    """
+    problems = []
+    notes = []
+    timed = report.get('quick') == baseline.get('quick')
+    for suite in ('micro', 'macro'):
+        current = report.get(suite, {})
+        for name, old in baseline.get(suite, {}).items():
+            new = current.get(name)
+            if new is None:
+                continue
+            for metric in EXACT:
+                if metric in old and new.get(metric) != old[metric]:
+                    problems.append(f"{suite}/{name}: {metric} changed {old[metric]} -> {new.get(metric)}")
+            if not timed:
+                continue
+            for metric, higher_is_better in ADVISORY:
+                if metric not in old or metric not in new or not old[metric]:
+                    continue
+                change = (new[metric] - old[metric]) / old[metric]
+                if (-change if higher_is_better else change) > tolerance:
+                    notes.append(
+                        f"{suite}/{name}: {metric} {old[metric]:.4g} -> {new[metric]:.4g} ({change:+.1%})"
+                    )
+    old_rss, new_rss = baseline.get('peak_rss_kb'), report.get('peak_rss_kb')
+    if timed and old_rss and new_rss and (new_rss - old_rss) / old_rss > tolerance:
+        notes.append(f"peak_rss_kb {old_rss} -> {new_rss}")
+    return problems, notes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='BVM benchmarks')
+    parser.add_argument('--suite', choices=['micro', 'macro', 'all'], default='all')
+    parser.add_argument('--quick', action='store_true', help='Fewer runs, for a smoke test')
+    parser.add_argument('--output', help='Write the results as JSON to this file (default: stdout)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline results to compare with')
+    parser.add_argument('--update', '--save-baseline', dest='update', action='store_true',
+                        help='Store the results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Slowdown, as a fraction of the baseline, beyond which timings are reported '
+                             '(default 0.25)')
+    args = parser.parse_args(argv)
+    if not args.update and not os.path.exists(args.baseline):
+        parser.error(f"no baseline at {args.baseline}; run with --update to create one")
+
+    suites = ('micro', 'macro') if args.suite == 'all' else (args.suite,)
+    report = run_suites(suites, args.quick)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.update:
+        with open(args.baseline, 'w') as f:
+            f.write(text + '\n')
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    problems, notes = compare(report, baseline, args.tolerance)
+    if report.get('quick') != baseline.get('quick'):
+        print(f"Baseline {args.baseline} was recorded in the other (--quick or full) mode; "
+              f"timings not compared", file=sys.stderr)
+    for note in notes:
+        print(f"SLOWER {note}", file=sys.stderr)
+    for problem in problems:
+        print(f"REGRESSION {problem}", file=sys.stderr)
+    if problems:
+        print(f"{len(problems)} regression(s) against {args.baseline}", file=sys.stderr)
+        return 1
+    print(f"No regressions against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
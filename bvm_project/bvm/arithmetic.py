@@ -0,0 +1,33 @@
+# bvm/arithmetic.py
+from .memory import WORD_MASK
+
+SIGN_BIT = 1 << 255
+
+
+def to_signed(value):
+    """Read a 256-bit word as a two's-complement signed integer"""
+    return value - (1 << 256) if value & SIGN_BIT else value
+
+
+def sdiv(b, a):
+    """Signed division of b by a, truncated towards zero; x / 0 is 0"""
+    if a == 0:
+        return 0
+    quotient = abs(b) // abs(a)
+    return -quotient if (b < 0) != (a < 0) else quotient
+
+
+def smod(b, a):
+    """Signed remainder of b by a, taking the sign of b; x % 0 is 0"""
+    if a == 0:
+        return 0
+    remainder = abs(b) % abs(a)
+    return -remainder if b < 0 else remainder
+
+
+def u256_sdiv(b, a):
+    return sdiv(to_signed(b), to_signed(a)) & WORD_MASK
+
+
+def u256_smod(b, a):
+    return smod(to_signed(b), to_signed(a)) & WORD_MASK
@@ -0,0 +1,250 @@
+# bvm/binary_trace.py
+from abc import ABC, abstractmethod
+
+from .opcodes import Opcode, STACK_EFFECTS
+from .tracer import Tracer
+
+MAGIC = b'BVMT'
+VERSION = 1
+
+# Record tags. A step record's tag also carries the STEP_* flags saying
+# which optional fields follow it.
+RUN = 0x01
+FAULT = 0x02
+END = 0x03
+STEP = 0x10
+STEP_TOP = 0x01    # value left on top of the stack
+STEP_READ = 0x02   # storage slot read (its value is the top)
+STEP_WRITE = 0x04  # storage slot and value written
+
+READS = (Opcode.SLOAD, Opcode.SLOADI)
+WRITES = (Opcode.SSTORE, Opcode.SSTOREI)
+
+
+def write_varint(out, value):
+    """Append an unsigned LEB128 varint to a bytearray"""
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def write_signed(out, value):
+    """Append a zigzag-encoded varint; values may be any size"""
+    write_varint(out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+
+
+def write_text(out, text):
+    data = text.encode('utf-8')
+    write_varint(out, len(data))
+    out += data
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def byte(self):
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def varint(self):
+        value = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def signed(self):
+        value = self.varint()
+        return -((value + 1) >> 1) if value & 1 else value >> 1
+
+    def raw(self):
+        size = self.varint()
+        value = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return value
+
+    def text(self):
+        return self.raw().decode('utf-8')
+
+
+class StepRecorder(Tracer, ABC):
+    """Turns execution into trace records, one call to record() each.
+
+    Records are tuples:
+      ('run', address, gas_limit, arithmetic, code)
+      ('step', pc, opcode, gas, stack_delta, top, read, write)
+      ('fault', pc, opcode, gas_remaining, stack_depth, error)
+      ('end', gas_remaining, stack_depth)
+    A step's gas is what it consumed, memory expansion included; top is
+    the value it left on the stack, read the (slot, value) it loaded and
+    write the (slot, value) it stored, each None when not applicable.
+    """
+
+    def __init__(self):
+        self.pending = None  # (pc, opcode, gas before, sp before, slot, written)
+
+    @abstractmethod
+    def record(self, record):
+        """Handle one record"""
+
+    def start(self, vm):
+        self.pending = None
+        self.record(('run', str(vm.contract_address), vm.gas_remaining,
+                     vm.arithmetic, bytes(vm.code)))
+
+    def step(self, vm, pc, opcode, gas_cost):
+        if self.pending is not None:
+            self._settle(vm)
+        sp = vm.sp
+        stack = vm.stack_buffer
+        slot = written = None
+        if opcode == Opcode.SLOAD and sp:
+            slot = stack[sp - 1]
+        elif opcode == Opcode.SSTORE and sp >= 2:
+            slot, written = stack[sp - 1], stack[sp - 2]
+        elif opcode in (Opcode.SLOADI, Opcode.SSTOREI) and pc + 1 < len(vm.code):
+            slot = vm.code[pc + 1]
+            if opcode == Opcode.SSTOREI and sp:
+                written = stack[sp - 1]
+        self.pending = (pc, opcode, vm.gas_remaining, sp, slot, written)
+
+    def _settle(self, vm):
+        pc, opcode, gas_before, sp_before, slot, written = self.pending
+        self.pending = None
+        sp = vm.sp
+        effect = STACK_EFFECTS.get(opcode)
+        top = vm.stack_buffer[sp - 1] if effect and effect[1] and sp else None
+        read = (slot, top) if opcode in READS and slot is not None else None
+        write = (slot, written) if opcode in WRITES and written is not None else None
+        self.record(('step', pc, opcode, gas_before - vm.gas_remaining,
+                     sp - sp_before, top, read, write))
+
+    def fault(self, vm, error):
+        # The last stepped instruction is the one that faulted
+        pc, opcode = (self.pending[0], self.pending[1]) if self.pending else (vm.pc, 0)
+        self.pending = None
+        self.record(('fault', pc, opcode, vm.gas_remaining, vm.sp, str(error)))
+
+    def finish(self, vm):
+        if self.pending is not None:
+            self._settle(vm)
+        self.record(('end', vm.gas_remaining, vm.sp))
+
+
+def encode_record(out, record):
+    """Append one record's binary form to a bytearray"""
+    kind = record[0]
+    if kind == 'step':
+        pc, opcode, gas, delta, top, read, write = record[1:]
+        flags = ((STEP_TOP if top is not None else 0)
+                 | (STEP_READ if read is not None else 0)
+                 | (STEP_WRITE if write is not None else 0))
+        out.append(STEP | flags)
+        write_varint(out, pc)
+        out.append(opcode)
+        write_varint(out, gas)
+        write_signed(out, delta)
+        if top is not None:
+            write_signed(out, top)
+        if read is not None:
+            write_signed(out, read[0])
+        if write is not None:
+            write_signed(out, write[0])
+            write_signed(out, write[1])
+    elif kind == 'run':
+        address, gas_limit, arithmetic, code = record[1:]
+        out.append(RUN)
+        write_text(out, address)
+        write_varint(out, gas_limit)
+        write_text(out, arithmetic)
+        write_varint(out, len(code))
+        out += code
+    elif kind == 'fault':
+        pc, opcode, gas_remaining, depth, error = record[1:]
+        out.append(FAULT)
+        write_varint(out, pc)
+        out.append(opcode)
+        write_varint(out, gas_remaining)
+        write_varint(out, depth)
+        write_text(out, error)
+    elif kind == 'end':
+        out.append(END)
+        write_varint(out, record[1])
+        write_varint(out, record[2])
+    else:
+        raise ValueError(f"Unknown trace record: {kind}")
+
+
+def decode_records(data):
+    """Yield the records of a binary trace held in bytes"""
+    if data[:len(MAGIC)] != MAGIC or len(data) <= len(MAGIC):
+        raise ValueError("Not a BVM binary trace")
+    if data[len(MAGIC)] != VERSION:
+        raise ValueError(f"Unsupported trace version: {data[len(MAGIC)]}")
+    reader = _Reader(data)
+    reader.pos = len(MAGIC) + 1
+    while reader.pos < len(data):
+        tag = reader.byte()
+        if tag & STEP:
+            pc = reader.varint()
+            opcode = reader.byte()
+            gas = reader.varint()
+            delta = reader.signed()
+            top = reader.signed() if tag & STEP_TOP else None
+            read = (reader.signed(), top) if tag & STEP_READ else None
+            write = (reader.signed(), reader.signed()) if tag & STEP_WRITE else None
+            yield ('step', pc, opcode, gas, delta, top, read, write)
+        elif tag == RUN:
+            address = reader.text()
+            gas_limit = reader.varint()
+            arithmetic = reader.text()
+            yield ('run', address, gas_limit, arithmetic, bytes(reader.raw()))
+        elif tag == FAULT:
+            yield ('fault', reader.varint(), reader.byte(), reader.varint(),
+                   reader.varint(), reader.text())
+        elif tag == END:
+            yield ('end', reader.varint(), reader.varint())
+        else:
+            raise ValueError(f"Bad trace record tag {tag:#x} at offset {reader.pos - 1}")
+
+
+def read_trace(path):
+    """Records of a binary trace file"""
+    with open(path, 'rb') as f:
+        return list(decode_records(f.read()))
+
+
+class BinaryTracer(StepRecorder):
+    """Compact binary trace, varint-encoded (see encode_record).
+
+    A few bytes per step against about sixty for JsonTracer. Every run of
+    the VM it is installed in is appended to the same file; bvm/replay.py
+    re-executes a trace and checks it step by step.
+    """
+
+    def __init__(self, path, buffer_size=1 << 16):
+        super().__init__()
+        self.file = open(path, 'wb')
+        self.buffer = bytearray(MAGIC)
+        self.buffer.append(VERSION)
+        self.buffer_size = buffer_size
+
+    def record(self, record):
+        encode_record(self.buffer, record)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
@@ -0,0 +1,148 @@
+# bvm/decoder.py
+import hashlib
+from collections import OrderedDict
+
+from .opcodes import Opcode, OPCODE_IMMEDIATES
+from .verifier import verify_stack
+
+# Instructions that end a basic block; a JUMPDEST starts a new one. MLOAD
+# and MSTORE end blocks too so their dynamic expansion gas is charged with
+# nothing after them prepaid.
+BLOCK_TERMINATORS = frozenset({
+    Opcode.JUMP, Opcode.JUMPI, Opcode.ISZEROJUMPI, Opcode.STOP,
+    Opcode.MLOAD, Opcode.MSTORE,
+})
+
+
+class Program:
+    """Bytecode decoded once into a flat instruction array.
+
+    instructions[pc] is an (opcode, handler, arg, gas, next_pc, ends_block)
+    tuple for every byte offset of the code, so a jump can land on any
+    offset the interpreter would accept. arg is the immediate operand (None
+    when the code ends before it, PUSHPUSHADD's two bytes already summed),
+    or the opcode itself for opcodes without one.
+
+    block_gas[pc] is the static gas of the instructions from pc to the end
+    of its basic block, and block_rest[pc] the part of it after pc.
+    block_size[pc] is the number of those instructions.
+
+    verified is True when bvm/verifier.py has proven the code can never
+    underflow or overflow the stack; its handlers then come from the
+    unchecked dispatch table.
+    """
+    __slots__ = ('code_hash', 'instructions', 'jumpdests', 'block_gas', 'block_rest',
+                 'block_size', 'verified')
+
+    def __init__(self, code_hash, instructions, jumpdests, block_gas, block_rest, block_size,
+                 verified=False):
+        self.code_hash = code_hash
+        self.instructions = instructions
+        self.jumpdests = jumpdests
+        self.block_gas = block_gas
+        self.block_rest = block_rest
+        self.block_size = block_size
+        self.verified = verified
+
+
+def code_hash(code):
+    """SHA-256 digest identifying a piece of bytecode"""
+    return hashlib.sha256(code).digest()
+
+
+def decode(code, dispatch, digest=None, verified=False):
+    """Decode bytecode against a 256-entry (handler, gas) dispatch table"""
+    code = bytes(code)
+    code_len = len(code)
+    jumpdests = frozenset(
+        pc for pc, opcode in enumerate(code) if opcode == Opcode.JUMPDEST
+    )
+    instructions = [None] * code_len
+    block_gas = [0] * code_len
+    block_rest = [0] * code_len
+    block_size = [1] * code_len
+    # Walk backwards so each block's remaining gas is known when needed
+    for pc in range(code_len - 1, -1, -1):
+        opcode = code[pc]
+        handler, gas = dispatch[opcode]
+        next_pc = pc + 1
+        arg = opcode
+        size = OPCODE_IMMEDIATES.get(opcode)
+        if size:
+            if pc + size < code_len:
+                if opcode == Opcode.PUSHPUSHADD:
+                    arg = code[pc + 1] + code[pc + 2]
+                else:
+                    arg = code[pc + 1]
+                next_pc = pc + 1 + size
+            else:
+                arg = None
+                next_pc = code_len
+        ends_block = (opcode in BLOCK_TERMINATORS or next_pc >= code_len
+                      or next_pc in jumpdests)
+        if not ends_block:
+            block_rest[pc] = block_gas[next_pc]
+            block_size[pc] = 1 + block_size[next_pc]
+        block_gas[pc] = gas + block_rest[pc]
+        instructions[pc] = (opcode, handler, arg, gas, next_pc, ends_block)
+    if digest is None:
+        digest = code_hash(code)
+    return Program(digest, tuple(instructions), jumpdests,
+                   tuple(block_gas), tuple(block_rest), tuple(block_size), verified)
+
+
+class ProgramCache:
+    """LRU cache of decoded programs keyed by the SHA-256 of their code.
+
+    Code proven stack-safe with verify() is decoded against the unchecked
+    dispatch table from then on, including after it has been evicted.
+    Caches built over different dispatch tables can share one verified
+    set, so code verified through one is run unchecked by all of them.
+    """
+
+    def __init__(self, dispatch, unchecked_dispatch=None, maxsize=256, verified=None):
+        self.dispatch = dispatch
+        self.unchecked_dispatch = unchecked_dispatch
+        self.maxsize = maxsize
+        self.programs = OrderedDict()
+        # Code hashes that passed verify_stack
+        self.verified = set() if verified is None else verified
+
+    def get(self, code):
+        """Return the decoded program for code, decoding it on a miss"""
+        digest = code_hash(code)
+        program = self.programs.get(digest)
+        verified = digest in self.verified and self.unchecked_dispatch is not None
+        if program is not None and (program.verified or not verified):
+            self.programs.move_to_end(digest)
+            return program
+        if verified:
+            program = decode(code, self.unchecked_dispatch, digest, verified=True)
+        else:
+            program = decode(code, self.dispatch, digest)
+        self._insert(digest, program)
+        return program
+
+    def verify(self, code):
+        """Verify code's stack use; returns True if it runs unchecked"""
+        program = self.get(code)
+        if program.verified:
+            return True
+        if self.unchecked_dispatch is None or not verify_stack(program):
+            return False
+        digest = program.code_hash
+        self.verified.add(digest)
+        self._insert(digest, decode(code, self.unchecked_dispatch, digest, verified=True))
+        return True
+
+    def _insert(self, digest, program):
+        self.programs[digest] = program
+        self.programs.move_to_end(digest)
+        if len(self.programs) > self.maxsize:
+            self.programs.popitem(last=False)
+
+    def clear(self):
+        self.programs.clear()
+
+    def __len__(self):
+        return len(self.programs)
@@ -0,0 +1,80 @@
+# bvm/execution.py
+
+
+class PendingStorage:
+    """Storage overlay holding a paused execution's uncommitted writes.
+
+    Reads fall through to the contract's committed storage; writes stay
+    in `writes` until the execution finishes successfully, so executions
+    interleaved with it never see them.
+    """
+    __slots__ = ('base', 'writes')
+
+    def __init__(self, base):
+        self.base = base
+        self.writes = {}
+
+    def get(self, slot, default=None):
+        writes = self.writes
+        if slot in writes:
+            return writes[slot]
+        return self.base.get(slot, default)
+
+    def __getitem__(self, slot):
+        writes = self.writes
+        if slot in writes:
+            return writes[slot]
+        return self.base[slot]
+
+    def __setitem__(self, slot, value):
+        self.writes[slot] = value
+
+    def changes(self):
+        """The pending writes that change a slot's committed value"""
+        base = self.base
+        return {slot: value for slot, value in self.writes.items()
+                if slot not in base or base[slot] != value}
+
+    def items(self):
+        merged = dict(self.base)
+        merged.update(self.writes)
+        return merged.items()
+
+
+class Execution:
+    """A contract run that can be paused and resumed (see BVM.start).
+
+    Holds everything the VM needs to carry on: pc, operand stack, memory,
+    gas and the pending storage writes, plus the program's JIT-compiled
+    blocks (None when the JIT is off or has not compiled it yet). `result` is None until the run
+    has finished, then the same dict BVM.execute returns.
+    """
+
+    def __init__(self, code, gas_limit, address, program, storage, compiled=None):
+        self.code = code
+        self.gas_limit = gas_limit
+        self.address = address
+        self.program = program
+        self.compiled = compiled
+        self.storage = storage
+        self.steps = 0  # instructions started so far
+        self.result = None
+        # VM registers, saved by BVM.resume between slices
+        self.pc = 0
+        self.stack_buffer = None
+        self.sp = 0
+        self.memory = None
+        self.gas_remaining = gas_limit
+        self.stopped = False
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    @property
+    def gas_used(self):
+        return self.gas_limit - self.gas_remaining
+
+    @property
+    def pending_writes(self):
+        return self.storage.writes
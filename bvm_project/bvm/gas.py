@@ -9,6 +9,8 @@ OPCODE_GAS = {
     Opcode.MUL: 5,
     Opcode.DIV: 5,
     Opcode.MOD: 5,
+    Opcode.SDIV: 5,
+    Opcode.SMOD: 5,
     
     # Comparison operations
     Opcode.LT: 3,
@@ -17,11 +19,20 @@ OPCODE_GAS = {
     Opcode.ISZERO: 3,
     Opcode.LTE: 3,
     Opcode.GTE: 3,
+    Opcode.SLT: 3,
+    Opcode.SGT: 3,
     
     # Stack operations
     Opcode.POP: 2,
     Opcode.PUSH1: 3,
+    **{Opcode.DUP1 + i: 3 for i in range(16)},
+    **{Opcode.SWAP1 + i: 3 for i in range(16)},
     
+    # Memory operations (plus expansion gas, see memory_gas)
+    Opcode.MLOAD: 3,
+    Opcode.MSTORE: 3,
+    Opcode.MSIZE: 2,
+
     # Storage operations
     Opcode.SLOAD: 200,
     Opcode.SSTORE: 5000,
@@ -30,8 +41,23 @@ OPCODE_GAS = {
     Opcode.JUMP: 8,
     Opcode.JUMPI: 10,
     Opcode.JUMPDEST: 1,
+
+    # Superinstructions cost the same as the sequences they replace
+    Opcode.SLOADI: 3 + 200,
+    Opcode.SSTOREI: 3 + 5000,
+    Opcode.PUSHPUSHADD: 3 + 3 + 3,
+    Opcode.ISZEROJUMPI: 3 + 3 + 10,
 }
 
 def get_opcode_gas(opcode: int) -> int:
     """Get gas cost for an opcode"""
     return OPCODE_GAS.get(opcode, 0)
+
+def memory_gas(size: int) -> int:
+    """Total gas for memory of `size` bytes: 3 per word plus words**2 // 512.
+
+    Touching memory beyond its current size costs the difference between
+    memory_gas(new_size) and memory_gas(old_size).
+    """
+    words = (size + 31) // 32
+    return 3 * words + words * words // 512
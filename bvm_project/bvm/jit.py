@@ -0,0 +1,362 @@
+# bvm/jit.py
+from collections import OrderedDict
+import re
+
+from .opcodes import Opcode
+from .exceptions import InvalidJumpError
+from .memory import WORD_MASK
+from .arithmetic import to_signed, sdiv, smod, u256_sdiv, u256_smod
+
+# Binary operations as (a, b) -> expression, where a is the value popped
+# first (top of stack). They mirror the handlers in bvm/vm.py.
+BINARY_OPS = {
+    Opcode.ADD: '{a} + {b}',
+    Opcode.SUB: '{b} - {a}',
+    Opcode.MUL: '{a} * {b}',
+    Opcode.DIV: '0 if {b} == 0 else {b} // {a}',
+    Opcode.MOD: '0 if {b} == 0 else {b} % {a}',
+    Opcode.SDIV: 'sdiv({b}, {a})',
+    Opcode.SMOD: 'smod({b}, {a})',
+    Opcode.LT: '1 if {b} < {a} else 0',
+    Opcode.GT: '1 if {b} > {a} else 0',
+    Opcode.SLT: '1 if {b} < {a} else 0',
+    Opcode.SGT: '1 if {b} > {a} else 0',
+    Opcode.EQ: '1 if {a} == {b} else 0',
+    Opcode.LTE: '1 if {b} <= {a} else 0',
+    Opcode.GTE: '1 if {b} >= {a} else 0',
+}
+
+# The same operations in the 'u256' arithmetic mode
+U256_BINARY_OPS = {
+    **BINARY_OPS,
+    Opcode.ADD: '({a} + {b}) & MASK',
+    Opcode.SUB: '({b} - {a}) & MASK',
+    Opcode.MUL: '({a} * {b}) & MASK',
+    Opcode.DIV: '0 if {a} == 0 else {b} // {a}',
+    Opcode.MOD: '0 if {a} == 0 else {b} % {a}',
+    Opcode.SDIV: 'u256_sdiv({b}, {a})',
+    Opcode.SMOD: 'u256_smod({b}, {a})',
+    Opcode.SLT: '1 if to_signed({b}) < to_signed({a}) else 0',
+    Opcode.SGT: '1 if to_signed({b}) > to_signed({a}) else 0',
+}
+
+# Names the generated code may use besides its arguments
+NAMESPACE = {
+    'InvalidJumpError': InvalidJumpError,
+    'MASK': WORD_MASK,
+    'to_signed': to_signed,
+    'sdiv': sdiv,
+    'smod': smod,
+    'u256_sdiv': u256_sdiv,
+    'u256_smod': u256_smod,
+}
+
+UNARY_OPS = {
+    Opcode.ISZERO: '1 if {a} == 0 else 0',
+}
+
+# The local copy of vm.sp, as opposed to the attribute
+USES_SP = re.compile(r'(?<![.\w])sp\b')
+
+
+class CompiledProgram:
+    """Python code generated for a decoded program.
+
+    blocks[pc] is (run, need, peak, gas) for every block entry the
+    interpreter can reach, or None where execution must stay in the
+    interpreter. run(vm, stack, storage) executes the block on the VM's
+    stack buffer, updates vm.sp and returns the next pc; need and peak
+    are the stack depth the block pops below its entry and the most it
+    grows above it, and gas its static cost.
+    """
+    __slots__ = ('code_hash', 'blocks', 'source')
+
+    def __init__(self, code_hash, blocks, source):
+        self.code_hash = code_hash
+        self.blocks = blocks
+        self.source = source
+
+
+class _BlockCompiler:
+    """Generate one block function with the stack held in local variables"""
+
+    def __init__(self, program, entry, binary_ops=BINARY_OPS):
+        self.program = program
+        self.entry = entry
+        self.binary_ops = binary_ops
+        self.lines = []
+        self.values = []    # values above the real stack, top last
+        self.base = 0       # real stack pointer relative to the block entry
+        self.synced = 0     # base as last stored to vm.sp
+        self.height = 0     # stack height relative to the block entry
+        self.need = 0       # deepest the block reaches below its entry
+        self.peak = 0       # highest the interpreter would take the stack
+        self.counter = 0
+
+    def emit(self, line):
+        self.lines.append('    ' + line)
+
+    def new_value(self, expression):
+        name = f"v{self.counter}"
+        self.counter += 1
+        self.emit(f"{name} = {expression}")
+        return name
+
+    @staticmethod
+    def at(offset):
+        """Buffer index `offset` entries from the stack pointer at entry"""
+        if offset == 0:
+            return 'sp'
+        return f"sp + {offset}" if offset > 0 else f"sp - {-offset}"
+
+    def pop(self):
+        self.height -= 1
+        if -self.height > self.need:
+            self.need = -self.height
+        if self.values:
+            return self.values.pop()
+        self.base -= 1
+        return self.new_value(f"s[{self.at(self.base)}]")
+
+    def lift(self, count):
+        """Hold at least the top `count` stack items in locals"""
+        if -(self.height - count) > self.need:
+            self.need = count - self.height
+        lifted = []
+        while len(self.values) + len(lifted) < count:
+            self.base -= 1
+            lifted.append(self.new_value(f"s[{self.at(self.base)}]"))
+        self.values[:0] = reversed(lifted)
+
+    def push(self, value):
+        self.values.append(value)
+        self.height += 1
+        self.reach(0)
+
+    def reach(self, extra):
+        """Record the stack height the interpreter would reach"""
+        if self.height + extra > self.peak:
+            self.peak = self.height + extra
+
+    def fault_site(self, opcode, next_pc):
+        """Leave pc and opcode as the interpreter would if the next call faults"""
+        self.emit(f"vm.pc = {next_pc}")
+        self.emit(f"vm.fault_opcode = {opcode}")
+
+    def flush(self):
+        """Write the values held in locals back to the stack buffer"""
+        values = self.values
+        if len(values) == 1:
+            self.emit(f"s[{self.at(self.base)}] = {values[0]}")
+        elif values:
+            top = self.at(self.base + len(values))
+            self.emit(f"s[{self.at(self.base)}:{top}] = {', '.join(map(str, values))}")
+        self.base += len(values)
+        self.values = []
+        if self.base != self.synced:
+            self.emit(f"vm.sp = {self.at(self.base)}")
+            self.synced = self.base
+
+    def jump(self, dest, opcode, next_pc, name):
+        """Emit a taken jump to dest; the values must already be flushed"""
+        fault = [
+            f"vm.pc = {next_pc}",
+            f"vm.fault_opcode = {opcode}",
+            f"raise InvalidJumpError(f\"Invalid {name} destination: {{{dest}}}\")",
+        ]
+        if isinstance(dest, int):
+            if dest in self.program.jumpdests:
+                return [f"return {dest}"]
+            return fault
+        return [f"if {dest} not in jumpdests:"] + ['    ' + line for line in fault] + [f"return {dest}"]
+
+    def compile(self):
+        """Return the block's source, or None if it must be interpreted"""
+        instructions = self.program.instructions
+        binary_ops = self.binary_ops
+        pc = self.entry
+        while True:
+            opcode, handler, arg, gas, next_pc, ends_block = instructions[pc]
+            if opcode in binary_ops:
+                a = self.pop()
+                b = self.pop()
+                self.push(self.new_value(binary_ops[opcode].format(a=a, b=b)))
+            elif opcode in UNARY_OPS:
+                a = self.pop()
+                self.push(self.new_value(UNARY_OPS[opcode].format(a=a)))
+            elif opcode == Opcode.PUSH1:
+                if arg is None:
+                    return None
+                self.push(arg)
+            elif opcode == Opcode.PUSHPUSHADD:
+                if arg is None:
+                    return None
+                self.reach(2)
+                self.push(arg)
+            elif opcode == Opcode.POP:
+                self.pop()
+            elif Opcode.DUP1 <= opcode <= Opcode.DUP16:
+                n = opcode - Opcode.DUP1 + 1
+                self.lift(n)
+                self.push(self.values[-n])
+            elif Opcode.SWAP1 <= opcode <= Opcode.SWAP16:
+                n = opcode - Opcode.SWAP1 + 1
+                self.lift(n + 1)
+                values = self.values
+                values[-1], values[-n - 1] = values[-n - 1], values[-1]
+            elif opcode == Opcode.SLOAD:
+                key = self.pop()
+                self.push(self.new_value(f"sget({key}, 0)"))
+            elif opcode == Opcode.SSTORE:
+                key = self.pop()
+                value = self.pop()
+                self.emit(f"storage[{key}] = {value}")
+            elif opcode == Opcode.SLOADI:
+                if arg is None:
+                    return None
+                self.push(self.new_value(f"sget({arg}, 0)"))
+            elif opcode == Opcode.SSTOREI:
+                if arg is None:
+                    return None
+                self.reach(1)
+                value = self.pop()
+                self.emit(f"storage[{arg}] = {value}")
+            elif opcode == Opcode.MLOAD:
+                offset = self.pop()
+                self.flush()
+                self.fault_site(opcode, next_pc)
+                self.push(self.new_value(f"vm._mload({offset})"))
+            elif opcode == Opcode.MSTORE:
+                offset = self.pop()
+                value = self.pop()
+                self.flush()
+                self.fault_site(opcode, next_pc)
+                self.emit(f"vm._mstore({offset}, {value})")
+            elif opcode == Opcode.MSIZE:
+                self.push(self.new_value('vm.memory.size'))
+            elif opcode == Opcode.JUMPDEST:
+                pass
+            elif opcode == Opcode.STOP:
+                self.flush()
+                self.emit('vm.stopped = True')
+                self.emit(f"return {next_pc}")
+                return self.lines
+            elif opcode == Opcode.JUMP:
+                dest = self.pop()
+                self.flush()
+                for line in self.jump(dest, opcode, next_pc, 'JUMP'):
+                    self.emit(line)
+                return self.lines
+            elif opcode in (Opcode.JUMPI, Opcode.ISZEROJUMPI):
+                if opcode == Opcode.JUMPI:
+                    dest = self.pop()
+                    test = f"{self.pop()} != 0"
+                else:
+                    if arg is None:
+                        return None
+                    self.reach(1)
+                    dest = arg
+                    test = f"{self.pop()} == 0"
+                self.flush()
+                self.emit(f"if {test}:")
+                for line in self.jump(dest, opcode, next_pc, 'JUMPI'):
+                    self.emit('    ' + line)
+                self.emit(f"return {next_pc}")
+                return self.lines
+            else:
+                # Invalid opcodes are left to the interpreter
+                return None
+            if ends_block:
+                self.flush()
+                self.emit(f"return {next_pc}")
+                return self.lines
+            pc = next_pc
+
+
+def _block_entries(program):
+    """Every pc at which the interpreter can start a block"""
+    instructions = program.instructions
+    code_len = len(instructions)
+    entries = set()
+    pending = [0] + sorted(program.jumpdests)
+    while pending:
+        pc = pending.pop()
+        if pc >= code_len or pc in entries:
+            continue
+        entries.add(pc)
+        while True:
+            opcode, handler, arg, gas, next_pc, ends_block = instructions[pc]
+            if ends_block:
+                pending.append(next_pc)
+                break
+            pc = next_pc
+    return sorted(entries)
+
+
+def compile_program(program, arithmetic='unbounded'):
+    """Translate a decoded program into per-block Python functions"""
+    binary_ops = U256_BINARY_OPS if arithmetic == 'u256' else BINARY_OPS
+    source = []
+    layouts = {}
+    for entry in _block_entries(program):
+        block = _BlockCompiler(program, entry, binary_ops)
+        lines = block.compile()
+        if lines is None:
+            continue
+        name = f"block_{entry}"
+        source.append(f"def {name}(vm, s, storage):")
+        if any(USES_SP.search(line) for line in lines):
+            source.append('    sp = vm.sp')
+        if any('sget(' in line for line in lines):
+            source.append('    sget = storage.get')
+        if any('jumpdests' in line for line in lines):
+            source.append('    jumpdests = vm.jumpdests')
+        source.extend(lines)
+        source.append('')
+        layouts[entry] = (name, block.need, block.peak, program.block_gas[entry])
+
+    source = '\n'.join(source)
+    namespace = dict(NAMESPACE)
+    exec(compile(source, f"<bvm-jit {program.code_hash.hex()[:12]}>", 'exec'), namespace)
+    blocks = [None] * len(program.instructions)
+    for entry, (name, need, peak, gas) in layouts.items():
+        blocks[entry] = (namespace[name], need, peak, gas)
+    return CompiledProgram(program.code_hash, tuple(blocks), source)
+
+
+class JitCache:
+    """Counts interpreted runs per code hash and keeps compiled programs.
+
+    A program is compiled once it has been interpreted `threshold` times;
+    both the run counters and the compiled programs are LRU-bounded.
+    Programs are compiled for the given arithmetic mode (see BVM.ARITHMETIC).
+    """
+
+    def __init__(self, maxsize=128, arithmetic='unbounded'):
+        self.maxsize = maxsize
+        self.arithmetic = arithmetic
+        self.counts = OrderedDict()
+        self.compiled = OrderedDict()
+
+    def get(self, program, threshold):
+        """Return the compiled program if it is hot, counting this run"""
+        digest = program.code_hash
+        compiled = self.compiled.get(digest)
+        if compiled is not None:
+            self.compiled.move_to_end(digest)
+            return compiled
+        runs = self.counts.pop(digest, 0)
+        if runs < threshold:
+            self.counts[digest] = runs + 1
+            if len(self.counts) > self.maxsize:
+                self.counts.popitem(last=False)
+            return None
+        compiled = compile_program(program, self.arithmetic)
+        self.compiled[digest] = compiled
+        if len(self.compiled) > self.maxsize:
+            self.compiled.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        self.counts.clear()
+        self.compiled.clear()
@@ -0,0 +1,94 @@
+# bvm/journal.py
+from collections.abc import MutableMapping
+
+# Journal entry value for a slot that did not exist before the write
+_MISSING = object()
+
+
+class JournaledStorage(MutableMapping):
+    """Storage mapping that records every write so it can be undone.
+
+    Wraps a contract's storage dict without copying it. Each write or
+    delete appends (slot, old value) to the journal before changing the
+    dict, so reverting to a checkpoint costs O(writes since it), not
+    O(storage size). Checkpoints nest: checkpoint() returns a position in
+    the journal, revert(checkpoint) undoes everything written after it
+    and leaves earlier entries for an outer revert. commit() drops the
+    journal once the changes are final.
+
+    Reads go straight to the wrapped dict's get, so SLOAD is as fast as
+    on a plain dict.
+    """
+    __slots__ = ('data', 'journal', 'get')
+
+    def __init__(self, data):
+        self.data = data
+        self.journal = []
+        self.get = data.get
+
+    def __getitem__(self, slot):
+        return self.data[slot]
+
+    def __setitem__(self, slot, value):
+        data = self.data
+        self.journal.append((slot, data.get(slot, _MISSING)))
+        data[slot] = value
+
+    def __delitem__(self, slot):
+        data = self.data
+        self.journal.append((slot, data[slot]))
+        del data[slot]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, slot):
+        return slot in self.data
+
+    def checkpoint(self):
+        """Mark the current state; pass the result to revert()"""
+        return len(self.journal)
+
+    def revert(self, checkpoint=0):
+        """Undo every write made since checkpoint (by default, all of them)"""
+        data = self.data
+        journal = self.journal
+        while len(journal) > checkpoint:
+            slot, old = journal.pop()
+            if old is _MISSING:
+                del data[slot]
+            else:
+                data[slot] = old
+
+    def changes(self, checkpoint=0):
+        """Slots whose value differs from before checkpoint, as (changed, deleted).
+
+        changed maps slot -> current value and deleted lists removed
+        slots; a slot written back to its old value is in neither, so a
+        run that only read storage reports nothing to persist.
+        """
+        originals = {}
+        for slot, old in self.journal[checkpoint:]:
+            if slot not in originals:
+                originals[slot] = old
+        data = self.data
+        changed = {}
+        deleted = []
+        for slot, old in originals.items():
+            value = data.get(slot, _MISSING)
+            if value is _MISSING:
+                if old is not _MISSING:
+                    deleted.append(slot)
+            elif old is _MISSING or old != value:
+                changed[slot] = value
+        return changed, deleted
+
+    def commit(self):
+        """Keep every write so far and forget how to undo them"""
+        self.journal.clear()
+
+    def __repr__(self):
+        return f"JournaledStorage({self.data!r})"
@@ -1,23 +1,68 @@
+WORD_MASK = (1 << 256) - 1
+
 class Memory:
+    """Byte-addressed memory stored as sparse fixed-size pages.
+
+    Pages are allocated the first time they are written; reading an
+    untouched page returns zeros without allocating it. `size` is the
+    word-aligned high-water mark of every access, as reported by MSIZE.
+    """
+    PAGE_SIZE = 4096
+
     def __init__(self):
-        self.memory = bytearray()
-        
+        self.pages = {}  # page index -> memoryview over a bytearray page
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _page(self, index):
+        page = self.pages.get(index)
+        if page is None:
+            page = self.pages[index] = memoryview(bytearray(self.PAGE_SIZE))
+        return page
+
     def extend(self, offset, size):
-        if offset + size > len(self.memory):
-            extension = bytearray(offset + size - len(self.memory))
-            self.memory.extend(extension)
-    
+        """Grow the active size to cover offset..offset+size (no zero-fill)"""
+        if size and offset + size > self.size:
+            self.size = (offset + size + 31) // 32 * 32
+
     def store(self, offset, value, size=32):
         """Store a value in memory"""
         self.extend(offset, size)
-        self.memory[offset:offset+size] = value.to_bytes(size, 'big')
-    
+        data = (value & WORD_MASK).to_bytes(size, 'big')
+        index, start = divmod(offset, self.PAGE_SIZE)
+        if start + size <= self.PAGE_SIZE:
+            self._page(index)[start:start + size] = data
+            return
+        written = 0
+        while written < size:
+            chunk = min(size - written, self.PAGE_SIZE - start)
+            self._page(index)[start:start + chunk] = data[written:written + chunk]
+            written += chunk
+            index += 1
+            start = 0
+
     def load(self, offset, size=32):
         """Load a value from memory"""
         self.extend(offset, size)
-        return int.from_bytes(self.memory[offset:offset+size], 'big')
-    
+        index, start = divmod(offset, self.PAGE_SIZE)
+        if start + size <= self.PAGE_SIZE:
+            page = self.pages.get(index)
+            if page is None:
+                return 0
+            return int.from_bytes(page[start:start + size], 'big')
+        return int.from_bytes(self.get_memory_region(offset, size), 'big')
+
     def get_memory_region(self, offset, size):
         """Get a memory region as bytes"""
         self.extend(offset, size)
-        return bytes(self.memory[offset:offset+size])
+        region = bytearray()
+        index, start = divmod(offset, self.PAGE_SIZE)
+        while len(region) < size:
+            chunk = min(size - len(region), self.PAGE_SIZE - start)
+            page = self.pages.get(index)
+            region += page[start:start + chunk] if page is not None else bytes(chunk)
+            index += 1
+            start = 0
+        return bytes(region)
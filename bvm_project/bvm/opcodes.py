@@ -12,12 +12,23 @@ class Opcode:
     # Control flow
     STOP = 0x00
     
+    # Memory
+    MLOAD = 0x51
+    MSTORE = 0x52
+    MSIZE = 0x59
+
     # Storage
     SSTORE = 0x55
     SLOAD = 0x54
     
     # Modulo operation
     MOD = 0x05
+
+    # Signed arithmetic (two's complement in u256 mode)
+    SDIV = 0x06
+    SMOD = 0x07
+    SLT = 0x16
+    SGT = 0x17
     
     # Comparison operations
     LT = 0x10    # Less than
@@ -35,11 +46,25 @@ class Opcode:
     JUMPDEST = 0x5b  # Jump destination marker
     PC = 0x58        # Program counter
 
+    # Stack duplication and exchange; DUPn copies the nth item from the
+    # top, SWAPn exchanges the top with the (n+1)th (n = 1..16)
+    DUP1 = 0x80
+    DUP16 = 0x8f
+    SWAP1 = 0x90
+    SWAP16 = 0x9f
+
+    # Superinstructions emitted by the compilers' fusion pass
+    SLOADI = 0xb0       # PUSH1 slot SLOAD
+    SSTOREI = 0xb1      # PUSH1 slot SSTORE
+    PUSHPUSHADD = 0xb2  # PUSH1 a PUSH1 b ADD
+    ISZEROJUMPI = 0xb3  # ISZERO PUSH1 dest JUMPI
+
 OPCODE_NAMES = {
     0x01: 'ADD',
     0x02: 'SUB',
     0x03: 'MUL',
     0x04: 'DIV',
+    0x05: 'MOD',
     0x60: 'PUSH1',
     0x50: 'POP',
     0x00: 'STOP',
@@ -54,6 +79,64 @@ OPCODE_NAMES = {
     0x12: 'EQ',
     0x13: 'ISZERO',
     0x14: 'LTE',
-    0x15: 'GTE'
+    0x15: 'GTE',
+    0x06: 'SDIV',
+    0x07: 'SMOD',
+    0x16: 'SLT',
+    0x17: 'SGT',
+    0x51: 'MLOAD',
+    0x52: 'MSTORE',
+    0x59: 'MSIZE',
+    0xB0: 'SLOADI',
+    0xB1: 'SSTOREI',
+    0xB2: 'PUSHPUSHADD',
+    0xB3: 'ISZEROJUMPI'
 }
 
+OPCODE_NAMES.update({Opcode.DUP1 + i: f'DUP{i + 1}' for i in range(16)})
+OPCODE_NAMES.update({Opcode.SWAP1 + i: f'SWAP{i + 1}' for i in range(16)})
+
+# Number of immediate bytes following each opcode
+OPCODE_IMMEDIATES = {
+    Opcode.PUSH1: 1,
+    Opcode.SLOADI: 1,
+    Opcode.SSTOREI: 1,
+    Opcode.PUSHPUSHADD: 2,
+    Opcode.ISZEROJUMPI: 1,
+}
+
+# (items required on the stack, items left in their place) per opcode
+STACK_EFFECTS = {
+    Opcode.STOP: (0, 0),
+    Opcode.ADD: (2, 1),
+    Opcode.SUB: (2, 1),
+    Opcode.MUL: (2, 1),
+    Opcode.DIV: (2, 1),
+    Opcode.MOD: (2, 1),
+    Opcode.SDIV: (2, 1),
+    Opcode.SMOD: (2, 1),
+    Opcode.SLT: (2, 1),
+    Opcode.SGT: (2, 1),
+    Opcode.LT: (2, 1),
+    Opcode.GT: (2, 1),
+    Opcode.EQ: (2, 1),
+    Opcode.LTE: (2, 1),
+    Opcode.GTE: (2, 1),
+    Opcode.ISZERO: (1, 1),
+    Opcode.POP: (1, 0),
+    Opcode.PUSH1: (0, 1),
+    Opcode.MLOAD: (1, 1),
+    Opcode.MSTORE: (2, 0),
+    Opcode.MSIZE: (0, 1),
+    Opcode.SLOAD: (1, 1),
+    Opcode.SSTORE: (2, 0),
+    Opcode.JUMP: (1, 0),
+    Opcode.JUMPI: (2, 0),
+    Opcode.JUMPDEST: (0, 0),
+    Opcode.SLOADI: (0, 1),
+    Opcode.SSTOREI: (1, 0),
+    Opcode.PUSHPUSHADD: (0, 1),
+    Opcode.ISZEROJUMPI: (1, 0),
+}
+STACK_EFFECTS.update({Opcode.DUP1 + i: (i + 1, i + 2) for i in range(16)})
+STACK_EFFECTS.update({Opcode.SWAP1 + i: (i + 2, i + 2) for i in range(16)})
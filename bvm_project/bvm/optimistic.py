@@ -0,0 +1,232 @@
+# bvm/optimistic.py
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import os
+
+from .parallel import ShardState
+from .vm import BVM, TransactionResult
+
+# VM owned by each worker process (see _init_worker)
+_worker_vm = None
+
+
+class MultiVersionStorage:
+    """Storage values written by each transaction of a block, per slot.
+
+    A transaction reading (address, slot) sees the write of the highest
+    lower-indexed transaction, or the base world state if there is none.
+    Reads return the version they observed: (tx_index, incarnation), or
+    None for the base state. A worker process rebuilds one from a copy of
+    the parent's versions and written.
+    """
+
+    def __init__(self, world_state, versions=None, written=None):
+        self.world_state = world_state
+        # (address, slot) -> {tx_index: (incarnation, value)}
+        self.versions = {} if versions is None else versions
+        # tx_index -> keys written by its last incarnation
+        self.written = {} if written is None else written
+
+    def read(self, address, slot, tx_index):
+        writers = self.versions.get((address, slot))
+        if writers:
+            lower = [i for i in writers if i < tx_index]
+            if lower:
+                writer = max(lower)
+                incarnation, value = writers[writer]
+                return (writer, incarnation), value
+        return None, self.world_state.get_storage(address).get(slot, 0)
+
+    def record(self, tx_index, incarnation, writes):
+        """Replace a transaction's writes with those of a new incarnation"""
+        for key in self.written.get(tx_index, ()):
+            if key not in writes:
+                del self.versions[key][tx_index]
+        for key, value in writes.items():
+            self.versions.setdefault(key, {})[tx_index] = (incarnation, value)
+        self.written[tx_index] = set(writes)
+
+    def snapshot(self):
+        """Copies of versions and written for a worker's MultiVersionStorage"""
+        return {key: dict(writers) for key, writers in self.versions.items()}, dict(self.written)
+
+    def final_values(self):
+        """Value of each written slot after the last transaction"""
+        return {
+            key: writers[max(writers)][1]
+            for key, writers in self.versions.items() if writers
+        }
+
+
+class TransactionStorage:
+    """Storage mapping handed to the VM for one transaction incarnation.
+
+    It records the read-set (slot -> version seen) for SLOAD and buffers
+    SSTORE writes, so the VM's storage accesses are tracked without any
+    extra work in the interpreter loop.
+    """
+
+    def __init__(self, mv_storage, address, tx_index, reads, writes):
+        self.mv_storage = mv_storage
+        self.address = address
+        self.tx_index = tx_index
+        self.reads = reads
+        self.writes = writes
+
+    def get(self, slot, default=0):
+        key = (self.address, slot)
+        if key in self.writes:
+            return self.writes[key]
+        version, value = self.mv_storage.read(self.address, slot, self.tx_index)
+        self.reads.setdefault(key, version)
+        return value
+
+    def __getitem__(self, slot):
+        return self.get(slot)
+
+    def __setitem__(self, slot, value):
+        self.writes[(self.address, slot)] = value
+
+    def items(self):
+        return [(slot, value) for (address, slot), value in self.writes.items()]
+
+
+class TransactionView:
+    """World-state stand-in for one speculative execution"""
+
+    def __init__(self, mv_storage, tx_index):
+        self.mv_storage = mv_storage
+        self.tx_index = tx_index
+        self.reads = {}
+        self.writes = {}
+
+    def get_storage(self, address):
+        return TransactionStorage(self.mv_storage, address, self.tx_index, self.reads, self.writes)
+
+    def update_storage(self, address, storage):
+        pass
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+
+def _init_worker(jit_threshold):
+    global _worker_vm
+    _worker_vm = BVM(None, jit_threshold=jit_threshold)
+
+
+def _run_speculative(jobs, storages, versions, written):
+    """Run (tx_index, incarnation, transaction) jobs in index order.
+
+    The jobs see the block's writes as of the start of the round and the
+    writes of the jobs before them in this chunk. Returns each job's
+    result, read-set and writes for the parent to record and validate.
+    """
+    state = ShardState()
+    state.load(storages)
+    mv_storage = MultiVersionStorage(state, versions, written)
+    outcomes = []
+    for tx_index, incarnation, (code, address, gas_limit) in jobs:
+        view = TransactionView(mv_storage, tx_index)
+        _worker_vm.world_state = view
+        result = _worker_vm.execute(code, gas_limit=gas_limit, address=address)
+        writes = view.writes if result['success'] else {}
+        mv_storage.record(tx_index, incarnation, writes)
+        outcomes.append((
+            TransactionResult(address, result['success'],
+                              gas_limit - result['gas_remaining'], result.get('error')),
+            view.reads,
+            writes,
+        ))
+    return outcomes
+
+
+class OptimisticExecutor:
+    """Block-STM style executor for a block of transactions.
+
+    Each round splits the transactions still to run into contiguous
+    chunks, one per worker process, and runs them speculatively against
+    a copy of the block's MultiVersionStorage. The parent records the
+    writes that come back, then validates every transaction's read-set in
+    index order; one that read a version an earlier transaction has since
+    replaced runs again in the next round. Rounds repeat until every read
+    is consistent, at which point the committed state is the same as
+    running the block serially. Failed transactions contribute no writes.
+    Like ParallelExecutor, each worker keeps a warm BVM for the life of
+    the pool.
+    """
+
+    def __init__(self, world_state, workers=None, jit_threshold=BVM.JIT_THRESHOLD):
+        self.world_state = world_state
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(jit_threshold,),
+        )
+        self.rounds = 0
+        self.executions = 0
+
+    def _is_valid(self, mv_storage, tx_index, reads):
+        for (address, slot), version in reads.items():
+            if mv_storage.read(address, slot, tx_index)[0] != version:
+                return False
+        return True
+
+    def _chunks(self, pending):
+        size = -(-len(pending) // self.workers)
+        return [pending[start:start + size] for start in range(0, len(pending), size)]
+
+    def execute(self, transactions):
+        """Execute (code, address, gas_limit) jobs; returns TransactionResults"""
+        transactions = list(transactions)
+        mv_storage = MultiVersionStorage(self.world_state)
+        storages = {address: self.world_state.get_storage(address)
+                    for code, address, gas_limit in transactions}
+        results = [None] * len(transactions)
+        read_sets = [None] * len(transactions)
+        incarnations = [0] * len(transactions)
+        pending = list(range(len(transactions)))
+        self.rounds = self.executions = 0
+
+        while pending:
+            self.rounds += 1
+            self.executions += len(pending)
+            # The pool pickles arguments in a background thread, so every
+            # chunk gets a copy taken before any of this round's writes
+            versions, written = mv_storage.snapshot()
+            futures = []
+            for chunk in self._chunks(pending):
+                jobs = [(i, incarnations[i], transactions[i]) for i in chunk]
+                futures.append((chunk, self.pool.submit(
+                    _run_speculative, jobs, storages, versions, written)))
+            for chunk, future in futures:
+                for i, (result, reads, writes) in zip(chunk, future.result()):
+                    results[i], read_sets[i] = result, reads
+                    mv_storage.record(i, incarnations[i], writes)
+                    incarnations[i] += 1
+            pending = [
+                i for i in range(len(transactions))
+                if not self._is_valid(mv_storage, i, read_sets[i])
+            ]
+
+        # Write back only the slots whose value the block changed
+        changes = {}
+        for (address, slot), value in mv_storage.final_values().items():
+            storage = self.world_state.get_storage(address)
+            if slot not in storage or storage[slot] != value:
+                changes.setdefault(address, {})[slot] = value
+        with self.world_state.batch():
+            for address, changed in changes.items():
+                self.world_state.update_slots(address, changed)
+        return results
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,132 @@
+# bvm/parallel.py
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import os
+
+from .vm import BVM
+
+# Warm VM owned by each worker process (see _init_worker)
+_worker_vm = None
+
+
+class ShardState:
+    """In-memory slice of the world state held by a worker process"""
+
+    def __init__(self):
+        self.storages = {}
+        self.changes = {}  # address -> (changed slots, deleted slots) since load
+
+    def load(self, storages):
+        self.storages = storages
+        self.changes = {}
+
+    def get_storage(self, address):
+        return self.storages.setdefault(address, {})
+
+    def update_storage(self, address, storage):
+        old = self.storages.get(address, {})
+        self.storages[address] = storage
+        self.update_slots(address, storage, [slot for slot in old if slot not in storage])
+
+    def update_slots(self, address, changed, deleted=()):
+        storage = self.get_storage(address)
+        changes, removed = self.changes.setdefault(address, ({}, set()))
+        for slot, value in changed.items():
+            storage[slot] = changes[slot] = value
+            removed.discard(slot)
+        for slot in deleted:
+            storage.pop(slot, None)
+            changes.pop(slot, None)
+            removed.add(slot)
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+
+def _init_worker(jit_threshold):
+    global _worker_vm
+    _worker_vm = BVM(ShardState(), jit_threshold=jit_threshold)
+
+
+def _run_shard(jobs, storages):
+    """Run one shard's jobs in the worker's VM.
+
+    Returns the results and, for every address the shard committed, the
+    (changed, deleted) slots, so only those travel back and get written.
+    """
+    state = _worker_vm.world_state
+    state.load(storages)
+    results = _worker_vm.execute_batch(jobs)
+    return results, state.changes
+
+
+class ParallelExecutor:
+    """Run batches across a process pool, sharded by contract address.
+
+    All jobs for one address go to the same shard and keep their order, so
+    contracts that do not share storage run independently. Each worker
+    keeps a warm BVM for the life of the pool. Results come back in
+    submission order and storage updates are applied to the world state in
+    the order each address first appeared in the batch.
+    """
+
+    def __init__(self, world_state, workers=None, jit_threshold=BVM.JIT_THRESHOLD):
+        self.world_state = world_state
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(jit_threshold,),
+        )
+
+    def _shard(self, transactions):
+        """Split jobs into per-worker shards of whole address groups"""
+        groups = {}
+        for index, (code, address, gas_limit) in enumerate(transactions):
+            groups.setdefault(address, []).append(index)
+        shards = [[] for _ in range(min(self.workers, len(groups)))]
+        loads = [0] * len(shards)
+        # Largest groups first, each to the least loaded shard
+        for address in sorted(groups, key=lambda a: -len(groups[a])):
+            target = loads.index(min(loads))
+            shards[target].append(address)
+            loads[target] += len(groups[address])
+        return groups, shards
+
+    def execute(self, transactions):
+        """Execute (code, address, gas_limit) jobs; returns TransactionResults"""
+        transactions = list(transactions)
+        if not transactions:
+            return []
+        groups, shards = self._shard(transactions)
+        futures = []
+        for addresses in shards:
+            indices = sorted(i for address in addresses for i in groups[address])
+            jobs = [transactions[i] for i in indices]
+            storages = {address: self.world_state.get_storage(address) for address in addresses}
+            futures.append((indices, self.pool.submit(_run_shard, jobs, storages)))
+
+        results = [None] * len(transactions)
+        updates = {}
+        for indices, future in futures:
+            shard_results, shard_updates = future.result()
+            for index, result in zip(indices, shard_results):
+                results[index] = result
+            updates.update(shard_updates)
+
+        with self.world_state.batch():
+            for address in groups:
+                if address in updates:
+                    changed, deleted = updates[address]
+                    self.world_state.update_slots(address, changed, deleted)
+        return results
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,128 @@
+# bvm/profiler.py
+from collections import defaultdict
+import time
+
+from .opcodes import OPCODE_NAMES
+from .tracer import Tracer
+
+# Columns report() and collapsed() can sort or weight by
+PROFILE_FIELDS = ('count', 'time', 'gas')
+
+
+def _name(opcode):
+    return OPCODE_NAMES.get(opcode, hex(opcode))
+
+
+class Profiler(Tracer):
+    """Instruction-level profiler.
+
+    Install it as a BVM tracer; runs without a tracer take the untraced
+    loop and pay nothing for it. For each executed instruction, keyed by
+    (contract address, pc, opcode), it accumulates the hit count, the
+    wall time until the next instruction starts and the gas it consumed,
+    including memory expansion. Counters add up across runs, so one
+    profiler can be shared by execute, execute_batch and main.py.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.stats = {}       # (address, pc, opcode) -> [count, seconds, gas]
+        self.current = None   # key of the instruction being timed
+        self.started = 0.0
+        self.gas_before = 0
+
+    def step(self, vm, pc, opcode, gas_cost):
+        now = self.clock()
+        if self.current is not None:
+            self._settle(vm, now)
+        self.current = (vm.contract_address, pc, opcode)
+        self.started = now
+        self.gas_before = vm.gas_remaining
+
+    def fault(self, vm, error):
+        self._settle(vm, self.clock())
+
+    def finish(self, vm):
+        self._settle(vm, self.clock())
+
+    def _settle(self, vm, now):
+        """Charge the instruction being timed with its time and gas"""
+        key = self.current
+        if key is None:
+            return
+        self.current = None
+        entry = self.stats.get(key)
+        if entry is None:
+            entry = self.stats[key] = [0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += now - self.started
+        entry[2] += self.gas_before - vm.gas_remaining
+
+    def reset(self):
+        self.stats.clear()
+        self.current = None
+
+    def by_opcode(self):
+        """{opcode name: {'count', 'time', 'gas'}} over every pc"""
+        totals = defaultdict(lambda: [0, 0.0, 0])
+        for (address, pc, opcode), entry in self.stats.items():
+            total = totals[_name(opcode)]
+            for i in range(3):
+                total[i] += entry[i]
+        return {name: dict(zip(PROFILE_FIELDS, total)) for name, total in totals.items()}
+
+    def by_pc(self):
+        """{(address, pc): {'count', 'time', 'gas'}}, to find hot loops"""
+        totals = defaultdict(lambda: [0, 0.0, 0])
+        for (address, pc, opcode), entry in self.stats.items():
+            total = totals[(address, pc)]
+            for i in range(3):
+                total[i] += entry[i]
+        return {key: dict(zip(PROFILE_FIELDS, total)) for key, total in totals.items()}
+
+    def report(self, sort='time', limit=20):
+        """Text tables of opcodes and pcs, sorted by count, time or gas"""
+        if sort not in PROFILE_FIELDS:
+            raise ValueError(f"Unknown sort field: {sort}")
+        ops = sorted(self.by_opcode().items(), key=lambda item: item[1][sort], reverse=True)
+        pcs = sorted(self.by_pc().items(), key=lambda item: item[1][sort], reverse=True)
+        total_time = sum(stats['time'] for name, stats in ops) or 1.0
+
+        lines = [f"{'opcode':<14}{'count':>10}{'time (ms)':>12}{'%time':>8}{'avg (us)':>10}{'gas':>12}"]
+        for name, stats in ops[:limit]:
+            lines.append(
+                f"{name:<14}{stats['count']:>10}{stats['time'] * 1e3:>12.3f}"
+                f"{100 * stats['time'] / total_time:>8.1f}"
+                f"{stats['time'] * 1e6 / stats['count']:>10.2f}{stats['gas']:>12}"
+            )
+        lines.append('')
+        lines.append(f"{'address':<20}{'pc':>6}{'count':>10}{'time (ms)':>12}{'gas':>12}")
+        for (address, pc), stats in pcs[:limit]:
+            lines.append(
+                f"{str(address):<20}{pc:>6}{stats['count']:>10}"
+                f"{stats['time'] * 1e3:>12.3f}{stats['gas']:>12}"
+            )
+        return '\n'.join(lines)
+
+    def collapsed(self, weight='time'):
+        """Lines in the collapsed-stack format read by flamegraph tools.
+
+        Each stack is address;opcode;pc, weighted by hit count, time in
+        microseconds or gas.
+        """
+        if weight not in PROFILE_FIELDS:
+            raise ValueError(f"Unknown weight: {weight}")
+        index = PROFILE_FIELDS.index(weight)
+        lines = []
+        for (address, pc, opcode), entry in sorted(self.stats.items(), key=lambda item: str(item[0])):
+            value = entry[index]
+            if weight == 'time':
+                value = round(value * 1e6)
+            if value:
+                lines.append(f"{address};{_name(opcode)};pc_{pc} {value}")
+        return lines
+
+    def write_collapsed(self, path, weight='time'):
+        with open(path, 'w') as f:
+            for line in self.collapsed(weight):
+                f.write(line + '\n')
@@ -0,0 +1,159 @@
+# bvm/replay.py
+"""Re-execute a binary trace and check it against the BVM.
+
+    python -m bvm.replay trace.bin                 # check every step
+    python -m bvm.replay trace.bin --no-check --repeat 20 --engine table
+"""
+import argparse
+import sys
+import time
+
+from .vm import BVM
+from .parallel import ShardState
+from .binary_trace import StepRecorder, read_trace
+
+
+class TraceRun:
+    """One recorded execution: its run header and the records after it"""
+
+    def __init__(self, header, records):
+        self.address, self.gas_limit, self.arithmetic, self.code = header[1:]
+        self.header = header
+        self.records = records
+
+    def initial_storage(self):
+        """Storage as the run found it, rebuilt from its storage reads.
+
+        A slot's first read before any write shows its value before the
+        run; slots the run never read cannot affect it.
+        """
+        storage = {}
+        written = set()
+        for record in self.records:
+            if record[0] != 'step':
+                continue
+            read, write = record[6], record[7]
+            if read is not None and read[0] not in written and read[0] not in storage:
+                storage[read[0]] = read[1]
+            if write is not None:
+                written.add(write[0])
+        return storage
+
+
+def split_runs(records):
+    runs = []
+    for record in records:
+        if record[0] == 'run':
+            runs.append(TraceRun(record, []))
+        elif not runs:
+            raise ValueError("Trace record before the first run header")
+        else:
+            runs[-1].records.append(record)
+    return runs
+
+
+class ReplayChecker(StepRecorder):
+    """Compares the records of a live run with the recorded ones"""
+
+    def __init__(self, expected):
+        super().__init__()
+        self.expected = expected
+        self.index = 0
+        self.mismatch = None  # (index, expected, actual) of the first difference
+
+    def record(self, record):
+        index = self.index
+        self.index += 1
+        if self.mismatch is not None:
+            return
+        expected = self.expected[index] if index < len(self.expected) else None
+        if record != expected:
+            self.mismatch = (index, expected, record)
+
+
+class ReplayReport:
+    def __init__(self):
+        self.runs = 0
+        self.steps = 0
+        self.seconds = 0.0
+        self.mismatches = []  # (run index, record index, expected, actual)
+
+    @property
+    def ok(self):
+        return not self.mismatches
+
+
+def _outcome(result):
+    """A run's result in the form of _recorded_outcome"""
+    if result['success']:
+        return ('end', result['gas_remaining'], len(result['stack']))
+    return ('fault', result['gas_remaining'], len(result['stack']), result['error'])
+
+
+def _recorded_outcome(record):
+    """Final gas, stack depth and error from a run's last record"""
+    if record is not None and record[0] == 'fault':
+        return ('fault',) + record[3:]
+    return record
+
+
+def replay(records, engine='table', check=True, repeat=1, jit_threshold=None):
+    """Re-run every execution in a trace and compare it with the recording.
+
+    With check=True each run goes through the traced loop and every step
+    (pc, opcode, gas, stack delta, top of stack, storage reads and writes)
+    must match. With check=False runs take the untraced engine and only
+    their final gas, stack depth and error are compared, which makes a
+    trace a fixed workload for timing engines; seconds covers just the
+    executions.
+    """
+    report = ReplayReport()
+    state = ShardState()
+    for run_index, run in enumerate(split_runs(records)):
+        report.runs += 1
+        report.steps += sum(1 for record in run.records if record[0] == 'step')
+        storage = run.initial_storage()
+        outcome = _recorded_outcome(run.records[-1] if run.records else None)
+        for _ in range(repeat):
+            state.load({run.address: dict(storage)})
+            tracer = ReplayChecker([run.header] + run.records) if check else None
+            vm = BVM(state, engine=engine, tracer=tracer, jit_threshold=jit_threshold,
+                     arithmetic=run.arithmetic)
+            start = time.perf_counter()
+            result = vm.execute(run.code, run.gas_limit, run.address)
+            report.seconds += time.perf_counter() - start
+            if check:
+                mismatch = tracer.mismatch
+                if mismatch is None and tracer.index != len(tracer.expected):
+                    mismatch = (tracer.index, tracer.expected[tracer.index], None)
+            else:
+                mismatch = None
+                if _outcome(result) != outcome:
+                    mismatch = (len(run.records), outcome, _outcome(result))
+            if mismatch is not None:
+                report.mismatches.append((run_index,) + mismatch)
+                break
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a BVM binary trace')
+    parser.add_argument('trace', help='Trace file written by BinaryTracer')
+    parser.add_argument('--engine', choices=BVM.ENGINES, default='table')
+    parser.add_argument('--no-check', action='store_true',
+                        help='Only compare each run\'s outcome, without per-step checks')
+    parser.add_argument('--repeat', type=int, default=1, help='Executions per recorded run')
+    parser.add_argument('--jit', action='store_true',
+                        help='Compile runs with the JIT (with --no-check; traced runs are interpreted)')
+    args = parser.parse_args(argv)
+
+    report = replay(read_trace(args.trace), engine=args.engine, check=not args.no_check,
+                    repeat=args.repeat, jit_threshold=0 if args.jit else None)
+    print(f"{report.runs} runs, {report.steps} steps, {report.seconds:.3f}s executing")
+    for run_index, index, expected, actual in report.mismatches:
+        print(f"Run {run_index}: record {index} differs\n  recorded: {expected}\n  replayed: {actual}")
+    return 0 if report.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
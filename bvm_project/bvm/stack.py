@@ -0,0 +1,41 @@
+from collections.abc import Sequence
+from itertools import islice
+
+
+class StackView(Sequence):
+    """Read-only view of the live part of a VM operand stack.
+
+    The VM keeps its operands in a fixed-capacity buffer with a separate
+    stack pointer; a view covers buffer[0:size] without copying it. Index
+    -1 is the top of the stack, as with a list.
+    """
+    __slots__ = ('buffer', 'size')
+
+    def __init__(self, buffer, size):
+        self.buffer = buffer
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.buffer[:self.size][index]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("stack index out of range")
+        return self.buffer[index]
+
+    def __iter__(self):
+        return islice(self.buffer, self.size)
+
+    def __eq__(self, other):
+        if isinstance(other, (StackView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.buffer[:self.size])
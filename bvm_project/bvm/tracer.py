@@ -0,0 +1,76 @@
+# bvm/tracer.py
+import json
+
+from .opcodes import Opcode, OPCODE_NAMES
+
+
+class Tracer:
+    """Execution tracer hooks.
+
+    BVM.execute runs a separate traced loop whenever a tracer other than
+    NullTracer is installed, so the untraced loop never checks for one.
+    """
+
+    def start(self, vm):
+        """Called before the first instruction of each run"""
+        pass
+
+    def step(self, vm, pc, opcode, gas_cost):
+        """Called before each instruction, before its gas is charged"""
+        pass
+
+    def fault(self, vm, error):
+        """Called when execution stops with a VMException"""
+        pass
+
+    def finish(self, vm):
+        """Called when execution stops without a fault"""
+        pass
+
+    def close(self):
+        pass
+
+
+class NullTracer(Tracer):
+    """Default tracer; selects the untraced interpreter loop"""
+    pass
+
+
+class PrintTracer(Tracer):
+    """Human-readable trace on stdout"""
+
+    def step(self, vm, pc, opcode, gas_cost):
+        print(f"Executing {OPCODE_NAMES.get(opcode, hex(opcode))} at pc={pc}, Gas used: {gas_cost}")
+        # JUMPI reports its operands once they have been popped, i.e. only
+        # when the instruction is paid for and the stack holds both of them
+        if opcode == Opcode.JUMPI and vm.gas_remaining >= gas_cost and vm.sp >= 2:
+            print(f"JUMPI condition: {vm.stack_buffer[vm.sp - 2]}, dest: {vm.stack_buffer[vm.sp - 1]}")
+
+    def fault(self, vm, error):
+        print(f"VM Exception at pc={vm.pc}: {str(error)}")
+
+
+class JsonTracer(Tracer):
+    """Compact structured trace, one JSON object per executed step.
+
+    Each line holds the pc, opcode name, gas remaining before the step,
+    the step's gas cost and the stack depth.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def step(self, vm, pc, opcode, gas_cost):
+        self.file.write(json.dumps(
+            {'pc': pc, 'op': OPCODE_NAMES.get(opcode, hex(opcode)),
+             'gas': vm.gas_remaining, 'cost': gas_cost, 'depth': vm.sp},
+            separators=(',', ':')
+        ) + '\n')
+
+    def fault(self, vm, error):
+        self.file.write(json.dumps(
+            {'pc': vm.pc, 'error': str(error)}, separators=(',', ':')
+        ) + '\n')
+
+    def close(self):
+        self.file.close()
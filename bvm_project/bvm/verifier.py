@@ -0,0 +1,106 @@
+# bvm/verifier.py
+from .opcodes import Opcode, STACK_EFFECTS
+
+# Height a superinstruction's unfused sequence reaches above the stack it
+# starts from; the interpreter checks it against the depth limit
+FUSED_PEAKS = {
+    Opcode.SSTOREI: 1,
+    Opcode.PUSHPUSHADD: 2,
+    Opcode.ISZEROJUMPI: 1,
+}
+
+
+# Hashes of code proven stack-safe. Stack use does not depend on the
+# arithmetic mode, so every program cache in bvm/vm.py shares them and
+# decodes the code against its unchecked dispatch table.
+VERIFIED_CODE = set()
+
+# Handlers and gas play no part in verification
+_NO_DISPATCH = ((None, 0),) * 256
+
+
+def verify_code(code):
+    """Verify code's stack use at deploy time.
+
+    Returns True if verify_stack proved it stack-safe, in which case every
+    later run of the same code skips the per-instruction stack checks.
+    """
+    from .decoder import code_hash, decode  # bvm/decoder.py imports this module
+    code = bytes(code)
+    digest = code_hash(code)
+    if digest in VERIFIED_CODE:
+        return True
+    if not verify_stack(decode(code, _NO_DISPATCH, digest)):
+        return False
+    VERIFIED_CODE.add(digest)
+    return True
+
+
+def verify_stack(program, max_depth=1024):
+    """Prove that no execution of a decoded program misuses the stack.
+
+    Abstract interpretation over the control-flow graph from pc 0 with an
+    empty stack: every reachable pc must be entered with a single stack
+    height, no instruction may find fewer operands than it pops, and no
+    instruction may take the stack above max_depth. JUMP/JUMPI targets
+    must be constants pushed directly in front of them, as the compilers
+    emit them. Paths that end in a fault other than a stack error
+    (invalid opcode, bad jump destination, truncated immediate) simply
+    stop. Returns True when the program is safe to run without stack
+    checks.
+    """
+    instructions = program.instructions
+    jumpdests = program.jumpdests
+    code_len = len(instructions)
+    # pc -> (height on entry, constant on top of the stack or None)
+    states = {}
+    pending = []
+
+    def enter(pc, height, top):
+        state = states.get(pc)
+        if state is None:
+            states[pc] = (height, top)
+            pending.append(pc)
+            return True
+        if state[0] != height:
+            return False
+        if state[1] is not None and state[1] != top:
+            states[pc] = (height, None)
+            pending.append(pc)
+        return True
+
+    if code_len:
+        enter(0, 0, None)
+    while pending:
+        pc = pending.pop()
+        height, top = states[pc]
+        opcode, handler, arg, gas, next_pc, ends_block = instructions[pc]
+        effect = STACK_EFFECTS.get(opcode)
+        if effect is None or arg is None:
+            continue  # Invalid opcode or truncated immediate: always faults
+        required, left = effect
+        peak = max(left - required, FUSED_PEAKS.get(opcode, 0))
+        if height < required or height + peak > max_depth:
+            return False
+        after = height - required + left
+
+        if opcode == Opcode.STOP:
+            continue
+        if opcode in (Opcode.JUMP, Opcode.JUMPI):
+            if top is None:
+                return False
+            if top in jumpdests and not enter(top, after, None):
+                return False
+            if opcode == Opcode.JUMP:
+                continue
+        elif opcode == Opcode.ISZEROJUMPI:
+            if arg in jumpdests and not enter(arg, after, None):
+                return False
+
+        if opcode in (Opcode.PUSH1, Opcode.PUSHPUSHADD):
+            result = arg
+        else:
+            result = None
+        if next_pc < code_len and not enter(next_pc, after, result):
+            return False
+    return True
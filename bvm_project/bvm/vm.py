@@ -1,28 +1,83 @@
+from collections import namedtuple
+
 from .opcodes import Opcode, OPCODE_NAMES
 from .exceptions import *
-from .gas import get_opcode_gas
-from .storage import PersistentStorage
+from .gas import get_opcode_gas, memory_gas
+from .memory import Memory, WORD_MASK
+from .arithmetic import to_signed, sdiv, smod, u256_sdiv, u256_smod
+from .stack import StackView
+from .journal import JournaledStorage
+from .execution import Execution, PendingStorage
+from .decoder import ProgramCache
+from .verifier import VERIFIED_CODE, verify_code
+from .tracer import NullTracer
+from .jit import JitCache
+
+# Compact per-transaction result returned by BVM.execute_batch
+TransactionResult = namedtuple('TransactionResult', 'address success gas_used error')
 
 class BVM:
     MAX_STACK_DEPTH = 1024
     WORD_SIZE = 32  # bytes
+
+    # Execution engines:
+    #   'table'     - 256-entry dispatch table (default)
+    #   'reference' - original if/elif chain in execute_opcode, kept to
+    #                 cross-check the table engine
+    ENGINES = ('table', 'reference')
+
+    # Integer semantics:
+    #   'unbounded' - Python integers that grow without limit (default)
+    #   'u256'      - results wrap modulo 2**256, signed opcodes read
+    #                 words as two's complement and x / 0 is 0, as on the EVM
+    ARITHMETIC = ('unbounded', 'u256')
+
+    # Untraced table-engine runs of the same code before it is compiled to
+    # Python by bvm/jit.py
+    JIT_THRESHOLD = 10
     
-    def __init__(self, world_state):
+    def __init__(self, world_state, engine='table', tracer=None, jit_threshold=JIT_THRESHOLD,
+                 arithmetic='unbounded'):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        if arithmetic not in self.ARITHMETIC:
+            raise ValueError(f"Unknown arithmetic: {arithmetic}")
         self.world_state = world_state
-        self.storage = PersistentStorage()
+        self.engine = engine
+        self.arithmetic = arithmetic
+        if arithmetic == 'u256':
+            self.program_cache = U256_PROGRAM_CACHE
+            self.jit_cache = U256_JIT_CACHE
+        else:
+            self.program_cache = PROGRAM_CACHE
+            self.jit_cache = JIT_CACHE
+        self.tracer = tracer  # None or NullTracer selects the untraced loop
+        self.jit_threshold = jit_threshold  # None disables the JIT tier
+        self.storage = {}
         self.reset()
     
     def reset(self):
         self.pc = 0  # Program counter
-        self.stack = []
-        self.memory = bytearray()
+        # Operand stack: a fixed-capacity buffer and a stack pointer (the
+        # number of live entries). Each run gets a fresh buffer, so the
+        # stack view in an earlier result is never overwritten.
+        self.stack_buffer = [0] * self.MAX_STACK_DEPTH
+        self.sp = 0
+        self.memory = Memory()
         self.gas_remaining = 0  # Will be set in execute()
         self.return_data = bytearray()
         self.stopped = False
         self.code = bytearray()
         self.contract_address = None  # Track contract during execution
         self.jumpdests = set()
+        self.fault_opcode = None
+        self.steps = 0  # instructions started by the last _run_bounded
     
+    @property
+    def stack(self):
+        """The live part of the operand stack, top last"""
+        return StackView(self.stack_buffer, self.sp)
+
     def _preprocess_jumpdests(self):
         """Scan bytecode for JUMPDEST opcodes"""
         for pc, opcode in enumerate(self.code):
@@ -30,69 +85,418 @@ class BVM:
                 self.jumpdests.add(pc)
     
     def execute(self, code, gas_limit=500000, address="contract"):
-        """Execute bytecode in the VM with gas tracking"""
+        """Execute bytecode in the VM with gas tracking.
+
+        A failed run leaves the contract's storage as it was before it, and
+        only the slots a successful run changed are written back.
+        """
+        storage = _journaled(self.world_state.get_storage(address))
+        result = self._execute(code, gas_limit, address, storage)
+        if result['success']:
+            self._persist(address, storage)
+        return result
+
+    def _persist(self, address, storage):
+        """Write a successful run's storage back to the world state.
+
+        Journaled storage writes only the slots whose value changed, and
+        nothing at all if none did.
+        """
+        if isinstance(storage, JournaledStorage):
+            changed, deleted = storage.changes()
+            storage.commit()
+            if changed or deleted:
+                self.world_state.update_slots(address, changed, deleted)
+        else:
+            self.world_state.update_storage(address, storage)
+
+    def execute_batch(self, transactions):
+        """Execute (code, address, gas_limit) jobs in order in this VM.
+
+        Each address's storage is read from the world state the first time
+        it is used and written back once at the end of the batch (if any of
+        its jobs succeeded), so later jobs see the writes of earlier ones.
+        A failed job's writes are reverted before the next job runs.
+        Returns a TransactionResult per job.
+        """
+        storages = {}
+        succeeded = set()
+        results = []
+        for code, address, gas_limit in transactions:
+            storage = storages.get(address)
+            if storage is None:
+                storage = storages[address] = _journaled(self.world_state.get_storage(address))
+            result = self._execute(code, gas_limit, address, storage)
+            if result['success']:
+                succeeded.add(address)
+            results.append(TransactionResult(
+                address, result['success'], gas_limit - result['gas_remaining'], result.get('error')
+            ))
+        with self.world_state.batch():
+            for address in succeeded:
+                self._persist(address, storages[address])
+        return results
+
+    def _execute(self, code, gas_limit, address, storage):
+        """Run code against storage and build the result dict.
+
+        If storage is a JournaledStorage, the writes of a failed run are
+        reverted and the result holds the storage dict it wraps.
+        """
+        journaled = isinstance(storage, JournaledStorage)
+        checkpoint = storage.checkpoint() if journaled else 0
         self.reset()
         self.contract_address = address
-        self.storage = self.world_state.get_storage(address)
+        self.storage = storage
         self.code = code
         self.gas_remaining = gas_limit  # Set initial gas from parameter
-        self._preprocess_jumpdests()
         #self.world_state.update_storage(self.contract_address, self.storage)
 
-        
+        tracer = self.tracer
+        if tracer is not None and isinstance(tracer, NullTracer):
+            tracer = None
+        try:
+            if tracer is not None:
+                tracer.start(self)
+            if self.engine == 'reference':
+                self._preprocess_jumpdests()
+                self._run_reference(tracer or NullTracer())
+            elif tracer is not None:
+                self._run_traced(self.program_cache.get(code), tracer)
+            else:
+                program = self.program_cache.get(code)
+                compiled = None
+                if self.jit_threshold is not None:
+                    compiled = self.jit_cache.get(program, self.jit_threshold)
+                if compiled is not None:
+                    self._run_compiled(program, compiled)
+                else:
+                    self._run(program)
+            if tracer is not None:
+                tracer.finish(self)
+            return self._result(storage.data if journaled else storage)
+        except VMException as e:
+            if tracer is not None:
+                tracer.fault(self, e)
+            if journaled:
+                storage.revert(checkpoint)
+            return self._result(storage.data if journaled else storage, e)
+
+    def _result(self, storage, error=None):
+        """Result dict for the run that just ended, failed if error is set"""
+        if error is None:
+            return {
+                'success': True,
+                'stack': self.stack,
+                'storage': storage,
+                'gas_remaining': self.gas_remaining
+            }
+        opcode = self.fault_opcode
+        return {
+            'success': False,
+            'error': str(error),
+            'stack': self.stack,
+            'storage': storage,
+            'pc': self.pc,
+            'gas_remaining': self.gas_remaining,
+            'opcode': OPCODE_NAMES.get(opcode, hex(opcode))
+        }
+
+    def start(self, code, gas_limit=500000, address="contract"):
+        """Begin a resumable execution of code; nothing runs until resume().
+
+        Storage writes are held in the execution until it finishes and are
+        committed to the world state only if it succeeds. Resumable runs
+        are untraced; starting one counts as a run towards the JIT
+        threshold, as execute() does.
+        """
+        program = self.program_cache.get(code)
+        compiled = None
+        if self.jit_threshold is not None:
+            compiled = self.jit_cache.get(program, self.jit_threshold)
+        storage = PendingStorage(self.world_state.get_storage(address))
+        execution = Execution(code, gas_limit, address, program, storage, compiled)
+        execution.stack_buffer = [0] * self.MAX_STACK_DEPTH
+        execution.memory = Memory()
+        return execution
+
+    def resume(self, execution, max_steps=None, max_gas=None):
+        """Run an execution for at most max_steps instructions or until it
+        has used max_gas more gas, whichever comes first.
+
+        A slice always ends on an instruction boundary, so it can run over
+        max_gas by the cost of its last instruction. Each slice reads the
+        contract's latest committed storage. Returns True once the
+        execution has finished; execution.result then holds the same dict
+        execute() returns. One VM can interleave any number of executions.
+        """
+        if execution.done:
+            return True
+        self.fault_opcode = None
+        self.contract_address = execution.address
+        self.code = execution.code
+        self.pc = execution.pc
+        self.stack_buffer = execution.stack_buffer
+        self.sp = execution.sp
+        self.memory = execution.memory
+        self.gas_remaining = execution.gas_remaining
+        self.stopped = execution.stopped
+        storage = execution.storage
+        storage.base = self.world_state.get_storage(execution.address)
+        self.storage = storage
+        program = execution.program
+        try:
+            self._run_bounded(program, max_steps, max_gas, execution.compiled)
+            if self.stopped or self.pc >= len(program.instructions):
+                base = storage.base
+                changed = storage.changes()
+                storage.writes = {}
+                if changed:
+                    base.update(changed)
+                    self.world_state.update_slots(execution.address, changed)
+                execution.result = self._result(base)
+        except VMException as e:
+            storage.writes = {}
+            execution.result = self._result(storage.base, e)
+        finally:
+            execution.steps += self.steps
+            execution.pc = self.pc
+            execution.sp = self.sp
+            execution.gas_remaining = self.gas_remaining
+            execution.stopped = self.stopped
+        return execution.done
+
+    def _run(self, program):
+        """Untraced interpreter loop with basic-block gas metering.
+
+        A block's static gas is charged once on entry. When the remaining
+        gas cannot cover the whole block it is charged per instruction
+        instead, so OutOfGasError is raised at the same pc as before.
+        """
+        self.jumpdests = program.jumpdests
+        instructions = program.instructions
+        block_gas = program.block_gas
+        code_len = len(instructions)
+        opcode = None
+        pc = 0
+        prepaid = False
+        try:
+            while not self.stopped and self.pc < code_len:
+                pc = self.pc
+                cost = block_gas[pc]
+                if self.gas_remaining >= cost:
+                    self.gas_remaining -= cost
+                    prepaid = True
+                    while True:
+                        opcode, handler, arg, gas_cost, next_pc, ends_block = instructions[pc]
+                        self.pc = next_pc
+                        handler(self, arg)
+                        if ends_block:
+                            break
+                        pc = next_pc
+                else:
+                    prepaid = False
+                    while True:
+                        opcode, handler, arg, gas_cost, next_pc, ends_block = instructions[pc]
+                        if self.gas_remaining < gas_cost:
+                            raise OutOfGasError(f"Not enough gas (needed {gas_cost}, has {self.gas_remaining})")
+                        self.gas_remaining -= gas_cost
+                        self.pc = next_pc
+                        handler(self, arg)
+                        if ends_block:
+                            break
+                        pc = next_pc
+        except VMException:
+            if prepaid:
+                # Give back the gas of the block's instructions that never ran
+                self.gas_remaining += program.block_rest[pc]
+            self.fault_opcode = opcode
+            raise
+
+    def _run_bounded(self, program, max_steps, max_gas, compiled=None):
+        """Interpreter loop that stops after max_steps instructions or once
+        max_gas has been used (None for no limit); sets self.steps to the
+        number of instructions it started.
+
+        Whenever the rest of the current basic block fits in both budgets
+        and its gas, the block runs whole as in _run: its JIT-compiled
+        function if there is one and the stack allows, otherwise
+        interpreted with its static gas charged on entry. Other
+        instructions are metered one at a time.
+        """
+        self.jumpdests = program.jumpdests
+        instructions = program.instructions
+        block_gas = program.block_gas
+        block_size = program.block_size
+        blocks = compiled.blocks if compiled is not None else None
+        stack = self.stack_buffer
+        max_depth = self.MAX_STACK_DEPTH
+        code_len = len(instructions)
+        gas_floor = None if max_gas is None else self.gas_remaining - max_gas
+        steps = 0
+        opcode = None
+        pc = 0
+        prepaid = False
+        try:
+            while not self.stopped and self.pc < code_len:
+                if steps == max_steps or (gas_floor is not None and self.gas_remaining <= gas_floor):
+                    break
+                pc = self.pc
+                cost = block_gas[pc]
+                size = block_size[pc]
+                if (self.gas_remaining >= cost
+                        and (max_steps is None or steps + size <= max_steps)
+                        and (gas_floor is None or self.gas_remaining - cost >= gas_floor)):
+                    block = blocks[pc] if blocks is not None else None
+                    if block is not None:
+                        run, need, peak, gas = block
+                        depth = self.sp
+                        if depth >= need and depth + peak <= max_depth:
+                            # The block sets pc and fault_opcode itself if it faults
+                            opcode = None
+                            prepaid = False
+                            steps += size
+                            self.gas_remaining -= gas
+                            self.pc = run(self, stack, self.storage)
+                            continue
+                    self.gas_remaining -= cost
+                    prepaid = True
+                    while True:
+                        opcode, handler, arg, gas_cost, next_pc, ends_block = instructions[pc]
+                        steps += 1
+                        self.pc = next_pc
+                        handler(self, arg)
+                        if ends_block:
+                            break
+                        pc = next_pc
+                else:
+                    prepaid = False
+                    opcode, handler, arg, gas_cost, next_pc, ends_block = instructions[pc]
+                    steps += 1
+                    if self.gas_remaining < gas_cost:
+                        raise OutOfGasError(f"Not enough gas (needed {gas_cost}, has {self.gas_remaining})")
+                    self.gas_remaining -= gas_cost
+                    self.pc = next_pc
+                    handler(self, arg)
+        except VMException:
+            if prepaid:
+                # Give back the gas of the block's instructions that never ran
+                self.gas_remaining += program.block_rest[pc]
+            if opcode is not None:
+                self.fault_opcode = opcode
+            raise
+        finally:
+            self.steps = steps
+
+    def _run_compiled(self, program, compiled):
+        """Run JIT-compiled blocks, falling back to the interpreter.
+
+        Each block checks its gas and stack requirements up front. A block
+        that could fault, or one the JIT did not compile, is handed to _run
+        at its entry pc, so faults are raised by the interpreter with the
+        same pc, gas and stack as an interpreted run.
+        """
+        self.jumpdests = program.jumpdests
+        blocks = compiled.blocks
+        stack = self.stack_buffer
+        storage = self.storage
+        max_depth = self.MAX_STACK_DEPTH
+        code_len = len(blocks)
+        pc = self.pc
+        while not self.stopped and pc < code_len:
+            block = blocks[pc]
+            if block is None:
+                break
+            run, need, peak, gas = block
+            depth = self.sp
+            if self.gas_remaining < gas or depth < need or depth + peak > max_depth:
+                break
+            self.gas_remaining -= gas
+            pc = run(self, stack, storage)
+        self.pc = pc
+        if not self.stopped and pc < code_len:
+            self._run(program)
+
+    def _run_traced(self, program, tracer):
+        """Interpreter loop reporting every step to a tracer"""
+        self.jumpdests = program.jumpdests
+        instructions = program.instructions
+        code_len = len(instructions)
+        step = tracer.step
+        opcode = None
+        try:
+            while not self.stopped and self.pc < code_len:
+                opcode, handler, arg, gas_cost, next_pc, ends_block = instructions[self.pc]
+                step(self, self.pc, opcode, gas_cost)
+                if self.gas_remaining < gas_cost:
+                    raise OutOfGasError(f"Not enough gas (needed {gas_cost}, has {self.gas_remaining})")
+                self.gas_remaining -= gas_cost
+                self.pc = next_pc
+                handler(self, arg)
+        except VMException:
+            self.fault_opcode = opcode
+            raise
+
+    def _run_reference(self, tracer):
+        """Reference loop: raw bytes through the execute_opcode chain"""
+        opcode = None
         try:
             while not self.stopped and self.pc < len(self.code):
                 opcode = self.code[self.pc]
                 # Get and deduct gas cost
                 gas_cost = get_opcode_gas(opcode)
-                print(f"Executing {OPCODE_NAMES.get(opcode, hex(opcode))} at pc={self.pc}, Gas used: {gas_cost}")  
-                
+                tracer.step(self, self.pc, opcode, gas_cost)
+
                 if self.gas_remaining < gas_cost:
                     raise OutOfGasError(f"Not enough gas (needed {gas_cost}, has {self.gas_remaining})")
                 self.gas_remaining -= gas_cost
-                
+
                 self.pc += 1
                 self.execute_opcode(opcode)
-            self.world_state.update_storage(self.contract_address, self.storage)
-            return {
-                'success': True,
-                'stack': self.stack,
-                'storage': self.storage,
-                'gas_remaining': self.gas_remaining
-            }
-        except VMException as e:
-            print(f"VM Exception at pc={self.pc}: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e),
-                'stack': self.stack,
-                'storage': self.storage,
-                'pc': self.pc,
-                'gas_remaining': self.gas_remaining,
-                'opcode': OPCODE_NAMES.get(opcode, hex(opcode))
-            }
-    
+        except VMException:
+            self.fault_opcode = opcode
+            raise
+
     def execute_opcode(self, opcode):
-        """Execute a single opcode (gas already deducted)"""
+        """Execute a single opcode (gas already deducted).
+
+        Reference implementation used by the 'reference' engine; the
+        default engine dispatches through DISPATCH_TABLE instead.
+        """
+        u256 = self.arithmetic == 'u256'
+
         if opcode == Opcode.ADD:
             a = self.stack_pop()
             b = self.stack_pop()
-            self.stack_push(a + b)
+            self.stack_push(self._wrap(a + b))
         
         elif opcode == Opcode.SUB:
             a = self.stack_pop()
             b = self.stack_pop()
-            self.stack_push(b - a)
+            self.stack_push(self._wrap(b - a))
         
         elif opcode == Opcode.MUL:
             a = self.stack_pop()
             b = self.stack_pop()
-            self.stack_push(a * b)
+            self.stack_push(self._wrap(a * b))
         
         elif opcode == Opcode.DIV:
             a = self.stack_pop()
             b = self.stack_pop()
-            self.stack_push(0 if b == 0 else b // a)
+            if u256:
+                self.stack_push(0 if a == 0 else b // a)
+            else:
+                self.stack_push(0 if b == 0 else b // a)
+
+        elif opcode == Opcode.SDIV:
+            a = self.stack_pop()
+            b = self.stack_pop()
+            self.stack_push(u256_sdiv(b, a) if u256 else sdiv(b, a))
+
+        elif opcode == Opcode.SMOD:
+            a = self.stack_pop()
+            b = self.stack_pop()
+            self.stack_push(u256_smod(b, a) if u256 else smod(b, a))
         
         elif opcode == Opcode.PUSH1:
             if self.pc >= len(self.code):
@@ -121,7 +525,10 @@ class BVM:
         elif opcode == Opcode.MOD:
             a = self.stack_pop()
             b = self.stack_pop()
-            self.stack_push(0 if b == 0 else b % a)
+            if u256:
+                self.stack_push(0 if a == 0 else b % a)
+            else:
+                self.stack_push(0 if b == 0 else b % a)
         
         elif opcode == Opcode.LT:
             a = self.stack_pop()
@@ -133,6 +540,20 @@ class BVM:
             b = self.stack_pop()
             self.stack_push(1 if b > a else 0)
         
+        elif opcode == Opcode.SLT:
+            a = self.stack_pop()
+            b = self.stack_pop()
+            if u256:
+                a, b = to_signed(a), to_signed(b)
+            self.stack_push(1 if b < a else 0)
+
+        elif opcode == Opcode.SGT:
+            a = self.stack_pop()
+            b = self.stack_pop()
+            if u256:
+                a, b = to_signed(a), to_signed(b)
+            self.stack_push(1 if b > a else 0)
+
         elif opcode == Opcode.EQ:
             a = self.stack_pop()
             b = self.stack_pop()
@@ -161,7 +582,6 @@ class BVM:
         elif opcode == Opcode.JUMPI:
             dest = self.stack_pop()
             condition = self.stack_pop()
-            print(f"JUMPI condition: {condition}, dest: {dest}")
             if condition != 0:
                 if dest not in self.jumpdests:
                     raise InvalidJumpError(f"Invalid JUMPI destination: {dest}")
@@ -169,16 +589,781 @@ class BVM:
         
         elif opcode == Opcode.JUMPDEST:
             pass
+
+        elif opcode == Opcode.MLOAD:
+            offset = self.stack_pop()
+            self.stack_push(self._mload(offset))
+
+        elif opcode == Opcode.MSTORE:
+            offset = self.stack_pop()
+            value = self.stack_pop()
+            self._mstore(offset, value)
+
+        elif opcode == Opcode.MSIZE:
+            self.stack_push(self.memory.size)
+
+        elif Opcode.DUP1 <= opcode <= Opcode.DUP16:
+            self._dup(opcode - Opcode.DUP1 + 1)
+
+        elif Opcode.SWAP1 <= opcode <= Opcode.SWAP16:
+            self._swap(opcode - Opcode.SWAP1 + 1)
+
+        elif opcode == Opcode.SLOADI:
+            slot = self._read_immediate(opcode, 1)
+            self.stack_push(self.storage.get(slot[0], 0))
+
+        elif opcode == Opcode.SSTOREI:
+            slot = self._read_immediate(opcode, 1)
+            if self.sp >= self.MAX_STACK_DEPTH:
+                raise StackOverflowError()
+            value = self.stack_pop()
+            self.storage[slot[0]] = value
+
+        elif opcode == Opcode.PUSHPUSHADD:
+            a, b = self._read_immediate(opcode, 2)
+            if self.sp >= self.MAX_STACK_DEPTH - 1:
+                raise StackOverflowError()
+            self.stack_push(a + b)
+
+        elif opcode == Opcode.ISZEROJUMPI:
+            dest = self._read_immediate(opcode, 1)[0]
+            if self.sp >= self.MAX_STACK_DEPTH:
+                raise StackOverflowError()
+            condition = self.stack_pop()
+            if condition == 0:
+                if dest not in self.jumpdests:
+                    raise InvalidJumpError(f"Invalid JUMPI destination: {dest}")
+                self.pc = dest
         
         else:
             raise InvalidOpcodeError(f"Unknown opcode: {hex(opcode)}")
     
+    def _wrap(self, value):
+        """Reduce an arithmetic result to the VM's word size"""
+        if self.arithmetic == 'u256':
+            return value & WORD_MASK
+        return value
+
+    def _dup(self, n):
+        """Push a copy of the nth stack item"""
+        sp = self.sp
+        if sp < n:
+            raise StackUnderflowError()
+        if sp >= self.MAX_STACK_DEPTH:
+            raise StackOverflowError()
+        stack = self.stack_buffer
+        stack[sp] = stack[sp - n]
+        self.sp = sp + 1
+
+    def _swap(self, n):
+        """Exchange the top stack item with the (n+1)th"""
+        sp = self.sp - 1
+        if sp < n:
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp], stack[sp - n] = stack[sp - n], stack[sp]
+
+    def _expand_memory(self, offset, size):
+        """Charge expansion gas for touching memory at offset..offset+size"""
+        end = offset + size
+        if end > self.memory.size:
+            cost = memory_gas(end) - memory_gas(self.memory.size)
+            if self.gas_remaining < cost:
+                raise OutOfGasError(f"Not enough gas (needed {cost}, has {self.gas_remaining})")
+            self.gas_remaining -= cost
+
+    def _mload(self, offset):
+        offset &= WORD_MASK
+        self._expand_memory(offset, self.WORD_SIZE)
+        return self.memory.load(offset, self.WORD_SIZE)
+
+    def _mstore(self, offset, value):
+        offset &= WORD_MASK
+        self._expand_memory(offset, self.WORD_SIZE)
+        self.memory.store(offset, value, self.WORD_SIZE)
+
+    def _read_immediate(self, opcode, size):
+        """Read the immediate bytes of a superinstruction at self.pc"""
+        if self.pc + size > len(self.code):
+            self.pc = len(self.code)
+            raise InvalidOpcodeError(f"{OPCODE_NAMES[opcode]} without byte")
+        immediate = self.code[self.pc:self.pc + size]
+        self.pc += size
+        return immediate
+
     def stack_push(self, value):
-        if len(self.stack) >= self.MAX_STACK_DEPTH:
+        sp = self.sp
+        if sp >= self.MAX_STACK_DEPTH:
             raise StackOverflowError()
-        self.stack.append(value)
+        self.stack_buffer[sp] = value
+        self.sp = sp + 1
     
     def stack_pop(self):
-        if not self.stack:
+        sp = self.sp - 1
+        if sp < 0:
             raise StackUnderflowError()
-        return self.stack.pop()
+        self.sp = sp
+        return self.stack_buffer[sp]
+
+    # Opcode handlers used by the dispatch table. Each one mirrors the
+    # matching arm of execute_opcode, working on stack_buffer and sp
+    # directly; arg is the decoded immediate (see bvm/decoder.py). An
+    # instruction that underflows has popped every operand it found, as
+    # with stack_pop.
+
+    def _op_add(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = stack[sp + 1] + stack[sp]
+        self.sp = sp + 1
+
+    def _op_sub(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = stack[sp] - stack[sp + 1]
+        self.sp = sp + 1
+
+    def _op_mul(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = stack[sp + 1] * stack[sp]
+        self.sp = sp + 1
+
+    def _op_div(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 0 if stack[sp] == 0 else stack[sp] // stack[sp + 1]
+        self.sp = sp + 1
+
+    def _op_mod(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 0 if stack[sp] == 0 else stack[sp] % stack[sp + 1]
+        self.sp = sp + 1
+
+    def _op_sdiv(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = sdiv(stack[sp], stack[sp + 1])
+        self.sp = sp + 1
+
+    def _op_smod(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = smod(stack[sp], stack[sp + 1])
+        self.sp = sp + 1
+
+    def _op_lt(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 1 if stack[sp] < stack[sp + 1] else 0
+        self.sp = sp + 1
+
+    def _op_gt(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 1 if stack[sp] > stack[sp + 1] else 0
+        self.sp = sp + 1
+
+    def _op_eq(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 1 if stack[sp + 1] == stack[sp] else 0
+        self.sp = sp + 1
+
+    def _op_lte(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 1 if stack[sp] <= stack[sp + 1] else 0
+        self.sp = sp + 1
+
+    def _op_gte(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 1 if stack[sp] >= stack[sp + 1] else 0
+        self.sp = sp + 1
+
+    def _op_iszero(self, arg):
+        sp = self.sp - 1
+        if sp < 0:
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 1 if stack[sp] == 0 else 0
+
+    def _op_push1(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("PUSH1 without byte")
+        sp = self.sp
+        if sp >= self.MAX_STACK_DEPTH:
+            raise StackOverflowError()
+        self.stack_buffer[sp] = arg
+        self.sp = sp + 1
+
+    def _op_pop(self, arg):
+        if self.sp == 0:
+            raise StackUnderflowError()
+        self.sp -= 1
+
+    def _op_sstore(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        self.sp = sp
+        self.storage[stack[sp + 1]] = stack[sp]
+
+    def _op_sload(self, arg):
+        sp = self.sp - 1
+        if sp < 0:
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = self.storage.get(stack[sp], 0)
+
+    def _op_mload(self, arg):
+        sp = self.sp - 1
+        if sp < 0:
+            raise StackUnderflowError()
+        self.sp = sp
+        value = self._mload(self.stack_buffer[sp])
+        self.stack_buffer[sp] = value
+        self.sp = sp + 1
+
+    def _op_mstore(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        self.sp = sp
+        stack = self.stack_buffer
+        self._mstore(stack[sp + 1], stack[sp])
+
+    def _op_msize(self, arg):
+        self.stack_push(self.memory.size)
+
+    def _op_dup(self, arg):
+        self._dup(arg - Opcode.DUP1 + 1)
+
+    def _op_swap(self, arg):
+        self._swap(arg - Opcode.SWAP1 + 1)
+
+    def _op_stop(self, arg):
+        self.stopped = True
+
+    def _op_jump(self, arg):
+        sp = self.sp - 1
+        if sp < 0:
+            raise StackUnderflowError()
+        self.sp = sp
+        dest = self.stack_buffer[sp]
+        if dest not in self.jumpdests:
+            raise InvalidJumpError(f"Invalid JUMP destination: {dest}")
+        self.pc = dest
+
+    def _op_jumpi(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        self.sp = sp
+        stack = self.stack_buffer
+        if stack[sp] != 0:
+            dest = stack[sp + 1]
+            if dest not in self.jumpdests:
+                raise InvalidJumpError(f"Invalid JUMPI destination: {dest}")
+            self.pc = dest
+
+    def _op_jumpdest(self, arg):
+        pass
+
+    # Superinstructions. Each one checks the stack peak of the sequence it
+    # replaces so stack limits are the same as for the unfused code.
+
+    def _op_sloadi(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("SLOADI without byte")
+        sp = self.sp
+        if sp >= self.MAX_STACK_DEPTH:
+            raise StackOverflowError()
+        self.stack_buffer[sp] = self.storage.get(arg, 0)
+        self.sp = sp + 1
+
+    def _op_sstorei(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("SSTOREI without byte")
+        sp = self.sp
+        if sp >= self.MAX_STACK_DEPTH:
+            raise StackOverflowError()
+        if sp == 0:
+            raise StackUnderflowError()
+        self.sp = sp - 1
+        self.storage[arg] = self.stack_buffer[sp - 1]
+
+    def _op_pushpushadd(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("PUSHPUSHADD without byte")
+        sp = self.sp
+        if sp >= self.MAX_STACK_DEPTH - 1:
+            raise StackOverflowError()
+        self.stack_buffer[sp] = arg
+        self.sp = sp + 1
+
+    def _op_iszerojumpi(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("ISZEROJUMPI without byte")
+        sp = self.sp
+        if sp >= self.MAX_STACK_DEPTH:
+            raise StackOverflowError()
+        if sp == 0:
+            raise StackUnderflowError()
+        self.sp = sp - 1
+        if self.stack_buffer[sp - 1] == 0:
+            if arg not in self.jumpdests:
+                raise InvalidJumpError(f"Invalid JUMPI destination: {arg}")
+            self.pc = arg
+
+    # Handlers for programs proven stack-safe by bvm/verifier.py: the same
+    # operations without underflow or overflow checks.
+
+    def _op_add_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = stack[sp] + stack[sp - 1]
+        self.sp = sp
+
+    def _op_sub_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = stack[sp - 1] - stack[sp]
+        self.sp = sp
+
+    def _op_mul_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = stack[sp] * stack[sp - 1]
+        self.sp = sp
+
+    def _op_div_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 0 if stack[sp - 1] == 0 else stack[sp - 1] // stack[sp]
+        self.sp = sp
+
+    def _op_mod_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 0 if stack[sp - 1] == 0 else stack[sp - 1] % stack[sp]
+        self.sp = sp
+
+    def _op_sdiv_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = sdiv(stack[sp - 1], stack[sp])
+        self.sp = sp
+
+    def _op_smod_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = smod(stack[sp - 1], stack[sp])
+        self.sp = sp
+
+    def _op_lt_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 1 if stack[sp - 1] < stack[sp] else 0
+        self.sp = sp
+
+    def _op_gt_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 1 if stack[sp - 1] > stack[sp] else 0
+        self.sp = sp
+
+    def _op_eq_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 1 if stack[sp] == stack[sp - 1] else 0
+        self.sp = sp
+
+    def _op_lte_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 1 if stack[sp - 1] <= stack[sp] else 0
+        self.sp = sp
+
+    def _op_gte_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 1 if stack[sp - 1] >= stack[sp] else 0
+        self.sp = sp
+
+    def _op_iszero_unchecked(self, arg):
+        stack = self.stack_buffer
+        sp = self.sp - 1
+        stack[sp] = 1 if stack[sp] == 0 else 0
+
+    def _op_push1_unchecked(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("PUSH1 without byte")
+        sp = self.sp
+        self.stack_buffer[sp] = arg
+        self.sp = sp + 1
+
+    def _op_pop_unchecked(self, arg):
+        self.sp -= 1
+
+    def _op_sstore_unchecked(self, arg):
+        sp = self.sp - 2
+        stack = self.stack_buffer
+        self.sp = sp
+        self.storage[stack[sp + 1]] = stack[sp]
+
+    def _op_sload_unchecked(self, arg):
+        stack = self.stack_buffer
+        sp = self.sp - 1
+        stack[sp] = self.storage.get(stack[sp], 0)
+
+    def _op_mload_unchecked(self, arg):
+        sp = self.sp - 1
+        self.sp = sp
+        value = self._mload(self.stack_buffer[sp])
+        self.stack_buffer[sp] = value
+        self.sp = sp + 1
+
+    def _op_mstore_unchecked(self, arg):
+        sp = self.sp - 2
+        self.sp = sp
+        stack = self.stack_buffer
+        self._mstore(stack[sp + 1], stack[sp])
+
+    def _op_msize_unchecked(self, arg):
+        sp = self.sp
+        self.stack_buffer[sp] = self.memory.size
+        self.sp = sp + 1
+
+    def _op_dup_unchecked(self, arg):
+        sp = self.sp
+        stack = self.stack_buffer
+        stack[sp] = stack[sp + Opcode.DUP1 - 1 - arg]
+        self.sp = sp + 1
+
+    def _op_swap_unchecked(self, arg):
+        sp = self.sp - 1
+        other = sp + Opcode.SWAP1 - 1 - arg
+        stack = self.stack_buffer
+        stack[sp], stack[other] = stack[other], stack[sp]
+
+    def _op_jump_unchecked(self, arg):
+        sp = self.sp - 1
+        self.sp = sp
+        dest = self.stack_buffer[sp]
+        if dest not in self.jumpdests:
+            raise InvalidJumpError(f"Invalid JUMP destination: {dest}")
+        self.pc = dest
+
+    def _op_jumpi_unchecked(self, arg):
+        sp = self.sp - 2
+        self.sp = sp
+        stack = self.stack_buffer
+        if stack[sp] != 0:
+            dest = stack[sp + 1]
+            if dest not in self.jumpdests:
+                raise InvalidJumpError(f"Invalid JUMPI destination: {dest}")
+            self.pc = dest
+
+    def _op_sloadi_unchecked(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("SLOADI without byte")
+        sp = self.sp
+        self.stack_buffer[sp] = self.storage.get(arg, 0)
+        self.sp = sp + 1
+
+    def _op_sstorei_unchecked(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("SSTOREI without byte")
+        sp = self.sp - 1
+        self.sp = sp
+        self.storage[arg] = self.stack_buffer[sp]
+
+    def _op_pushpushadd_unchecked(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("PUSHPUSHADD without byte")
+        sp = self.sp
+        self.stack_buffer[sp] = arg
+        self.sp = sp + 1
+
+    def _op_iszerojumpi_unchecked(self, arg):
+        if arg is None:
+            raise InvalidOpcodeError("ISZEROJUMPI without byte")
+        sp = self.sp - 1
+        self.sp = sp
+        if self.stack_buffer[sp] == 0:
+            if arg not in self.jumpdests:
+                raise InvalidJumpError(f"Invalid JUMPI destination: {arg}")
+            self.pc = arg
+
+    # Handlers for the 'u256' arithmetic mode: results wrap modulo 2**256,
+    # division by zero gives 0 and the signed opcodes read their operands
+    # as two's complement words.
+
+    def _op_add_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = (stack[sp + 1] + stack[sp]) & WORD_MASK
+        self.sp = sp + 1
+
+    def _op_sub_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = (stack[sp] - stack[sp + 1]) & WORD_MASK
+        self.sp = sp + 1
+
+    def _op_mul_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = (stack[sp + 1] * stack[sp]) & WORD_MASK
+        self.sp = sp + 1
+
+    def _op_div_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 0 if stack[sp + 1] == 0 else stack[sp] // stack[sp + 1]
+        self.sp = sp + 1
+
+    def _op_mod_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 0 if stack[sp + 1] == 0 else stack[sp] % stack[sp + 1]
+        self.sp = sp + 1
+
+    def _op_sdiv_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = u256_sdiv(stack[sp], stack[sp + 1])
+        self.sp = sp + 1
+
+    def _op_smod_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = u256_smod(stack[sp], stack[sp + 1])
+        self.sp = sp + 1
+
+    def _op_slt_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 1 if to_signed(stack[sp]) < to_signed(stack[sp + 1]) else 0
+        self.sp = sp + 1
+
+    def _op_sgt_u256(self, arg):
+        sp = self.sp - 2
+        if sp < 0:
+            self.sp = 0
+            raise StackUnderflowError()
+        stack = self.stack_buffer
+        stack[sp] = 1 if to_signed(stack[sp]) > to_signed(stack[sp + 1]) else 0
+        self.sp = sp + 1
+
+    def _op_add_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = (stack[sp] + stack[sp - 1]) & WORD_MASK
+        self.sp = sp
+
+    def _op_sub_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = (stack[sp - 1] - stack[sp]) & WORD_MASK
+        self.sp = sp
+
+    def _op_mul_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = (stack[sp] * stack[sp - 1]) & WORD_MASK
+        self.sp = sp
+
+    def _op_div_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 0 if stack[sp] == 0 else stack[sp - 1] // stack[sp]
+        self.sp = sp
+
+    def _op_mod_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 0 if stack[sp] == 0 else stack[sp - 1] % stack[sp]
+        self.sp = sp
+
+    def _op_sdiv_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = u256_sdiv(stack[sp - 1], stack[sp])
+        self.sp = sp
+
+    def _op_smod_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = u256_smod(stack[sp - 1], stack[sp])
+        self.sp = sp
+
+    def _op_slt_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 1 if to_signed(stack[sp - 1]) < to_signed(stack[sp]) else 0
+        self.sp = sp
+
+    def _op_sgt_u256_unchecked(self, arg):
+        sp = self.sp - 1
+        stack = self.stack_buffer
+        stack[sp - 1] = 1 if to_signed(stack[sp - 1]) > to_signed(stack[sp]) else 0
+        self.sp = sp
+
+    def _op_invalid(self, arg):
+        raise InvalidOpcodeError(f"Unknown opcode: {hex(arg)}")
+
+
+def _journaled(storage):
+    """Wrap a world state's storage dict so a failed run can be undone.
+
+    Other storage mappings, such as bvm/optimistic.py's TransactionStorage,
+    buffer their writes themselves and are used as they are.
+    """
+    if isinstance(storage, dict):
+        return JournaledStorage(storage)
+    return storage
+
+
+def _build_dispatch_table(unchecked=False, arithmetic='unbounded'):
+    """Build the 256-entry (handler, gas) table indexed by opcode byte.
+
+    With unchecked=True the stack-manipulating opcodes get the handlers
+    without stack checks, for programs that passed bvm/verifier.py.
+    arithmetic selects the integer semantics (see BVM.ARITHMETIC).
+    """
+    handlers = {
+        Opcode.STOP: BVM._op_stop,
+        Opcode.ADD: BVM._op_add,
+        Opcode.SUB: BVM._op_sub,
+        Opcode.MUL: BVM._op_mul,
+        Opcode.DIV: BVM._op_div,
+        Opcode.MOD: BVM._op_mod,
+        Opcode.SDIV: BVM._op_sdiv,
+        Opcode.SMOD: BVM._op_smod,
+        Opcode.LT: BVM._op_lt,
+        Opcode.GT: BVM._op_gt,
+        Opcode.SLT: BVM._op_lt,  # Unbounded integers already carry a sign
+        Opcode.SGT: BVM._op_gt,
+        Opcode.EQ: BVM._op_eq,
+        Opcode.ISZERO: BVM._op_iszero,
+        Opcode.LTE: BVM._op_lte,
+        Opcode.GTE: BVM._op_gte,
+        Opcode.POP: BVM._op_pop,
+        Opcode.PUSH1: BVM._op_push1,
+        Opcode.SLOAD: BVM._op_sload,
+        Opcode.SSTORE: BVM._op_sstore,
+        Opcode.MLOAD: BVM._op_mload,
+        Opcode.MSTORE: BVM._op_mstore,
+        Opcode.MSIZE: BVM._op_msize,
+        Opcode.JUMP: BVM._op_jump,
+        Opcode.JUMPI: BVM._op_jumpi,
+        Opcode.JUMPDEST: BVM._op_jumpdest,
+        **{Opcode.DUP1 + i: BVM._op_dup for i in range(16)},
+        **{Opcode.SWAP1 + i: BVM._op_swap for i in range(16)},
+        Opcode.SLOADI: BVM._op_sloadi,
+        Opcode.SSTOREI: BVM._op_sstorei,
+        Opcode.PUSHPUSHADD: BVM._op_pushpushadd,
+        Opcode.ISZEROJUMPI: BVM._op_iszerojumpi,
+    }
+    if arithmetic == 'u256':
+        handlers.update({
+            Opcode.ADD: BVM._op_add_u256,
+            Opcode.SUB: BVM._op_sub_u256,
+            Opcode.MUL: BVM._op_mul_u256,
+            Opcode.DIV: BVM._op_div_u256,
+            Opcode.MOD: BVM._op_mod_u256,
+            Opcode.SDIV: BVM._op_sdiv_u256,
+            Opcode.SMOD: BVM._op_smod_u256,
+            Opcode.SLT: BVM._op_slt_u256,
+            Opcode.SGT: BVM._op_sgt_u256,
+        })
+    if unchecked:
+        for opcode, handler in list(handlers.items()):
+            handlers[opcode] = getattr(BVM, handler.__name__ + '_unchecked', handler)
+    return tuple(
+        (handlers.get(opcode, BVM._op_invalid), get_opcode_gas(opcode))
+        for opcode in range(256)
+    )
+
+
+DISPATCH_TABLE = _build_dispatch_table()
+UNCHECKED_DISPATCH_TABLE = _build_dispatch_table(unchecked=True)
+U256_DISPATCH_TABLE = _build_dispatch_table(arithmetic='u256')
+U256_UNCHECKED_DISPATCH_TABLE = _build_dispatch_table(unchecked=True, arithmetic='u256')
+
+# Decoded programs shared by every BVM instance, keyed by code hash
+PROGRAM_CACHE = ProgramCache(DISPATCH_TABLE, UNCHECKED_DISPATCH_TABLE, verified=VERIFIED_CODE)
+U256_PROGRAM_CACHE = ProgramCache(U256_DISPATCH_TABLE, U256_UNCHECKED_DISPATCH_TABLE,
+                                  verified=VERIFIED_CODE)
+
+# JIT-compiled programs and run counters, keyed by code hash
+JIT_CACHE = JitCache()
+U256_JIT_CACHE = JitCache(arithmetic='u256')
@@ -1,6 +1,8 @@
 from pycparser import c_parser, c_ast
 from bvm.opcodes import Opcode
-import hashlib
+from compilers.optimizer import fuse_superinstructions
+from compilers.stack_slots import StackSlots
+from compilers.storage_slots import next_storage_slot
 
 class CPPCompiler:
     @staticmethod
@@ -31,22 +33,32 @@ class CPPCompiler:
         jump_placeholders = []  # List of (position, label) tuples
         label_positions = {}    # Dictionary of label: position
         loop_stack = []         # Stack to track loops for break statements
+        stack_slots = StackSlots(bytecode)  # for-loop counters kept on the stack
         
         def get_storage_slot(var_name):
             if var_name not in storage_map:
-                # Use SHA-256 and slice the first 2 bytes
-                hash_bytes = hashlib.sha256(var_name.encode()).digest()
-                slot = int.from_bytes(hash_bytes[:2], 'big') % 256  # 0-255
+                slot = next_storage_slot(storage_map)
                 storage_map[var_name] = slot
                 print(f"Slot {slot} assigned to '{var_name}'")
             return storage_map[var_name]
 
+        def load_variable(var_name):
+            if var_name in stack_slots:
+                stack_slots.load(var_name)
+            else:
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SLOAD])
+
+        def store_variable(var_name):
+            if var_name in stack_slots:
+                stack_slots.store(var_name)
+            else:
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SSTORE])
+
         def handle_expression(expr):
             if isinstance(expr, c_ast.Constant):
                 bytecode.extend([Opcode.PUSH1, int(expr.value)])
             elif isinstance(expr, c_ast.ID):
-                slot = get_storage_slot(expr.name)
-                bytecode.extend([Opcode.PUSH1, slot, Opcode.SLOAD])
+                load_variable(expr.name)
             elif isinstance(expr, c_ast.BinaryOp):
                 handle_expression(expr.left)
                 handle_expression(expr.right)
@@ -61,56 +73,29 @@ class CPPCompiler:
                 if expr.op == '++' and isinstance(expr.expr, c_ast.ID):
                     # Post-increment: var++
                     var_name = expr.expr.name
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([
-                        Opcode.PUSH1, slot, 
-                        Opcode.SLOAD,    # Get current value 
-                        Opcode.PUSH1, 1,
-                        Opcode.ADD,
-                        # Add 1
-                        Opcode.PUSH1, slot,
-                        Opcode.SSTORE    # Store back
-                    ])
+                    load_variable(var_name)    # Get current value
+                    bytecode.extend([Opcode.PUSH1, 1, Opcode.ADD])  # Add 1
+                    store_variable(var_name)   # Store back
                 elif expr.op == '--' and isinstance(expr.expr, c_ast.ID):
                     # Post-decrement: var--
                     var_name = expr.expr.name
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([
-                        Opcode.PUSH1, slot, 
-                        Opcode.SLOAD,    # Get current value
-                        Opcode.PUSH1, 1,
-                        Opcode.SUB,      # Subtract 1
-                        Opcode.PUSH1, slot,
-                        Opcode.SSTORE    # Store back
-                    ])
+                    load_variable(var_name)    # Get current value
+                    bytecode.extend([Opcode.PUSH1, 1, Opcode.SUB])  # Subtract 1
+                    store_variable(var_name)   # Store back
                 elif expr.op == 'p++' and isinstance(expr.expr, c_ast.ID):
                     # Pre-increment: ++var (no DUP1)
                     var_name = expr.expr.name
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([
-                        Opcode.PUSH1, slot,
-                        Opcode.SLOAD,
-                        Opcode.PUSH1, 1,
-                        Opcode.ADD,
-                        Opcode.PUSH1, slot,
-                        Opcode.SSTORE,
-                        Opcode.PUSH1, slot,
-                        Opcode.SLOAD
-                    ])
+                    load_variable(var_name)
+                    bytecode.extend([Opcode.PUSH1, 1, Opcode.ADD])
+                    store_variable(var_name)
+                    load_variable(var_name)
                 elif expr.op == 'p--' and isinstance(expr.expr, c_ast.ID):
                     # Pre-decrement: --var (no DUP1)
                     var_name = expr.expr.name
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([
-                        Opcode.PUSH1, slot,
-                        Opcode.SLOAD,
-                        Opcode.PUSH1, 1,
-                        Opcode.SUB,
-                        Opcode.PUSH1, slot,
-                        Opcode.SSTORE,
-                        Opcode.PUSH1, slot,
-                        Opcode.SLOAD
-                    ])
+                    load_variable(var_name)
+                    bytecode.extend([Opcode.PUSH1, 1, Opcode.SUB])
+                    store_variable(var_name)
+                    load_variable(var_name)
 
         
         def handle_if_statement(node):
@@ -215,20 +200,22 @@ class CPPCompiler:
             # Add this loop to the loop stack
             loop_stack.append((loop_cond_label, loop_end_label))
             
-            # Handle initialization (if present)
+            # Handle initialization (if present). Initialized loop variables
+            # stay on the stack until the loop exits.
+            counters = []
             if node.init:
                 if isinstance(node.init, c_ast.DeclList):
                     for decl in node.init.decls:
                         if decl.init:
                             var_name = decl.name
                             handle_expression(decl.init)
-                            slot = get_storage_slot(var_name)
-                            bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                            stack_slots.allocate(var_name)
+                            counters.append(var_name)
                 elif isinstance(node.init, c_ast.Assignment):
                     handle_expression(node.init.rvalue)
                     var_name = node.init.lvalue.name
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                    stack_slots.allocate(var_name)
+                    counters.append(var_name)
                 else:  
                     handle_statement(node.init)
             
@@ -263,9 +250,7 @@ class CPPCompiler:
                     handle_statement(node.next)
                 elif isinstance(node.next, c_ast.Assignment):
                     handle_expression(node.next.rvalue)
-                    var_name = node.next.lvalue.name
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                    store_variable(node.next.lvalue.name)
                 elif isinstance(node.next, c_ast.ExprList):
                     for expr in node.next.exprs:
                         handle_statement(expr)
@@ -278,6 +263,11 @@ class CPPCompiler:
             # Mark the end position with JUMPDEST
             label_positions[loop_end_label] = len(bytecode)
             bytecode.append(Opcode.JUMPDEST)
+
+            # Write the loop variables back to storage, popping them
+            for var_name in reversed(counters):
+                stack_slots.release(var_name)
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SSTORE])
             
             # Remove this loop from the stack
             loop_stack.pop()
@@ -295,25 +285,25 @@ class CPPCompiler:
                 if stmt.init:
                     var_name = stmt.name
                     handle_expression(stmt.init)
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                    store_variable(var_name)
             elif isinstance(stmt, c_ast.Assignment):
                 var_name = stmt.lvalue.name
                 handle_expression(stmt.rvalue)
-                slot = get_storage_slot(var_name)
-                bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                store_variable(var_name)
             elif isinstance(stmt, c_ast.ExprList):
                 # For handling multiple expressions in a statement
                 for expr in stmt.exprs:
                     if isinstance(expr, c_ast.Assignment):
                         var_name = expr.lvalue.name
                         handle_expression(expr.rvalue)
-                        slot = get_storage_slot(var_name)
-                        bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                        store_variable(var_name)
                     else:
-                        handle_expression(expr)
+                        handle_statement(expr)
             elif isinstance(stmt, c_ast.UnaryOp):  
                 handle_expression(stmt)
+                if stmt.op in ('p++', 'p--'):
+                    # Drop the unused result so loops keep a fixed stack height
+                    bytecode.append(Opcode.POP)
             elif isinstance(stmt, c_ast.FuncCall):
                 # Handle function calls (simplistic approach)
                 # For C++, we might handle cout << statements here
@@ -340,7 +330,7 @@ class CPPCompiler:
                 raise Exception(f"Label not defined: {label}")
 
         bytecode.append(Opcode.STOP)
-        return bytes(bytecode), storage_map
+        return fuse_superinstructions(bytes(bytecode)), storage_map
         
     @staticmethod
     def _preprocess_cpp(source: str) -> str:
@@ -1,6 +1,8 @@
 from bvm.opcodes import Opcode
+from compilers.optimizer import fuse_superinstructions
+from compilers.stack_slots import StackSlots
+from compilers.storage_slots import next_storage_slot
 import esprima
-import hashlib
 
 class JSCompiler:
     @staticmethod
@@ -10,16 +12,27 @@ class JSCompiler:
         jump_placeholders = []  # List of (position, label) tuples
         label_positions = {}    # Dictionary of label: position
         loop_stack = []
+        stack_slots = StackSlots(bytecode)  # for-loop counters kept on the stack
 
         def get_storage_slot(var_name):
             if var_name not in storage_map:
-                # Use SHA-256 and slice the first 2 bytes
-                hash_bytes = hashlib.sha256(var_name.encode()).digest()
-                slot = int.from_bytes(hash_bytes[:2], 'big') % 256  # 0-255
+                slot = next_storage_slot(storage_map)
                 storage_map[var_name] = slot
                 print(f"Slot {slot} assigned to '{var_name}'")
             return storage_map[var_name]
 
+        def load_variable(var_name):
+            if var_name in stack_slots:
+                stack_slots.load(var_name)
+            else:
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SLOAD])
+
+        def store_variable(var_name):
+            if var_name in stack_slots:
+                stack_slots.store(var_name)
+            else:
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SSTORE])
+
         def compile_expression(expr):
             if expr.type == 'Literal':
                 if isinstance(expr.value, bool):
@@ -27,8 +40,7 @@ class JSCompiler:
                 else:
                     bytecode.extend([Opcode.PUSH1, expr.value])
             elif expr.type == 'Identifier':
-                slot = get_storage_slot(expr.name)
-                bytecode.extend([Opcode.PUSH1, slot, Opcode.SLOAD])
+                load_variable(expr.name)
             elif expr.type == 'BinaryExpression':
                 compile_expression(expr.left)
                 compile_expression(expr.right)
@@ -98,8 +110,17 @@ class JSCompiler:
             # Save in loop stack for break/continue
             loop_stack.append((cond_label, end_label))
 
-            # Initialize loop variable
-            handle_statement(node.init)
+            # Initialize loop variables, which stay on the stack until the
+            # loop exits
+            counters = []
+            if node.init.type == 'VariableDeclaration':
+                for decl in node.init.declarations:
+                    if decl.init:
+                        compile_expression(decl.init)
+                        stack_slots.allocate(decl.id.name)
+                        counters.append(decl.id.name)
+            else:
+                handle_statement(node.init)
 
             # Mark the condition position with JUMPDEST
             label_positions[cond_label] = len(bytecode)
@@ -122,15 +143,13 @@ class JSCompiler:
                 if node.update.type == 'UpdateExpression':
                     # Handle i++ or i--
                     if node.update.argument.type == 'Identifier':
-                        slot = get_storage_slot(node.update.argument.name)
+                        var_name = node.update.argument.name
+                        load_variable(var_name)
                         bytecode.extend([
-                            Opcode.PUSH1, slot,
-                            Opcode.SLOAD,
                             Opcode.PUSH1, 1,
                             Opcode.ADD if node.update.operator == '++' else Opcode.SUB,
-                            Opcode.PUSH1, slot,
-                            Opcode.SSTORE
                         ])
+                        store_variable(var_name)
                     else:
                         raise NotImplementedError("Only simple increments supported in for loop updates")
                 else:
@@ -142,6 +161,11 @@ class JSCompiler:
             # Mark end position
             label_positions[end_label] = len(bytecode)
             bytecode.append(Opcode.JUMPDEST)
+
+            # Write the loop variables back to storage, popping them
+            for var_name in reversed(counters):
+                stack_slots.release(var_name)
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SSTORE])
             
             # Remove from loop stack
             loop_stack.pop()
@@ -198,14 +222,12 @@ class JSCompiler:
             for decl in node.declarations:
                 if decl.init:
                     compile_expression(decl.init)
-                    slot = get_storage_slot(decl.id.name)
-                    bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                    store_variable(decl.id.name)
 
         def handle_assignment(node):
             compile_expression(node.right)
             if node.left.type == 'Identifier':
-                slot = get_storage_slot(node.left.name)
-                bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                store_variable(node.left.name)
             else:
                 raise NotImplementedError("Only simple assignments supported")
 
@@ -215,15 +237,13 @@ class JSCompiler:
                 if node.expression.argument.type != 'Identifier':
                     raise NotImplementedError("Only simple increments supported")
                 
-                slot = get_storage_slot(node.expression.argument.name)
+                var_name = node.expression.argument.name
+                load_variable(var_name)
                 bytecode.extend([
-                    Opcode.PUSH1, slot,
-                    Opcode.SLOAD,
                     Opcode.PUSH1, 1,
                     Opcode.ADD if node.expression.operator == '++' else Opcode.SUB,
-                    Opcode.PUSH1, slot,
-                    Opcode.SSTORE
                 ])
+                store_variable(var_name)
             elif node.expression.type == 'AssignmentExpression':
                 handle_assignment(node.expression)
             else:
@@ -268,4 +288,4 @@ class JSCompiler:
                 raise Exception(f"Undefined label: {label}")
 
         bytecode.append(Opcode.STOP)
-        return bytes(bytecode), storage_map
+        return fuse_superinstructions(bytes(bytecode)), storage_map
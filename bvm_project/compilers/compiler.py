@@ -1,6 +1,8 @@
 from bvm.opcodes import Opcode
+from compilers.optimizer import fuse_superinstructions
+from compilers.stack_slots import StackSlots
+from compilers.storage_slots import next_storage_slot
 import ast
-import hashlib
 class Compiler:
     @staticmethod
     def compile(contract_source):
@@ -9,22 +11,32 @@ class Compiler:
         jump_placeholders = []  # List of (position, label) tuples
         label_positions = {}    # Dictionary of label: position
         loop_stack = []
+        stack_slots = StackSlots(bytecode)  # loop counters kept on the stack
 
         def get_storage_slot(var_name):
             if var_name not in storage_map:
-                # Use SHA-256 and slice the first 2 bytes
-                hash_bytes = hashlib.sha256(var_name.encode()).digest()
-                slot = int.from_bytes(hash_bytes[:2], 'big') % 256  # 0-255
+                slot = next_storage_slot(storage_map)
                 storage_map[var_name] = slot
                 print(f"Slot {slot} assigned to '{var_name}'")
             return storage_map[var_name]
 
+        def load_variable(var_name):
+            if var_name in stack_slots:
+                stack_slots.load(var_name)
+            else:
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SLOAD])
+
+        def store_variable(var_name):
+            if var_name in stack_slots:
+                stack_slots.store(var_name)
+            else:
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SSTORE])
+
         def compile_expression(expr):
             if isinstance(expr, ast.Num):
                 bytecode.extend([Opcode.PUSH1, expr.n])
             elif isinstance(expr, ast.Name):
-                slot = get_storage_slot(expr.id)
-                bytecode.extend([Opcode.PUSH1, slot, Opcode.SLOAD])
+                load_variable(expr.id)
             elif isinstance(expr, ast.BinOp):
                 compile_expression(expr.left)
                 compile_expression(expr.right)
@@ -84,27 +96,22 @@ class Compiler:
                     len(node.iter.args) == 1):
                 raise NotImplementedError("Only for i in range(n) supported")
 
-            # Get storage slot for loop variable
+            # The loop variable lives on the stack while the loop runs and
+            # is written to its storage slot once the loop exits
             var_name = node.target.id
             slot = get_storage_slot(var_name)
             stop = node.iter.args[0]
 
             # Initialize i = 0
-            bytecode.extend([
-                Opcode.PUSH1, 0,
-                Opcode.PUSH1, slot,
-                Opcode.SSTORE
-            ])
+            bytecode.extend([Opcode.PUSH1, 0])
+            stack_slots.allocate(var_name)
 
             # Loop start (JUMPDEST)
             loop_start = len(bytecode)
             bytecode.append(Opcode.JUMPDEST)
 
             # Condition: i < n
-            bytecode.extend([
-                Opcode.PUSH1, slot,
-                Opcode.SLOAD,        # Load i
-            ])
+            load_variable(var_name)  # Load i
             compile_expression(stop) # Load n
             bytecode.extend([
                 Opcode.LT,           # i < n
@@ -119,14 +126,9 @@ class Compiler:
                 handle_statement(stmt)
 
             # Increment i (i += 1)
-            bytecode.extend([
-                Opcode.PUSH1, slot,
-                Opcode.SLOAD,
-                Opcode.PUSH1, 1,
-                Opcode.ADD,
-                Opcode.PUSH1, slot,
-                Opcode.SSTORE
-            ])
+            load_variable(var_name)
+            bytecode.extend([Opcode.PUSH1, 1, Opcode.ADD])
+            store_variable(var_name)
 
             # Jump back to start
             bytecode.extend([
@@ -139,6 +141,10 @@ class Compiler:
             bytecode[end_jump_pos] = loop_end
             bytecode.append(Opcode.JUMPDEST)
 
+            # Write i back to storage, which pops it off the stack
+            stack_slots.release(var_name)
+            bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+
         def handle_while(node):
             loop_id = len(loop_stack)
             start_label = f"while_start_{loop_id}"
@@ -198,8 +204,7 @@ class Compiler:
             elif isinstance(node, ast.Assign):
                 var_name = node.targets[0].id
                 compile_expression(node.value)
-                slot = get_storage_slot(var_name)
-                bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+                store_variable(var_name)
 
         # Parse and compile
         tree = ast.parse(contract_source)
@@ -214,4 +219,4 @@ class Compiler:
                 raise Exception(f"Undefined label: {label}")
 
         bytecode.append(Opcode.STOP)
-        return bytes(bytecode), storage_map
+        return fuse_superinstructions(bytes(bytecode)), storage_map
@@ -1,5 +1,7 @@
-import hashlib
 from bvm.opcodes import Opcode
+from compilers.optimizer import fuse_superinstructions
+from compilers.stack_slots import StackSlots
+from compilers.storage_slots import next_storage_slot
 
 class CSharpCompiler:
     @staticmethod
@@ -12,6 +14,7 @@ class CSharpCompiler:
         jump_placeholders = []
         label_positions = {}
         loop_stack = []
+        stack_slots = StackSlots(bytecode)  # for-loop counters kept on the stack
         current_class = None
         in_method = False
 
@@ -23,11 +26,25 @@ class CSharpCompiler:
                 raise ValueError(f"Invalid variable name: {var_name}")
             
             if var_name not in storage_map:
-                hash_bytes = hashlib.sha256(var_name.encode()).digest()
-                slot = int.from_bytes(hash_bytes[:2], 'big') % 256
+                slot = next_storage_slot(storage_map)
                 storage_map[var_name] = slot
                 print(f"Slot {slot} assigned to '{var_name}'")
             return storage_map[var_name]
+
+        def load_variable(var_name: str):
+            """Push a variable from its stack slot or storage"""
+            if var_name in stack_slots:
+                stack_slots.load(var_name)
+            else:
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SLOAD])
+
+        def store_variable(var_name: str):
+            """Pop the stack top into a variable's stack slot or storage"""
+            if var_name in stack_slots:
+                stack_slots.store(var_name)
+            else:
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(var_name), Opcode.SSTORE])
+
         def handle_expression(expr: str):
             """Handle expressions with proper parentheses and operator handling"""
             expr = expr.strip()
@@ -83,8 +100,7 @@ class CSharpCompiler:
             if expr.isdigit():
                 bytecode.extend([Opcode.PUSH1, int(expr)])
             elif expr.isidentifier():
-                slot = get_storage_slot(expr)
-                bytecode.extend([Opcode.PUSH1, slot, Opcode.SLOAD])
+                load_variable(expr)
             else:
                 raise ValueError(f"Invalid expression: {expr}")
 
@@ -93,8 +109,7 @@ class CSharpCompiler:
         def handle_assignment(target: str, value: str):
             """Handle variable assignment"""
             handle_expression(value)
-            slot = get_storage_slot(target)
-            bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+            store_variable(target.strip())
 
         def handle_if_statement(condition: str, line_index: int, lines: list):
             """Handle if statements with proper condition evaluation"""
@@ -211,7 +226,14 @@ class CSharpCompiler:
             
             loop_stack.append((start_label, end_label))
             
-            if init:
+            # A declared loop variable stays on the stack until the loop exits
+            counter = None
+            if init and '=' in init:
+                target, value = init.rstrip(';').split('=', 1)
+                counter = target.split()[-1].strip()
+                handle_expression(value)
+                stack_slots.allocate(counter)
+            elif init:
                 handle_statement(init)
             
             label_positions[start_label] = len(bytecode)
@@ -230,7 +252,14 @@ class CSharpCompiler:
             for stmt in body:
                 handle_statement(stmt)
             
-            if increment:
+            increment = increment.strip().rstrip(';') if increment else ''
+            if increment.endswith(('++', '--')):
+                var_name = increment[:-2].strip()
+                load_variable(var_name)
+                bytecode.extend([Opcode.PUSH1, 1])
+                bytecode.append(Opcode.ADD if increment.endswith('++') else Opcode.SUB)
+                store_variable(var_name)
+            elif increment:
                 handle_statement(increment)
             
             bytecode.extend([Opcode.PUSH1, 0])  # Placeholder
@@ -239,6 +268,11 @@ class CSharpCompiler:
             
             label_positions[end_label] = len(bytecode)
             bytecode.append(Opcode.JUMPDEST)
+
+            # Write the loop variable back to storage, popping it
+            if counter is not None:
+                stack_slots.release(counter)
+                bytecode.extend([Opcode.PUSH1, get_storage_slot(counter), Opcode.SSTORE])
             
             loop_stack.pop()
 
@@ -337,4 +371,4 @@ class CSharpCompiler:
                 raise Exception(f"Undefined label: {label}")
 
         bytecode.append(Opcode.STOP)
-        return bytes(bytecode), storage_map
+        return fuse_superinstructions(bytes(bytecode)), storage_map
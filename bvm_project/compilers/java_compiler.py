@@ -1,59 +1,40 @@
 from bvm.opcodes import Opcode
+from compilers.optimizer import fuse_superinstructions
+from compilers.stack_slots import StackSlots
+from compilers.storage_slots import next_storage_slot
 import javalang  # Java parser
 from typing import Dict, List, Optional
-import hashlib
 
 class JavaCompiler:
     @staticmethod
     def compile(java_source: str):
         bytecode = bytearray()
         storage_map = {}  # Maps variable names to storage slots
-        register_map = {}  # Maps variable names to memory registers (for optimization)
         jump_placeholders = []  # (position, label) tuples
         label_positions = {}    # label: position mappings
         loop_stack = []         # For break/continue handling
-        next_register = 0       # Next available register
+        stack_slots = StackSlots(bytecode)  # Loop variables kept on the stack
 
         def get_storage_slot(var_name: str) -> int:
-            """Assign storage slots using hashing similar to Python compiler"""
+            """Assign storage slots in order of first use, like the Python compiler"""
             if var_name not in storage_map:
-                hash_bytes = hashlib.sha256(var_name.encode()).digest()
-                slot = int.from_bytes(hash_bytes[:2], 'big') % 256
+                slot = next_storage_slot(storage_map)
                 storage_map[var_name] = slot
                 print(f"Slot {slot} assigned to '{var_name}'")
             return storage_map[var_name]
 
-        def get_or_assign_register(var_name: str) -> int:
-            """Get or assign a register for loop variables (optimization)"""
-            nonlocal next_register
-            if var_name not in register_map:
-                register_map[var_name] = next_register
-                next_register += 1
-            return register_map[var_name]
-
-        def is_loop_variable(var_name: str) -> bool:
-            """Check if variable is a loop counter (for optimization)"""
-            return var_name in register_map
-
         def load_variable(var_name: str):
-            """Load variable value to stack, using register or storage"""
-            if is_loop_variable(var_name):
-                reg = register_map[var_name]
-                bytecode.extend([Opcode.DUP0 + reg])  # Use appropriate DUP opcode
+            """Load variable value to stack, from its stack slot or storage"""
+            if var_name in stack_slots:
+                stack_slots.load(var_name)
             else:
                 slot = get_storage_slot(var_name)
                 bytecode.extend([Opcode.PUSH1, slot, Opcode.SLOAD])
 
         def store_variable(var_name: str):
-            """Store stack top to variable, using register or storage"""
-            if is_loop_variable(var_name):
-                reg = register_map[var_name]
-                if reg <= 16:  # We can use SWAP only up to 16
-                    bytecode.extend([Opcode.SWAP1 + reg - 1, Opcode.POP])
-                else:
-                    # Fall back to storage for high registers
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
+            """Store stack top to variable, in its stack slot or storage"""
+            if var_name in stack_slots:
+                stack_slots.store(var_name)
             else:
                 slot = get_storage_slot(var_name)
                 bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
@@ -150,18 +131,14 @@ class JavaCompiler:
             # Push loop context for break/continue
             loop_stack.append((update_label, end_label))
             
-            # Identify loop variables for optimization
-            loop_vars = set()
+            # Compile initialization; loop variables stay on the stack
+            # until the loop exits
+            loop_vars = []
             if node.control and node.control.init:
-                for init in node.control.init:
-                    if isinstance(init, javalang.tree.VariableDeclaration):
-                        for declarator in init.declarators:
-                            loop_vars.add(declarator.name)
-                            get_or_assign_register(declarator.name)
-            
-            # Compile initialization
-            if node.control and node.control.init:
-                for init in node.control.init:
+                inits = node.control.init
+                if not isinstance(inits, list):
+                    inits = [inits]
+                for init in inits:
                     if isinstance(init, javalang.tree.VariableDeclaration):
                         for declarator in init.declarators:
                             if declarator.initializer:
@@ -169,7 +146,15 @@ class JavaCompiler:
                             else:
                                 # Initialize to 0 if no initializer
                                 bytecode.extend([Opcode.PUSH1, 0])
-                            store_variable(declarator.name)
+                            stack_slots.allocate(declarator.name)
+                            loop_vars.append(declarator.name)
+                    elif (isinstance(init, javalang.tree.Assignment)
+                            and isinstance(init.expressionl, javalang.tree.MemberReference)):
+                        compile_expression(init.value)
+                        stack_slots.allocate(init.expressionl.member)
+                        loop_vars.append(init.expressionl.member)
+                    else:
+                        compile_expression(init)
     
             # Condition label
             label_positions[condition_label] = len(bytecode)
@@ -196,33 +181,17 @@ class JavaCompiler:
             label_positions[update_label] = len(bytecode)
             bytecode.append(Opcode.JUMPDEST)
             
-            # Compile update - optimized for i++ type updates
+            # Compile update; javalang parses i++ and --i as member
+            # references carrying the operator
             if node.control and node.control.update:
                 for update in node.control.update:
-                    if isinstance(update, javalang.tree.UnaryOperation) and update.operator == '++':
-                        if isinstance(update.expression, javalang.tree.MemberReference):
-                            var_name = update.expression.member
-                            if var_name in loop_vars:
-                                # Optimized i++ for loop variables
-                                load_variable(var_name)
-                                bytecode.extend([Opcode.PUSH1, 1, Opcode.ADD])
-                                store_variable(var_name)
-                    elif isinstance(update, javalang.tree.Assignment):
-                        # Optimized variable update
-                        if isinstance(update.expressionl, javalang.tree.MemberReference):
-                            var_name = update.expressionl.member
-                            # For i = i + 1 pattern
-                            if isinstance(update.value, javalang.tree.BinaryOperation) and update.value.operator == '+':
-                                if var_name in loop_vars:
-                                    # Load current value
-                                    load_variable(var_name)
-                                    # Add 1
-                                    bytecode.extend([Opcode.PUSH1, 1, Opcode.ADD])
-                                    # Store back
-                                    store_variable(var_name)
-                                    continue
-                            # Default case
-                            compile_expression(update)
+                    if isinstance(update, javalang.tree.MemberReference):
+                        operators = update.prefix_operators + update.postfix_operators
+                        if operators and operators[0] in ('++', '--'):
+                            load_variable(update.member)
+                            bytecode.extend([Opcode.PUSH1, 1])
+                            bytecode.append(Opcode.ADD if operators[0] == '++' else Opcode.SUB)
+                            store_variable(update.member)
                     else:
                         compile_expression(update)
             
@@ -235,13 +204,11 @@ class JavaCompiler:
             label_positions[end_label] = len(bytecode)
             bytecode.append(Opcode.JUMPDEST)
             
-            # Write register values back to storage at end of loop if needed
-            for var_name in loop_vars:
-                if is_loop_variable(var_name):
-                    slot = get_storage_slot(var_name)
-                    reg = register_map[var_name]
-                    if reg <= 16:  # Can only access certain registers directly
-                        bytecode.extend([Opcode.DUP0 + reg, Opcode.PUSH1, slot, Opcode.SSTORE])
+            # Write loop variables back to storage, popping them
+            for var_name in reversed(loop_vars):
+                stack_slots.release(var_name)
+                slot = get_storage_slot(var_name)
+                bytecode.extend([Opcode.PUSH1, slot, Opcode.SSTORE])
             
             # Pop loop context
             loop_stack.pop()
@@ -353,12 +320,6 @@ class JavaCompiler:
                         handle_statement(stmt)
                     break
             
-            # Ensure final values are written to storage
-            for var_name, reg in register_map.items():
-                if reg <= 16:  # Can only access certain registers directly
-                    slot = get_storage_slot(var_name)
-                    bytecode.extend([Opcode.DUP0 + reg, Opcode.PUSH1, slot, Opcode.SSTORE])
-            
             # Resolve jump targets
             for pos, label in jump_placeholders:
                 if label in label_positions:
@@ -367,7 +328,7 @@ class JavaCompiler:
                     raise Exception(f"Undefined label: {label}")
             
             bytecode.append(Opcode.STOP)
-            return bytes(bytecode), storage_map
+            return fuse_superinstructions(bytes(bytecode)), storage_map
             
         except Exception as e:
             raise CompilationError(f"Compilation failed: {str(e)}") from e
@@ -0,0 +1,79 @@
+from bvm.opcodes import Opcode, OPCODE_IMMEDIATES
+
+
+def _decode(bytecode):
+    """Split compiler output into (pc, opcode, immediate) instructions"""
+    instructions = []
+    pc = 0
+    while pc < len(bytecode):
+        opcode = bytecode[pc]
+        size = OPCODE_IMMEDIATES.get(opcode, 0)
+        instructions.append((pc, opcode, list(bytecode[pc + 1:pc + 1 + size])))
+        pc += 1 + size
+    return instructions
+
+
+def fuse_superinstructions(bytecode: bytes) -> bytes:
+    """Rewrite the compilers' common opcode sequences as superinstructions.
+
+    PUSH1 slot SLOAD       -> SLOADI slot
+    PUSH1 slot SSTORE      -> SSTOREI slot
+    PUSH1 a PUSH1 b ADD    -> PUSHPUSHADD a b
+    ISZERO PUSH1 dest JUMPI -> ISZEROJUMPI dest
+
+    Jump targets (the PUSH1 in front of a JUMP/JUMPI, and ISZEROJUMPI's
+    operand) are relocated to the shortened code. A sequence is left
+    unfused if any instruction after its first is a jump target, so every
+    target still starts an instruction.
+    """
+    instructions = _decode(bytecode)
+    ops = [opcode for _, opcode, _ in instructions]
+    targets = {
+        immediate[0]
+        for (_, opcode, immediate), next_opcode in zip(instructions, ops[1:])
+        if opcode == Opcode.PUSH1 and immediate and next_opcode in (Opcode.JUMP, Opcode.JUMPI)
+    }
+
+    def op_at(i):
+        return ops[i] if i < len(ops) else None
+
+    def fusable(i, count):
+        return all(instructions[j][0] not in targets for j in range(i + 1, i + count))
+
+    fused = []  # (old_pc, opcode, immediate, is_jump_target_operand)
+    i = 0
+    while i < len(instructions):
+        pc, opcode, immediate = instructions[i]
+        if (opcode == Opcode.ISZERO and op_at(i + 1) == Opcode.PUSH1
+                and op_at(i + 2) == Opcode.JUMPI and fusable(i, 3)):
+            fused.append((pc, Opcode.ISZEROJUMPI, instructions[i + 1][2], True))
+            i += 3
+        elif (opcode == Opcode.PUSH1 and op_at(i + 1) == Opcode.PUSH1
+                and op_at(i + 2) == Opcode.ADD and fusable(i, 3)):
+            fused.append((pc, Opcode.PUSHPUSHADD, immediate + instructions[i + 1][2], False))
+            i += 3
+        elif opcode == Opcode.PUSH1 and op_at(i + 1) == Opcode.SLOAD and fusable(i, 2):
+            fused.append((pc, Opcode.SLOADI, immediate, False))
+            i += 2
+        elif opcode == Opcode.PUSH1 and op_at(i + 1) == Opcode.SSTORE and fusable(i, 2):
+            fused.append((pc, Opcode.SSTOREI, immediate, False))
+            i += 2
+        else:
+            is_target = opcode == Opcode.PUSH1 and op_at(i + 1) in (Opcode.JUMP, Opcode.JUMPI)
+            fused.append((pc, opcode, immediate, is_target))
+            i += 1
+
+    # Map old instruction offsets to new ones
+    new_positions = {}
+    position = 0
+    for pc, opcode, immediate, _ in fused:
+        new_positions[pc] = position
+        position += 1 + len(immediate)
+
+    output = bytearray()
+    for pc, opcode, immediate, is_target in fused:
+        if is_target and immediate and immediate[0] in new_positions:
+            immediate = [new_positions[immediate[0]]]
+        output.append(opcode)
+        output.extend(immediate)
+    return bytes(output)
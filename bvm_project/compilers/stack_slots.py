@@ -0,0 +1,57 @@
+from bvm.opcodes import Opcode, OPCODE_IMMEDIATES, STACK_EFFECTS
+
+
+class StackSlots:
+    """Variables a compiler keeps on the VM stack instead of in storage.
+
+    The compilers emit structured code, so the stack height at any point is
+    the net stack effect of everything emitted before it. A variable is
+    given the stack position of the value on top when it is allocated, and
+    is read with DUPn and written with SWAPn POP from wherever the height
+    has moved to since.
+    """
+    MAX_DISTANCE = 16
+
+    def __init__(self, bytecode):
+        self.bytecode = bytecode
+        self.slots = {}     # variable name -> stack indices, innermost last
+        self.scanned = 0
+        self.depth = 0
+
+    def __contains__(self, name):
+        return name in self.slots
+
+    def height(self):
+        """Stack height at the end of the code emitted so far"""
+        bytecode = self.bytecode
+        while self.scanned < len(bytecode):
+            opcode = bytecode[self.scanned]
+            pops, pushes = STACK_EFFECTS.get(opcode, (0, 0))
+            self.depth += pushes - pops
+            self.scanned += 1 + OPCODE_IMMEDIATES.get(opcode, 0)
+        return self.depth
+
+    def allocate(self, name):
+        """Keep `name` in the value currently on top of the stack"""
+        self.slots.setdefault(name, []).append(self.height() - 1)
+
+    def release(self, name):
+        """Forget `name`; its value must be on top of the stack"""
+        self.slots[name].pop()
+        if not self.slots[name]:
+            del self.slots[name]
+
+    def _distance(self, name):
+        distance = self.height() - self.slots[name][-1]
+        if distance > self.MAX_DISTANCE:
+            raise Exception(f"Variable '{name}' is too deep in the stack to reach")
+        return distance
+
+    def load(self, name):
+        """Emit code pushing a copy of `name`"""
+        self.bytecode.append(Opcode.DUP1 + self._distance(name) - 1)
+
+    def store(self, name):
+        """Emit code moving the value on top of the stack into `name`"""
+        distance = self._distance(name) - 1
+        self.bytecode.extend([Opcode.SWAP1 + distance - 1, Opcode.POP])
@@ -0,0 +1,14 @@
+# Highest slot a compiled contract can address (slots are PUSH1 immediates)
+MAX_STORAGE_SLOT = 0xff
+
+
+def next_storage_slot(storage_map):
+    """Slot for a contract's next new variable.
+
+    Slots are handed out in order of first use, 0, 1, 2 ..., so no two
+    variables share one and a contract's storage stays small and dense.
+    """
+    slot = len(storage_map)
+    if slot > MAX_STORAGE_SLOT:
+        raise ValueError(f"Too many storage variables (at most {MAX_STORAGE_SLOT + 1})")
+    return slot
@@ -1,5 +1,8 @@
 import argparse
 from bvm.vm import BVM
+from bvm.tracer import PrintTracer, JsonTracer
+from bvm.binary_trace import BinaryTracer
+from bvm.profiler import Profiler, PROFILE_FIELDS
 from state.world_state import WorldState
 from compilers.compiler import Compiler
 from compilers.c_compiler import CCompiler
@@ -12,13 +15,33 @@ def main():
     parser.add_argument('contract_path', help='Path to contract file (without extension)')
     parser.add_argument('address', default='contract1', help='Contract address identifier')
     parser.add_argument('gas_limit', type=int, default=500000, help='Maximum gas allowed')
+    parser.add_argument('--trace', choices=['print', 'json', 'binary', 'none'], default='print',
+                        help='Execution trace: print (stdout), json or binary (to --trace-file) or none')
+    parser.add_argument('--trace-file', default=None,
+                        help='Output file for --trace json/binary (default trace.jsonl / trace.bin)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile opcodes and pcs instead of tracing, and print a report')
+    parser.add_argument('--profile-sort', choices=PROFILE_FIELDS, default='time',
+                        help='Column to sort the profile report by')
+    parser.add_argument('--profile-file', default=None,
+                        help='Also write collapsed stacks for flamegraph tools to this file')
     args = parser.parse_args()
 
     print(f"Starting BVM with contract '{args.address}'...")
     
     # Initialize world state and BVM
     world_state = WorldState(storage_file=f'{args.address}.json')
-    vm = BVM(world_state)
+    if args.profile:
+        tracer = Profiler()
+    elif args.trace == 'print':
+        tracer = PrintTracer()
+    elif args.trace == 'json':
+        tracer = JsonTracer(args.trace_file or 'trace.jsonl')
+    elif args.trace == 'binary':
+        tracer = BinaryTracer(args.trace_file or 'trace.bin')
+    else:
+        tracer = None
+    vm = BVM(world_state, tracer=tracer)
     
     # Detect contract language and load source
     contract_source = None
@@ -64,6 +87,13 @@ def main():
     
     print("\nExecuting contract...")
     result = vm.execute(bytecode, address=args.address, gas_limit=args.gas_limit)
+    if tracer is not None:
+        tracer.close()
+    if args.profile:
+        print("\nProfile:")
+        print(tracer.report(sort=args.profile_sort))
+        if args.profile_file:
+            tracer.write_collapsed(args.profile_file)
     
     # Display results
     print("\nExecution Results:")
@@ -77,7 +107,7 @@ def main():
     else:
         print(f"Error: {result.get('error', 'Unknown')}")
         if result.get('storage'):
-            print("Partial storage state: ")
+            print("Storage state (failed run reverted): ")
             print(result['storage'])
 
 if __name__ == "__main__":
@@ -0,0 +1,270 @@
+"""Long-running BVM execution service.
+
+Listens on a Unix socket or TCP port and speaks newline-delimited JSON.
+Each request is one object with an "op" and an optional "id" that is
+echoed in its response; requests on a connection are handled
+concurrently, so responses stream back as they complete:
+
+    {"id": 1, "op": "compile", "language": "py", "source": "a = 5"}
+    {"id": 2, "op": "deploy", "address": "c1", "language": "c", "source": "..."}
+    {"id": 3, "op": "deploy", "address": "c2", "bytecode": "6005b197..."}
+    {"id": 4, "op": "execute", "address": "c1", "gas_limit": 500000}
+    {"id": 5, "op": "ping"}
+
+Compiles run on a pool of worker processes that import every compiler
+once at startup. Executions run in the service process on one warm VM,
+time-sliced with BVM.resume so a long-running contract never blocks the
+others; runs on the same address are serialized in request order.
+
+    python service.py --socket /tmp/bvm.sock
+    python service.py --port 8765
+"""
+import argparse
+import asyncio
+from collections import OrderedDict
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import importlib
+import io
+import json
+import os
+import signal
+import time
+
+from bvm.vm import BVM
+from state.world_state import WorldState
+from state.wal import WalWorldState
+from state.sqlite import SqliteWorldState
+
+# Compiler class per language, by module and class name so the service
+# process itself never imports the parsers
+LANGUAGES = {
+    'py': ('compilers.compiler', 'Compiler'),
+    'c': ('compilers.c_compiler', 'CCompiler'),
+    'cpp': ('compilers.CPPCompiler', 'CPPCompiler'),
+    'java': ('compilers.java_compiler', 'JavaCompiler'),
+    'js': ('compilers.JSCompiler', 'JSCompiler'),
+}
+
+# World state class per --backend
+BACKENDS = {
+    'json': WorldState,
+    'wal': WalWorldState,
+    'sqlite': SqliteWorldState,
+}
+
+# Instructions per time slice of an execution
+SLICE_STEPS = 20000
+
+
+def _compiler(language):
+    if language not in LANGUAGES:
+        raise ValueError(f"Unknown language: {language}")
+    module, name = LANGUAGES[language]
+    return getattr(importlib.import_module(module), name)
+
+
+def _warm_worker():
+    """Import every compiler once, so requests don't pay for it"""
+    for language in LANGUAGES:
+        _compiler(language)
+
+
+def compile_source(language, source):
+    """Compile in a worker; returns (bytecode hex, storage map, milliseconds)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bytecode, storage_map = _compiler(language).compile(source)
+    return bytes(bytecode).hex(), storage_map, (time.perf_counter() - start) * 1e3
+
+
+class ExecutionService:
+    """Request handling shared by every connection"""
+
+    def __init__(self, world_state, workers=None, slice_steps=SLICE_STEPS, save_interval=0.5,
+                 compile_cache_size=256):
+        self.world_state = world_state
+        self.vm = BVM(world_state)
+        self.slice_steps = slice_steps
+        self.save_interval = save_interval
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker) if workers != 0 else None
+        # (language, source hash) -> compile result, least recently used first
+        self.compiled = OrderedDict()
+        self.compile_cache_size = compile_cache_size
+        self.locks = {}  # address -> [asyncio.Lock, requests holding or waiting for it]
+
+    async def compile(self, language, source):
+        if language not in LANGUAGES:
+            raise ValueError(f"Unknown language: {language}")
+        key = (language, hashlib.sha256(source.encode('utf-8')).digest())
+        result = self.compiled.get(key)
+        if result is not None:
+            self.compiled.move_to_end(key)
+            return result
+        if self.pool is None:
+            result = compile_source(language, source)
+        else:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.pool, compile_source, language, source)
+        self.compiled[key] = result
+        self.compiled.move_to_end(key)
+        if len(self.compiled) > self.compile_cache_size:
+            self.compiled.popitem(last=False)
+        return result
+
+    async def handle(self, request):
+        op = request.get('op')
+        if op == 'ping':
+            return {}
+        if op == 'compile':
+            bytecode, storage_map, milliseconds = await self.compile(request['language'], request['source'])
+            return {'bytecode': bytecode, 'storage_map': storage_map, 'compile_ms': milliseconds}
+        if op == 'deploy':
+            response = {}
+            if 'bytecode' in request:
+                bytecode = request['bytecode']
+            else:
+                bytecode, storage_map, milliseconds = await self.compile(request['language'], request['source'])
+                response['storage_map'] = storage_map
+            address = request['address']
+            async with self._lock(address):
+                self.world_state.set_contract_code(address, bytes.fromhex(bytecode))
+                response['verified'] = self.world_state.accounts[address]['verified']
+            response['bytecode'] = bytecode
+            return response
+        if op == 'execute':
+            return await self.execute(request['address'], request.get('gas_limit', 500000),
+                                      request.get('bytecode'))
+        raise ValueError(f"Unknown op: {op}")
+
+    async def execute(self, address, gas_limit, bytecode=None):
+        code = bytes.fromhex(bytecode) if bytecode is not None else self.world_state.get_contract_code(address)
+        if not code:
+            raise ValueError(f"No code deployed at {address}")
+        async with self._lock(address):
+            execution = self.vm.start(code, gas_limit, address)
+            while not self.vm.resume(execution, max_steps=self.slice_steps):
+                await asyncio.sleep(0)  # Let other requests run
+        result = execution.result
+        response = {
+            'success': result['success'],
+            'gas_used': execution.gas_used,
+            'stack': list(result['stack']),
+            'storage': {str(slot): value for slot, value in result['storage'].items()},
+        }
+        if not result['success']:
+            response['error'] = result['error']
+        return response
+
+    @contextlib.asynccontextmanager
+    async def _lock(self, address):
+        """Hold the address's lock; it is dropped once no request holds or waits for it"""
+        entry = self.locks.get(address)
+        if entry is None:
+            entry = self.locks[address] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.locks[address]
+
+    async def respond(self, request, writer):
+        try:
+            response = await self.handle(request)
+            response['ok'] = True
+        except Exception as e:  # Report any failure to the client
+            response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        if 'id' in request:
+            response['id'] = request['id']
+        writer.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    async def connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    response = {'ok': False, 'error': f"Bad request: {e}"}
+                    writer.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b'\n')
+                    continue
+                task = asyncio.ensure_future(self.respond(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def save_periodically(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            self.world_state.flush()
+
+    async def serve(self, socket_path=None, host='127.0.0.1', port=None):
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self.connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(self.connection, host, port)
+        # Stop cleanly on SIGINT or SIGTERM, so deferred saves are written
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopping.set)
+        # World-state saves are deferred and written every save_interval
+        with self.world_state.batch():
+            saver = asyncio.ensure_future(self.save_periodically())
+            try:
+                async with server:
+                    await stopping.wait()
+            finally:
+                saver.cancel()
+                if socket_path is not None and os.path.exists(socket_path):
+                    os.unlink(socket_path)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BVM execution service')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--socket', help='Unix socket path to listen on')
+    group.add_argument('--port', type=int, help='TCP port to listen on')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host to bind (with --port)')
+    parser.add_argument('--state', default=None,
+                        help="World state file (default: the backend's, world_state.json or world_state.db for sqlite)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='json',
+                        help='World state persistence: json (whole file per save), wal (append-only log) or sqlite')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Compile worker processes (default: CPU count, 0 compiles in-process)')
+    args = parser.parse_args()
+
+    backend = BACKENDS[args.backend]
+    world_state = backend(storage_file=args.state) if args.state else backend()
+    service = ExecutionService(world_state, workers=args.workers)
+    try:
+        asyncio.run(service.serve(args.socket, args.host, args.port))
+    finally:
+        service.close()
+        world_state.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# state/cache.py
+from collections import OrderedDict
+
+# Rough in-memory cost of an account, its code and each storage slot
+# (dict entry plus int key and value), used to bound the cache
+ACCOUNT_BYTES = 600
+CODE_BYTES = 8
+SLOT_BYTES = 100
+
+
+def account_bytes(account):
+    return ACCOUNT_BYTES + CODE_BYTES * len(account['code']) + SLOT_BYTES * len(account['storage'])
+
+
+class Dirty:
+    """Changes to a cached account not yet written to the backing store"""
+    __slots__ = ('created', 'code', 'storage', 'slots', 'deleted')
+
+    def __init__(self):
+        self.created = False
+        self.code = False
+        self.storage = None  # whole storage, when it was replaced
+        self.slots = {}      # slot -> value written since
+        self.deleted = set()
+
+
+class AccountCache:
+    """LRU cache of accounts, bounded by their estimated size in bytes.
+
+    Accounts are loaded with load(address) on first access (None if the
+    account does not exist) and the least recently used are evicted once
+    the cache holds more than max_bytes. Changes are recorded with the
+    mark_* methods and written back with store(address, account, dirty),
+    either when a dirty account is evicted or for all of them on flush().
+    The values of written slots are captured when they are marked, so a
+    write-back never picks up a run's uncommitted in-place writes.
+    """
+
+    def __init__(self, load, store, max_bytes=64 << 20):
+        self.load = load
+        self.store = store
+        self.max_bytes = max_bytes
+        self.accounts = OrderedDict()  # address -> account, least recent first
+        self.sizes = {}
+        self.bytes = 0
+        self.dirty = {}  # address -> Dirty
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def __contains__(self, address):
+        return address in self.accounts
+
+    def __getitem__(self, address):
+        account = self.get(address)
+        if account is None:
+            raise KeyError(address)
+        return account
+
+    def get(self, address):
+        """The account, loading it on a miss; None if it does not exist"""
+        account = self.accounts.get(address)
+        if account is not None:
+            self.hits += 1
+            self.accounts.move_to_end(address)
+        else:
+            self.misses += 1
+            account = self.load(address)
+            if account is None:
+                return None
+            self.accounts[address] = account
+            self.sizes[address] = 0
+        # Storage may have grown in place since the account was last seen
+        self._resize(address, account)
+        return account
+
+    def add(self, address, account):
+        """Cache a newly created account"""
+        self.accounts[address] = account
+        self.sizes[address] = 0
+        self._dirty(address).created = True
+
+    def _resize(self, address, account):
+        size = account_bytes(account)
+        self.bytes += size - self.sizes[address]
+        self.sizes[address] = size
+        if self.bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        # The most recently used account always stays, however large
+        accounts = self.accounts
+        while self.bytes > self.max_bytes and len(accounts) > 1:
+            address, account = accounts.popitem(last=False)
+            self.bytes -= self.sizes.pop(address)
+            self.evictions += 1
+            dirty = self.dirty.pop(address, None)
+            if dirty is not None:
+                self.writebacks += 1
+                self.store(address, account, dirty)
+
+    def _dirty(self, address):
+        account = self.accounts.get(address)
+        if account is not None:
+            self._resize(address, account)
+        dirty = self.dirty.get(address)
+        if dirty is None:
+            dirty = self.dirty[address] = Dirty()
+        return dirty
+
+    def mark_code(self, address):
+        self._dirty(address).code = True
+
+    def mark_storage(self, address, storage):
+        """Record that an account's storage was replaced as a whole"""
+        dirty = self._dirty(address)
+        dirty.storage = dict(storage)
+        dirty.slots = {}
+        dirty.deleted = set()
+
+    def mark_slots(self, address, changed, deleted=()):
+        dirty = self._dirty(address)
+        for slot, value in changed.items():
+            dirty.slots[slot] = value
+            dirty.deleted.discard(slot)
+        for slot in deleted:
+            dirty.slots.pop(slot, None)
+            dirty.deleted.add(slot)
+
+    def flush(self):
+        """Write back every dirty account"""
+        dirty, self.dirty = self.dirty, {}
+        for address, changes in dirty.items():
+            self.store(address, self.accounts.get(address), changes)
+
+    def stats(self):
+        return {
+            'accounts': len(self.accounts),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'writebacks': self.writebacks,
+        }
@@ -0,0 +1,142 @@
+# state/sqlite.py
+import sqlite3
+
+from .cache import AccountCache
+from .world_state import WorldState
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS accounts ("
+    " address TEXT PRIMARY KEY, balance INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS code ("
+    " address TEXT PRIMARY KEY, code BLOB NOT NULL, verified INTEGER NOT NULL) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS storage ("
+    " address TEXT NOT NULL, slot NOT NULL, value NOT NULL,"
+    " PRIMARY KEY (address, slot)) WITHOUT ROWID",
+)
+
+# Statements are constant strings, so sqlite3 prepares each once and
+# reuses it from its statement cache
+SELECT_ACCOUNT = "SELECT balance FROM accounts WHERE address = ?"
+SELECT_CODE = "SELECT code, verified FROM code WHERE address = ?"
+SELECT_STORAGE = "SELECT slot, value FROM storage WHERE address = ?"
+INSERT_ACCOUNT = "INSERT OR IGNORE INTO accounts (address) VALUES (?)"
+UPSERT_CODE = "INSERT OR REPLACE INTO code (address, code, verified) VALUES (?, ?, ?)"
+UPSERT_SLOT = "INSERT OR REPLACE INTO storage (address, slot, value) VALUES (?, ?, ?)"
+DELETE_SLOT = "DELETE FROM storage WHERE address = ? AND slot = ?"
+DELETE_STORAGE = "DELETE FROM storage WHERE address = ?"
+
+# SQLite integers are 64-bit; larger slots and values are stored as decimal text
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def _encode(value):
+    if INT64_MIN <= value <= INT64_MAX:
+        return value
+    return str(value)
+
+
+def _decode(value):
+    return int(value) if isinstance(value, str) else value
+
+
+class SqliteWorldState(WorldState):
+    """World state in an SQLite database (WAL journal mode).
+
+    Accounts are loaded the first time they are used and kept in an
+    AccountCache, an LRU bounded to cache_bytes, so opening a large state
+    costs nothing and memory stays bounded however many contracts run.
+    Changes are made to the cached accounts and written back when a dirty
+    account is evicted or when save_state would have saved: after each
+    change outside a batch, or once at the end of the outermost batch.
+    Write-backs go into one transaction that commits at that point, so a
+    whole batch of executions commits atomically. update_slots writes
+    just the slots it is given; update_storage rewrites the account's
+    whole storage. cache_stats() reports hits, misses and evictions.
+    """
+
+    def __init__(self, storage_file="world_state.db", synchronous='NORMAL', cache_bytes=64 << 20):
+        self.db = sqlite3.connect(storage_file, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"PRAGMA synchronous={synchronous}")
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        self.cache_bytes = cache_bytes
+        super().__init__(storage_file)
+
+    def load_state(self):
+        return AccountCache(self._load_account, self._store_account, self.cache_bytes)
+
+    def _load_account(self, address):
+        db = self.db
+        row = db.execute(SELECT_ACCOUNT, (address,)).fetchone()
+        if row is None:
+            return None
+        storage = {_decode(slot): _decode(value)
+                   for slot, value in db.execute(SELECT_STORAGE, (address,))}
+        account = {'balance': row[0], 'storage': storage, 'code': []}
+        code = db.execute(SELECT_CODE, (address,)).fetchone()
+        if code is not None:
+            account['code'] = list(code[0])
+            account['verified'] = bool(code[1])
+        return account
+
+    def _store_account(self, address, account, dirty):
+        """Write an account's dirty parts into the open transaction"""
+        db = self.db
+        self._begin()
+        if dirty.created:
+            db.execute(INSERT_ACCOUNT, (address,))
+        if dirty.code:
+            db.execute(UPSERT_CODE, (address, bytes(account['code']), account['verified']))
+        if dirty.storage is not None:
+            db.execute(DELETE_STORAGE, (address,))
+            db.executemany(UPSERT_SLOT, [(address, _encode(slot), _encode(value))
+                                         for slot, value in dirty.storage.items()])
+        db.executemany(UPSERT_SLOT, [(address, _encode(slot), _encode(value))
+                                     for slot, value in dirty.slots.items()])
+        db.executemany(DELETE_SLOT, [(address, _encode(slot)) for slot in dirty.deleted])
+
+    def _begin(self):
+        if not self.db.in_transaction:
+            self.db.execute("BEGIN")
+
+    def create_account(self, address):
+        if self.accounts.get(address) is None:
+            self.accounts.add(address, {'balance': 0, 'storage': {}, 'code': []})
+            self.save_state()
+
+    def set_contract_code(self, address, code):
+        with self.batch():
+            super().set_contract_code(address, code)
+            self.accounts.mark_code(address)
+
+    def get_contract_code(self, address):
+        return self._contract_code(address, self.accounts.get(address))
+
+    def get_storage(self, address):
+        account = self.accounts.get(address)
+        return account['storage'] if account is not None else {}
+
+    def update_storage(self, address, storage):
+        with self.batch():
+            super().update_storage(address, storage)
+            self.accounts.mark_storage(address, self.accounts[address]['storage'])
+
+    def update_slots(self, address, changed, deleted=()):
+        with self.batch():
+            super().update_slots(address, changed, deleted)
+            self.accounts.mark_slots(address, changed, deleted)
+
+    def cache_stats(self):
+        return self.accounts.stats()
+
+    def _write(self):
+        """Write back dirty accounts and commit"""
+        self._unsaved = False
+        self.accounts.flush()
+        if self.db.in_transaction:
+            self.db.commit()
+
+    def close(self):
+        self._write()
+        self.db.close()
@@ -0,0 +1,183 @@
+# state/wal.py
+import json
+import os
+import threading
+
+from .world_state import WorldState, int_slots
+
+# Record ops, one JSON array each:
+#   ['a', address]                           account created
+#   ['c', address, code hex, verified]       contract code set
+#   ['s', address, {slot: value}, [slots]]   storage slots set / deleted
+#   ['r', address, {slot: value}]            storage replaced as a whole
+CREATE, CODE, STORAGE, REPLACE = 'a', 'c', 's', 'r'
+
+
+def _apply(accounts, op):
+    kind, address = op[0], op[1]
+    account = accounts.get(address)
+    if account is None:
+        account = accounts[address] = {'balance': 0, 'storage': {}, 'code': []}
+    if kind == CODE:
+        account['code'] = list(bytes.fromhex(op[2]))
+        account['verified'] = op[3]
+    elif kind == STORAGE:
+        storage = account['storage']
+        storage.update(int_slots(op[2]))
+        for slot in op[3]:
+            storage.pop(slot, None)
+    elif kind == REPLACE:
+        account['storage'] = int_slots(op[2])
+    elif kind != CREATE:
+        raise ValueError(f"Unknown write-ahead log op: {kind}")
+
+
+def replay_log(path, accounts):
+    """Apply a log's records to accounts; returns the length of its valid part.
+
+    Every line is one commit. A torn last line (a crash mid-append) is
+    ignored, so a commit is either replayed whole or not at all.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b'\n'):
+            break
+        try:
+            ops = json.loads(line)
+        except ValueError:
+            if offset + len(line) == len(data):
+                break
+            raise ValueError(f"Corrupt write-ahead log record in {path} at offset {offset}")
+        for op in ops:
+            _apply(accounts, op)
+        offset += len(line)
+    return offset
+
+
+class WalWorldState(WorldState):
+    """World state persisted as a snapshot plus an append-only log.
+
+    Each commit (a change outside a batch, or a whole batch) appends one
+    line of compact change records to storage_file + '.wal' and fsyncs
+    it, so saving costs as much as the change rather than the state:
+    update_slots logs just the slots it is given, while update_storage
+    logs the account's whole storage. At startup the log is replayed
+    over the snapshot in storage_file, which is plain WorldState JSON.
+
+    Once the log grows past compact_bytes it is compacted in a background
+    thread: the log is rotated to '.wal.old', a copy of the state is
+    written as the new snapshot, then the old log is removed. Replaying
+    the old log over a newer snapshot is harmless, as records set values
+    rather than change them, so a crash at any point loses nothing that
+    was committed.
+    """
+
+    def __init__(self, storage_file="world_state.json", compact_bytes=1 << 22, fsync=True):
+        self.log_file = storage_file + '.wal'
+        self.old_log_file = storage_file + '.wal.old'
+        self.compact_bytes = compact_bytes
+        self.fsync = fsync
+        self._pending = []      # ops of the commit in progress
+        self._compactor = None  # background compaction thread
+        super().__init__(storage_file)
+        if os.path.exists(self.old_log_file):
+            # A compaction was interrupted; finish it before logging more
+            self._write_snapshot(self.accounts)
+            os.remove(self.old_log_file)
+            self._log_bytes = 0
+            self._log = open(self.log_file, 'wb')
+        else:
+            self._log = open(self.log_file, 'ab')
+            self._log.truncate(self._log_bytes)  # Drop a torn last record
+
+    def load_state(self):
+        accounts = super().load_state()
+        replay_log(self.old_log_file, accounts)
+        self._log_bytes = replay_log(self.log_file, accounts)
+        return accounts
+
+    def create_account(self, address):
+        with self.batch():
+            if address not in self.accounts:
+                self._pending.append([CREATE, address])
+            super().create_account(address)
+
+    def set_contract_code(self, address, code):
+        with self.batch():
+            super().set_contract_code(address, code)
+            account = self.accounts[address]
+            self._pending.append([CODE, address, bytes(account['code']).hex(), account['verified']])
+
+    def update_storage(self, address, storage):
+        with self.batch():
+            super().update_storage(address, storage)
+            self._pending.append([REPLACE, address, self.accounts[address]['storage']])
+
+    def update_slots(self, address, changed, deleted=()):
+        with self.batch():
+            super().update_slots(address, changed, deleted)
+            self._pending.append([STORAGE, address, changed, list(deleted)])
+
+    def _write(self):
+        """Append the pending ops as one record and make it durable"""
+        self._unsaved = False
+        if not self._pending:
+            return
+        record = json.dumps(self._pending, separators=(',', ':')).encode('utf-8') + b'\n'
+        self._pending = []
+        self._log.write(record)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._log_bytes += len(record)
+        if self._log_bytes >= self.compact_bytes:
+            self.compact()
+
+    def compact(self, wait=False):
+        """Rotate the log and write a snapshot of the current state.
+
+        Does nothing if a compaction is already running. The snapshot is
+        written in a background thread unless wait is true.
+        """
+        if self._compactor is not None:
+            if self._compactor.is_alive():
+                return
+            self._compactor.join()
+            self._compactor = None
+        self._write()
+        self._log.close()
+        os.replace(self.log_file, self.old_log_file)
+        self._log = open(self.log_file, 'wb')
+        self._log_bytes = 0
+        # Code lists are replaced, never mutated, so only storage is copied
+        snapshot = {address: dict(account, storage=dict(account['storage']))
+                    for address, account in self.accounts.items()}
+        self._compactor = threading.Thread(target=self._compact, args=(snapshot,), daemon=True)
+        self._compactor.start()
+        if wait:
+            self._compactor.join()
+
+    def _compact(self, snapshot):
+        self._write_snapshot(snapshot)
+        os.remove(self.old_log_file)
+
+    def _write_snapshot(self, accounts):
+        temporary = self.storage_file + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(accounts, f, separators=(',', ':'))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(temporary, self.storage_file)
+
+    def close(self):
+        """Commit anything pending, wait for compaction and close the log"""
+        self._write()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        self._log.close()
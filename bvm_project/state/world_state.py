@@ -1,12 +1,33 @@
 from .storage import PersistentStorage
+from bvm.verifier import verify_code
 
+from contextlib import contextmanager
 import json
 import os
 
+def int_slots(storage):
+    """Storage with int slot keys; JSON turns them into strings"""
+    return {int(slot): value for slot, value in storage.items()}
+
+
 class WorldState:
     def __init__(self, storage_file="world_state.json"):
         self.storage_file = storage_file
+        self._reverified = set()  # addresses whose stored code was verified again
         self.accounts = self.load_state()
+        self._batch_depth = 0
+        self._unsaved = False
+
+    @contextmanager
+    def batch(self):
+        """Defer saving until the outermost batch exits, then save once"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._unsaved:
+                self.save_state()
 
     def create_account(self, address):
         if address not in self.accounts:
@@ -20,28 +41,72 @@ class WorldState:
     def set_contract_code(self, address, code):
         self.create_account(address)
         self.accounts[address]['code'] = list(code)  # Save as list of ints
+        # Code whose stack use is proven safe runs without stack checks
+        self.accounts[address]['verified'] = verify_code(code)
+        self._reverified.add(address)
         self.save_state()
 
     def get_contract_code(self, address):
-        return bytes(self.accounts.get(address, {}).get('code', []))
+        return self._contract_code(address, self.accounts.get(address))
+
+    def _contract_code(self, address, account):
+        """An account's code. The VM's set of verified code starts empty in
+        every process, so code stored as verified is verified again the first
+        time it is read; code stored as unverified is not tried again."""
+        if account is None:
+            return b''
+        code = bytes(account.get('code', []))
+        if account.get('verified') and address not in self._reverified:
+            self._reverified.add(address)
+            verify_code(code)
+        return code
 
     def get_storage(self, address):
         return self.accounts.get(address, {}).get('storage', {})
 
     def update_storage(self, address, storage):
         self.create_account(address)
-        self.accounts[address]['storage'] = {
-            str(k): v for k, v in storage.items()
-        }
+        self.accounts[address]['storage'] = int_slots(storage)
         self.save_state()
 
+    def update_slots(self, address, changed, deleted=()):
+        """Write just the given slots: changed maps slot -> value, deleted
+        lists slots to remove. Untouched slots are not rewritten."""
+        with self.batch():
+            self.create_account(address)
+            storage = self.accounts[address]['storage']
+            storage.update(changed)
+            for slot in deleted:
+                storage.pop(slot, None)
+            self.save_state()
+
     def save_state(self):
+        if self._batch_depth:
+            self._unsaved = True
+            return
+        self._write()
+
+    def flush(self):
+        """Save changes an open batch has deferred, without ending it"""
+        if self._unsaved:
+            self._write()
+
+    def close(self):
+        """Save anything deferred; the state should not be used after this"""
+        self.flush()
+
+    def _write(self):
+        self._unsaved = False
         with open(self.storage_file, 'w') as f:
             json.dump(self.accounts, f, indent=2)
 
     def load_state(self):
         if os.path.exists(self.storage_file):
             with open(self.storage_file, 'r') as f:
-                return json.load(f)
+                accounts = json.load(f)
+            # Slots are ints in memory, as the VM addresses them
+            for account in accounts.values():
+                account['storage'] = int_slots(account.get('storage', {}))
+            return accounts
         return {}
 
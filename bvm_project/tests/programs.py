@@ -0,0 +1,57 @@
+# tests/programs.py
+"""Programs and helpers shared by the engine tests"""
+import random
+
+from benchmarks.harness import quiet
+from benchmarks.macro import sources
+from bvm.opcodes import OPCODE_NAMES, Opcode
+from bvm.parallel import ShardState
+from bvm.vm import BVM
+
+OPCODES = sorted(OPCODE_NAMES)
+
+
+def sample_programs():
+    """(name, bytecode) for every sample contract and benchmark loop"""
+    for name, compiler, source in sources():
+        bytecode, storage_map = quiet(compiler.compile, source)
+        yield name, bytes(bytecode)
+
+
+def random_program(rng):
+    """Random bytecode, mostly real opcodes, with a share of PUSH1 + JUMP/JUMPI"""
+    length = rng.randint(1, 60)
+    code = []
+    for _ in range(length):
+        r = rng.random()
+        if r < 0.35:
+            code += [Opcode.PUSH1, rng.choice([0, 1, 2, 3, 5, 7, rng.randint(0, 255)])]
+        elif r < 0.4:
+            code.append(rng.randint(0, 255))
+        elif r < 0.5:
+            code += [Opcode.PUSH1, rng.randint(0, length * 2), rng.choice([Opcode.JUMP, Opcode.JUMPI])]
+        else:
+            code.append(rng.choice(OPCODES))
+    return bytes(code)
+
+
+def random_programs(count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield random_program(rng), rng.choice([10, 50, 200, 1000, 6000, 30000, 10**6])
+
+
+def run(code, gas_limit, program_cache=None, **options):
+    """Run code in a fresh VM, decoding it with program_cache if given;
+    the result with plain containers, or the name of the Python
+    exception the run raised"""
+    vm = BVM(ShardState(), **options)
+    if program_cache is not None:
+        vm.program_cache = program_cache
+    try:
+        result = vm.execute(code, gas_limit, 'test')
+    except ArithmeticError as e:
+        return type(e).__name__
+    result['stack'] = list(result['stack'])
+    result['storage'] = dict(result['storage'])
+    return result
@@ -0,0 +1,33 @@
+# tests/test_benchmarks.py
+"""Baseline comparison: only instructions and gas fail a run"""
+from benchmarks.run import compare
+
+
+def report(quick=False, **stats):
+    entry = {'instructions': 100, 'gas': 300, 'instructions_per_sec': 1e6,
+             'gas_per_sec': 3e6, 'compile_ms': 1.0}
+    entry.update(stats)
+    return {'quick': quick, 'micro': {'interpreter/ADD': entry}, 'peak_rss_kb': 1000}
+
+
+def test_same_results_pass():
+    assert compare(report(), report(), 0.25) == ([], [])
+
+
+def test_changed_instructions_or_gas_fail():
+    problems, notes = compare(report(instructions=101, gas=303), report(), 0.25)
+    assert len(problems) == 2
+    assert notes == []
+
+
+def test_slower_timings_are_only_noted():
+    problems, notes = compare(report(instructions_per_sec=1e5, compile_ms=5.0), report(), 0.25)
+    assert problems == []
+    assert len(notes) == 2
+
+
+def test_timings_not_compared_across_modes():
+    problems, notes = compare(report(quick=True, instructions_per_sec=1e5), report(), 0.25)
+    assert (problems, notes) == ([], [])
+    problems, notes = compare(report(quick=True, gas=1), report(), 0.25)
+    assert len(problems) == 1
@@ -0,0 +1,120 @@
+# tests/test_cache.py
+"""AccountCache: LRU eviction, the byte bound, write-back and counters"""
+import sqlite3
+
+from state.cache import ACCOUNT_BYTES, SLOT_BYTES, AccountCache, account_bytes
+from state.sqlite import SqliteWorldState
+
+
+def empty_account():
+    return {'balance': 0, 'storage': {}, 'code': []}
+
+
+class Backing:
+    """Dict-backed load and store for an AccountCache"""
+
+    def __init__(self, addresses):
+        self.accounts = {address: empty_account() for address in addresses}
+        self.stored = []  # (address, slots, deleted) per write-back
+
+    def load(self, address):
+        account = self.accounts.get(address)
+        return None if account is None else dict(account, storage=dict(account['storage']))
+
+    def store(self, address, account, dirty):
+        self.stored.append((address, dict(dirty.slots), set(dirty.deleted)))
+
+
+def cache_of(addresses, accounts):
+    backing = Backing(addresses)
+    return backing, AccountCache(backing.load, backing.store, max_bytes=accounts * ACCOUNT_BYTES)
+
+
+def test_least_recently_used_is_evicted():
+    backing, cache = cache_of('abcd', 3)
+    for address in 'abc':
+        cache.get(address)
+    cache.get('a')
+    cache.get('d')  # evicts b, the least recently used
+    assert list(cache.accounts) == ['c', 'a', 'd']
+    cache.get('b')  # evicts c
+    assert cache.stats() == {
+        'accounts': 3, 'bytes': 3 * ACCOUNT_BYTES,
+        'hits': 1, 'misses': 5, 'evictions': 2, 'writebacks': 0,
+    }
+    assert backing.stored == []
+
+
+def test_missing_account_is_not_cached():
+    backing, cache = cache_of('a', 3)
+    assert cache.get('x') is None
+    assert 'x' not in cache
+    assert cache.misses == 1
+
+
+def test_dirty_account_is_written_back_on_eviction():
+    backing, cache = cache_of('abcd', 3)
+    account = cache.get('a')
+    account['storage'].update({1: 10, 2: 20})
+    cache.mark_slots('a', {1: 10, 2: 20}, deleted=[3])
+    # A later in-place write that was never marked is not written back
+    account['storage'][1] = 99
+    for address in 'bcd':
+        cache.get(address)
+    assert 'a' not in cache
+    assert backing.stored == [('a', {1: 10, 2: 20}, {3})]
+    assert cache.writebacks == 1
+    cache.flush()
+    assert len(backing.stored) == 1
+
+
+def test_flush_writes_back_every_dirty_account():
+    backing, cache = cache_of('abc', 3)
+    for address in 'ab':
+        cache.get(address)
+        cache.mark_slots(address, {0: address})
+    cache.flush()
+    assert sorted(backing.stored) == [('a', {0: 'a'}, set()), ('b', {0: 'b'}, set())]
+    assert cache.dirty == {}
+    assert cache.writebacks == 0
+
+
+def test_storage_growth_counts_against_the_bound():
+    backing, cache = cache_of('abc', 3)
+    for address in 'abc':
+        cache.get(address)
+    cache.get('c')['storage'].update({slot: slot for slot in range(12)})
+    cache.mark_slots('c', {slot: slot for slot in range(12)})
+    # c alone now fills the budget, so a and b are evicted
+    assert cache.bytes <= cache.max_bytes
+    assert list(cache.accounts) == ['c']
+    assert cache.bytes == ACCOUNT_BYTES + 12 * SLOT_BYTES
+
+
+def test_sqlite_state_larger_than_its_cache(tmp_path):
+    path = str(tmp_path / 'state.db')
+    budget = 4 * (ACCOUNT_BYTES + 2 * SLOT_BYTES)
+    state = SqliteWorldState(path, cache_bytes=budget)
+    with state.batch():
+        for i in range(40):
+            state.update_slots(f'c{i}', {0: i, 1: 2 * i})
+            cache = state.accounts
+            assert cache.bytes <= budget
+            assert cache.bytes == sum(account_bytes(account) for account in cache.accounts.values())
+        stats = state.cache_stats()
+        assert stats['accounts'] <= 4
+        assert stats['evictions'] == 40 - stats['accounts']
+        assert stats['writebacks'] == stats['evictions']
+        # Evicted accounts are in the open transaction before it commits
+        rows = state.db.execute("SELECT COUNT(*) FROM storage").fetchone()[0]
+        assert rows == 2 * stats['writebacks']
+    state.close()
+
+    db = sqlite3.connect(path)
+    assert db.execute("SELECT COUNT(*) FROM storage").fetchone()[0] == 80
+    db.close()
+    state = SqliteWorldState(path, cache_bytes=budget)
+    for i in range(40):
+        assert state.get_storage(f'c{i}') == {0: i, 1: 2 * i}
+    assert state.cache_stats()['misses'] == 40
+    state.close()
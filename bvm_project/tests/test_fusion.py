@@ -0,0 +1,142 @@
+# tests/test_fusion.py
+"""Superinstruction fusion must not change what compiled code does"""
+import sys
+
+import pytest
+
+from benchmarks.harness import quiet
+from benchmarks.macro import sources
+from bvm.decoder import decode
+from bvm.opcodes import Opcode
+from bvm.vm import DISPATCH_TABLE
+from compilers.csharp_compiler import CSharpCompiler
+from compilers.optimizer import fuse_superinstructions
+
+from .programs import run
+
+# The C# compiler has no loops, and no sample in contracts/
+CSHARP_SOURCE = """class Branch {
+    static void Main() {
+        int a = 7;
+        int b = a + 5;
+        if (b > 10) {
+            a = a + 1;
+        } else {
+            a = 0;
+        }
+        b = a + b;
+    }
+}
+"""
+
+SOURCES = list(sources()) + [('branch.cs', CSharpCompiler, CSHARP_SOURCE)]
+
+SUPERINSTRUCTIONS = {Opcode.SLOADI, Opcode.SSTOREI, Opcode.PUSHPUSHADD, Opcode.ISZEROJUMPI}
+
+ENGINES = (
+    ('reference', {'engine': 'reference'}),
+    ('table', {'jit_threshold': None}),
+    ('jit', {'jit_threshold': 0}),
+)
+
+
+def compiled(compiler, source, monkeypatch, fuse):
+    """Bytecode from compiler, with or without fusion"""
+    if not fuse:
+        module = sys.modules[compiler.__module__]
+        monkeypatch.setattr(module, 'fuse_superinstructions', lambda code: code)
+    bytecode, storage_map = quiet(compiler.compile, source)
+    monkeypatch.undo()
+    return bytes(bytecode)
+
+
+def instructions(code):
+    """(pc, opcode, arg) for each instruction from pc 0"""
+    program = decode(code, DISPATCH_TABLE)
+    pc = 0
+    while pc < len(code):
+        opcode, handler, arg, gas, next_pc, ends_block = program.instructions[pc]
+        yield pc, opcode, arg
+        pc = next_pc
+
+
+def jump_targets(code):
+    """Every destination the code's jumps name"""
+    targets = []
+    previous = None
+    for pc, opcode, arg in instructions(code):
+        if opcode in (Opcode.JUMP, Opcode.JUMPI) and previous[1] == Opcode.PUSH1:
+            targets.append(previous[2])
+        elif opcode == Opcode.ISZEROJUMPI:
+            targets.append(arg)
+        previous = (pc, opcode, arg)
+    return targets
+
+
+def assert_same(fused, unfused, options):
+    for gas_limit in (500000, 6000, 250):
+        expected = run(unfused, gas_limit, **options)
+        result = run(fused, gas_limit, **options)
+        if expected['success']:
+            assert result == expected, (fused.hex(), gas_limit)
+            continue
+        # A superinstruction runs out of gas before the PUSH1s at the
+        # start of the sequence it replaces have run, so a failed run
+        # may leave up to two PUSH1s' gas unspent
+        assert not result['success'], (fused.hex(), gas_limit)
+        assert result['storage'] == expected['storage']
+        assert 0 <= result['gas_remaining'] - expected['gas_remaining'] <= 2 * 3
+
+
+@pytest.mark.parametrize('name, compiler, source', SOURCES, ids=[name for name, _, _ in SOURCES])
+@pytest.mark.parametrize('arithmetic', ['unbounded', 'u256'])
+def test_fused_matches_unfused(name, compiler, source, arithmetic, monkeypatch):
+    fused = compiled(compiler, source, monkeypatch, fuse=True)
+    unfused = compiled(compiler, source, monkeypatch, fuse=False)
+    assert SUPERINSTRUCTIONS & set(fused)
+    assert not SUPERINSTRUCTIONS & {opcode for pc, opcode, arg in instructions(unfused)}
+    for engine, options in ENGINES:
+        assert_same(fused, unfused, dict(options, arithmetic=arithmetic))
+
+
+@pytest.mark.parametrize('name, compiler, source', SOURCES, ids=[name for name, _, _ in SOURCES])
+def test_jump_targets_are_relocated(name, compiler, source, monkeypatch):
+    fused = compiled(compiler, source, monkeypatch, fuse=True)
+    unfused = compiled(compiler, source, monkeypatch, fuse=False)
+    starts = {pc for pc, opcode, arg in instructions(fused)}
+    targets = jump_targets(fused)
+    assert len(targets) == len(jump_targets(unfused))
+    for target in targets:
+        assert target in starts and fused[target] == Opcode.JUMPDEST
+    assert fused.count(Opcode.JUMPDEST) == unfused.count(Opcode.JUMPDEST)
+
+
+def test_jump_target_is_never_fused():
+    # The jump lands on the SLOAD of PUSH1 0 SLOAD, which is not a
+    # JUMPDEST; fusing the pair would leave the target pointing at the
+    # JUMPDEST that follows in the shortened code
+    code = bytes([
+        Opcode.PUSH1, 5, Opcode.JUMP,
+        Opcode.PUSH1, 0, Opcode.SLOAD,
+        Opcode.JUMPDEST, Opcode.PUSH1, 1, Opcode.PUSH1, 0, Opcode.SSTORE, Opcode.STOP,
+    ])
+    fused = fuse_superinstructions(code)
+    assert fused[:6] == code[:6]
+    assert Opcode.SSTOREI in fused
+    result = run(fused, 100000)
+    assert result == run(code, 100000)
+    assert result['error'] == 'Invalid JUMP destination: 5'
+
+
+def test_fused_sequence_may_start_at_a_target():
+    code = bytes([
+        Opcode.PUSH1, 4, Opcode.JUMP, Opcode.STOP,
+        Opcode.JUMPDEST, Opcode.PUSH1, 2, Opcode.PUSH1, 3, Opcode.ADD,
+        Opcode.PUSH1, 0, Opcode.SSTORE, Opcode.STOP,
+    ])
+    fused = fuse_superinstructions(code)
+    assert fused == bytes([
+        Opcode.PUSH1, 4, Opcode.JUMP, Opcode.STOP,
+        Opcode.JUMPDEST, Opcode.PUSHPUSHADD, 2, 3, Opcode.SSTOREI, 0, Opcode.STOP,
+    ])
+    assert run(fused, 100000)['storage'] == run(code, 100000)['storage'] == {0: 5}
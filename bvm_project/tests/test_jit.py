@@ -0,0 +1,82 @@
+# tests/test_jit.py
+"""The JIT tier must be indistinguishable from the interpreters"""
+import pytest
+
+from bvm.opcodes import Opcode
+from bvm.vm import BVM, JIT_CACHE, PROGRAM_CACHE
+
+from .programs import random_programs, run, sample_programs
+
+ENGINES = (
+    ('reference', {'engine': 'reference'}),
+    ('table', {'jit_threshold': None}),
+    ('jit', {'jit_threshold': 0}),
+)
+
+
+def assert_same(code, gas_limit):
+    results = {name: run(code, gas_limit, **options) for name, options in ENGINES}
+    assert results['table'] == results['reference'], code.hex()
+    assert results['jit'] == results['reference'], code.hex()
+    return results['jit']
+
+
+def compiled_block(code, entry):
+    return JIT_CACHE.get(PROGRAM_CACHE.get(code), 0).blocks[entry]
+
+
+@pytest.mark.parametrize('name, code', list(sample_programs()))
+@pytest.mark.parametrize('gas_limit', [500000, 6000, 250])
+def test_samples(name, code, gas_limit):
+    assert_same(code, gas_limit)
+
+
+def test_random_programs():
+    for code, gas_limit in random_programs(1000, seed=1):
+        assert_same(code, gas_limit)
+
+
+def test_fault_mid_block_refunds_rest_of_block():
+    # The compiled block needs one more stack item than there is, so it is
+    # handed to the interpreter, which charges the block's static gas on
+    # entry and gives back the part after the faulting ADD
+    code = bytes([Opcode.PUSH1, 1, Opcode.PUSH1, 2, Opcode.ADD, Opcode.ADD,
+                  Opcode.PUSH1, 5, Opcode.STOP])
+    assert compiled_block(code, 0) is not None
+    result = assert_same(code, 1000)
+    assert not result['success']
+    assert result['pc'] == 6
+    assert result['opcode'] == 'ADD'
+    assert result['gas_remaining'] == 1000 - 2 * 3 - 2 * 3
+
+
+def test_memory_out_of_gas():
+    # A compiled block's memory expansion runs out of gas; the MSTORE
+    # pays its static gas, not the expansion
+    code = bytes([
+        Opcode.PUSH1, 1, Opcode.PUSH1, 250, Opcode.PUSH1, 250, Opcode.MUL,
+        Opcode.PUSH1, 250, Opcode.MUL, Opcode.MSTORE,
+        Opcode.PUSH1, 1, Opcode.PUSH1, 2, Opcode.ADD, Opcode.STOP,
+    ])
+    assert compiled_block(code, 0) is not None
+    result = assert_same(code, 5000)
+    assert not result['success']
+    assert result['pc'] == 11
+    assert result['opcode'] == 'MSTORE'
+    assert result['gas_remaining'] == 5000 - 4 * 3 - 2 * 5 - 3
+
+
+def test_stack_overflow_in_compiled_block():
+    # Each pass through the loop block grows the stack by 2 until the
+    # second DUP1 of a pass overflows it
+    code = bytes([
+        Opcode.PUSH1, 1,
+        Opcode.JUMPDEST, Opcode.DUP1, Opcode.DUP1,
+        Opcode.PUSH1, 2, Opcode.JUMP,
+    ])
+    assert compiled_block(code, 2) is not None
+    result = assert_same(code, 10**6)
+    assert not result['success']
+    assert result['opcode'] == 'DUP1'
+    assert result['pc'] == 5
+    assert len(result['stack']) == BVM.MAX_STACK_DEPTH
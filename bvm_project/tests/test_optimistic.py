@@ -0,0 +1,100 @@
+# tests/test_optimistic.py
+"""OptimisticExecutor must commit what serial execution commits"""
+import random
+
+import pytest
+
+from bvm.opcodes import Opcode
+from bvm.optimistic import OptimisticExecutor
+from bvm.vm import BVM
+from state.world_state import WorldState
+
+GAS = 100000
+
+
+def store(value, slot):
+    return [Opcode.PUSH1, value, Opcode.PUSH1, slot, Opcode.SSTORE]
+
+
+# slot 0 = 5
+WRITE = bytes(store(5, 0) + [Opcode.STOP])
+# slot 1 = slot 0
+COPY = bytes([Opcode.PUSH1, 0, Opcode.SLOAD, Opcode.PUSH1, 1, Opcode.SSTORE, Opcode.STOP])
+# slot 0 = slot 0 + 1
+INCREMENT = bytes([Opcode.PUSH1, 0, Opcode.SLOAD, Opcode.PUSH1, 1, Opcode.ADD,
+                   Opcode.PUSH1, 0, Opcode.SSTORE, Opcode.STOP])
+# slot 0 = 9, then a stack underflow
+FAIL = bytes(store(9, 0) + [Opcode.ADD])
+# if slot 0: slot 1 = 1 else: slot 2 = 1
+BRANCH = bytes(
+    [Opcode.PUSH1, 0, Opcode.SLOAD, Opcode.PUSH1, 12, Opcode.JUMPI]
+    + store(1, 2) + [Opcode.STOP]
+    + [Opcode.JUMPDEST] + store(1, 1) + [Opcode.STOP]
+)
+
+
+def world_state(tmp_path, name):
+    path = tmp_path / name
+    if path.exists():
+        path.unlink()
+    state = WorldState(str(path))
+    state.update_slots('a', {0: 0, 3: 7})
+    return state
+
+
+def storages(state):
+    return {address: dict(account['storage']) for address, account in state.accounts.items()}
+
+
+def execute(tmp_path, jobs, workers=2):
+    """Run jobs serially and optimistically; returns the executor"""
+    serial = world_state(tmp_path, 'serial.json')
+    expected = BVM(serial).execute_batch(jobs)
+    state = world_state(tmp_path, 'optimistic.json')
+    with OptimisticExecutor(state, workers=workers) as executor:
+        assert executor.execute(jobs) == expected
+    assert storages(state) == storages(serial)
+    return executor, state
+
+
+def test_read_after_write_is_executed_again(tmp_path):
+    # The two land in different chunks, so COPY first reads the base state
+    executor, state = execute(tmp_path, [(WRITE, 'a', GAS), (COPY, 'a', GAS)])
+    assert state.get_storage('a')[1] == 5
+    assert executor.rounds == 2
+    assert executor.executions == 3
+
+
+def test_same_chunk_sees_earlier_writes(tmp_path):
+    executor, state = execute(tmp_path, [(WRITE, 'a', GAS), (COPY, 'a', GAS)], workers=1)
+    assert executor.rounds == 1
+    assert executor.executions == 2
+
+
+def test_failed_transaction_writes_nothing(tmp_path):
+    jobs = [(FAIL, 'a', GAS), (COPY, 'a', GAS), (WRITE, 'a', GAS), (FAIL, 'a', GAS), (COPY, 'a', GAS)]
+    executor, state = execute(tmp_path, jobs, workers=5)
+    assert state.get_storage('a')[0] == 5
+
+
+def test_aborted_transaction_changes_its_writes(tmp_path):
+    # BRANCH first sees slot 0 == 0 and writes slot 2; once WRITE is
+    # recorded it is invalidated and its new incarnation writes slot 1
+    executor, state = execute(tmp_path, [(WRITE, 'a', GAS), (BRANCH, 'a', GAS)])
+    assert executor.rounds == 2
+    assert state.get_storage('a') == {0: 5, 1: 1, 3: 7}
+
+
+def test_chain_of_increments(tmp_path):
+    executor, state = execute(tmp_path, [(INCREMENT, 'a', GAS)] * 8, workers=4)
+    assert state.get_storage('a')[0] == 8
+    assert executor.rounds > 1
+
+
+@pytest.mark.parametrize('workers', [1, 2, 3])
+def test_random_blocks(tmp_path, workers):
+    rng = random.Random(workers)
+    programs = [WRITE, COPY, INCREMENT, FAIL, BRANCH]
+    for _ in range(10):
+        jobs = [(rng.choice(programs), rng.choice('ab'), rng.choice([GAS, 10])) for _ in range(rng.randint(0, 12))]
+        execute(tmp_path, jobs, workers)
@@ -0,0 +1,118 @@
+# tests/test_resume.py
+"""Resumable execution must match execute() however it is sliced"""
+import pytest
+
+from bvm.opcodes import Opcode
+from bvm.parallel import ShardState
+from bvm.vm import BVM
+
+from .programs import random_programs, run, sample_programs
+
+SAMPLES = list(sample_programs())
+
+# slot 0 = 5, then a loop of 50 iterations, then slot 1 = 6
+SLOW_WRITE = bytes([
+    Opcode.PUSH1, 5, Opcode.PUSH1, 0, Opcode.SSTORE,
+    Opcode.PUSH1, 50,
+    Opcode.JUMPDEST, Opcode.PUSH1, 1, Opcode.SUB,
+    Opcode.DUP1, Opcode.PUSH1, 7, Opcode.JUMPI,
+    Opcode.POP, Opcode.PUSH1, 6, Opcode.PUSH1, 1, Opcode.SSTORE, Opcode.STOP,
+])
+# slot 2 = slot 0
+COPY = bytes([Opcode.PUSH1, 0, Opcode.SLOAD, Opcode.PUSH1, 2, Opcode.SSTORE, Opcode.STOP])
+# slot 0 = 5, slot 1 = 6, then a stack underflow
+FAIL = bytes([Opcode.PUSH1, 5, Opcode.PUSH1, 0, Opcode.SSTORE,
+              Opcode.PUSH1, 6, Opcode.PUSH1, 1, Opcode.SSTORE, Opcode.ADD])
+
+
+def resumed(code, gas_limit, jit_threshold=None, **slice_limits):
+    """(result, gas used, committed storage, slices) of a sliced run"""
+    state = ShardState()
+    state.update_slots('test', {0: 1, 9: 9})
+    vm = BVM(state, jit_threshold=jit_threshold)
+    execution = vm.start(code, gas_limit, 'test')
+    slices = 1
+    while not vm.resume(execution, **slice_limits):
+        slices += 1
+    result = dict(execution.result, stack=list(execution.result['stack']),
+                  storage=dict(execution.result['storage']))
+    return result, execution.gas_used, dict(state.get_storage('test')), slices
+
+
+def executed(code, gas_limit):
+    state = ShardState()
+    state.update_slots('test', {0: 1, 9: 9})
+    result = BVM(state, jit_threshold=None).execute(code, gas_limit, 'test')
+    result = dict(result, stack=list(result['stack']), storage=dict(result['storage']))
+    return result, gas_limit - result['gas_remaining'], dict(state.get_storage('test'))
+
+
+def programs():
+    jobs = [(code, gas_limit) for name, code in SAMPLES for gas_limit in (500000, 6000, 250)]
+    jobs += [(code, gas_limit) for code, gas_limit in random_programs(300, seed=3)
+             if isinstance(run(code, gas_limit), dict)]
+    return jobs + [(SLOW_WRITE, 10**6), (FAIL, 10**6)]
+
+
+@pytest.mark.parametrize('jit_threshold', [None, 0])
+@pytest.mark.parametrize('slice_limits', [
+    {'max_steps': 1}, {'max_steps': 7}, {'max_gas': 1}, {'max_gas': 40},
+    {'max_steps': 3, 'max_gas': 20}, {'max_steps': 1000}, {},
+])
+def test_slices_match_execute(slice_limits, jit_threshold):
+    for code, gas_limit in programs():
+        result, gas_used, storage, slices = resumed(code, gas_limit, jit_threshold, **slice_limits)
+        assert (result, gas_used, storage) == executed(code, gas_limit), code.hex()
+
+
+def test_steps_count_instructions():
+    state = ShardState()
+    vm = BVM(state, jit_threshold=0)
+    execution = vm.start(SLOW_WRITE, 10**6, 'test')
+    assert execution.compiled is not None
+    while not vm.resume(execution, max_steps=50):
+        pass
+    assert execution.steps == 4 + 50 * 6 + 5
+
+
+def test_one_step_per_slice():
+    result, gas_used, storage, slices = resumed(SLOW_WRITE, 10**6, max_steps=1)
+    assert result['success']
+    # 4 instructions before the loop, 6 per pass (JUMPDEST included), 5 after it
+    assert slices == 4 + 50 * 6 + 5
+    assert storage == {0: 5, 1: 6, 9: 9}
+
+
+def test_failed_run_commits_nothing():
+    state = ShardState()
+    state.update_slots('test', {0: 1})
+    vm = BVM(state)
+    execution = vm.start(FAIL, 10**6, 'test')
+    assert not vm.resume(execution, max_steps=4)
+    assert execution.pending_writes == {0: 5}
+    while not vm.resume(execution, max_steps=1):
+        pass
+    assert not execution.result['success']
+    assert execution.pending_writes == {}
+    assert state.get_storage('test') == {0: 1}
+    assert state.changes == {'test': ({0: 1}, set())}
+
+
+def test_interleaved_runs_do_not_see_pending_writes():
+    state = ShardState()
+    vm = BVM(state)
+    writer = vm.start(SLOW_WRITE, 10**6, 'test')
+    assert not vm.resume(writer, max_steps=10)
+    assert writer.pending_writes == {0: 5}
+    # The copy runs to the end while the write is still pending
+    reader = vm.start(COPY, 10**6, 'test')
+    assert vm.resume(reader)
+    assert state.get_storage('test') == {2: 0}
+    while not vm.resume(writer, max_steps=10):
+        assert state.get_storage('test') == {2: 0}
+    assert writer.result['success']
+    assert state.get_storage('test') == {0: 5, 1: 6, 2: 0}
+    # A run started now sees the committed write
+    reader = vm.start(COPY, 10**6, 'test')
+    assert vm.resume(reader)
+    assert state.get_storage('test')[2] == 5
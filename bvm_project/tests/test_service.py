@@ -0,0 +1,103 @@
+# tests/test_service.py
+"""Execution service requests over a Unix socket"""
+import asyncio
+import json
+
+from service import ExecutionService
+from state.world_state import WorldState
+
+# x = x + 1, then a loop long enough to take many slices
+COUNTER = "x = x + 1\ni = 0\nwhile i < 20:\n    i = i + 1\n"
+
+
+def serve(tmp_path, requests, slice_steps=5, lines=()):
+    """Send requests (and raw lines) on one connection; returns the
+    responses in the order they arrived, and the world state"""
+    world_state = WorldState(str(tmp_path / 'state.json'))
+    service = ExecutionService(world_state, workers=0, slice_steps=slice_steps)
+    path = str(tmp_path / 'bvm.sock')
+
+    async def session():
+        server = await asyncio.start_unix_server(service.connection, path=path)
+        async with server:
+            reader, writer = await asyncio.open_unix_connection(path)
+            for request in requests:
+                writer.write(json.dumps(request).encode('utf-8') + b'\n')
+            for line in lines:
+                writer.write(line + b'\n')
+            await writer.drain()
+            responses = [json.loads(await reader.readline())
+                         for _ in range(len(requests) + len(lines))]
+            writer.close()
+            await writer.wait_closed()
+            # Let the server see the end of the stream
+            await asyncio.sleep(0.01)
+            return responses
+
+    try:
+        return asyncio.run(session()), world_state
+    finally:
+        service.close()
+
+
+def by_id(responses):
+    return {response.get('id'): response for response in responses}
+
+
+def test_deploy_and_execute(tmp_path):
+    responses, world_state = serve(tmp_path, [
+        {'id': 1, 'op': 'ping'},
+        {'id': 2, 'op': 'compile', 'language': 'py', 'source': 'a = 5\n'},
+        {'id': 3, 'op': 'deploy', 'address': 'c1', 'language': 'py', 'source': 'a = 5\nb = a + 1\n'},
+    ])
+    responses = by_id(responses)
+    assert responses[1] == {'ok': True, 'id': 1}
+    assert responses[2]['ok'] and responses[2]['storage_map'] == {'a': 0}
+    deploy = responses[3]
+    assert deploy['ok'] and deploy['verified'] is True
+    assert world_state.get_contract_code('c1') == bytes.fromhex(deploy['bytecode'])
+
+    responses, world_state = serve(tmp_path, [
+        {'id': 4, 'op': 'execute', 'address': 'c1', 'gas_limit': 100000},
+        {'id': 5, 'op': 'deploy', 'address': 'c2', 'bytecode': '6005b10000'},
+    ])
+    responses = by_id(responses)
+    assert responses[4]['ok'] and responses[4]['success']
+    assert responses[4]['storage'] == {'0': 5, '1': 6}
+    assert responses[4]['gas_used'] > 0
+    assert responses[5]['ok'] and responses[5]['bytecode'] == '6005b10000'
+    assert world_state.get_storage('c1') == {0: 5, 1: 6}
+
+
+def test_error_responses(tmp_path):
+    responses, world_state = serve(tmp_path, [
+        {'id': 1, 'op': 'bogus'},
+        {'id': 2, 'op': 'execute', 'address': 'nowhere'},
+        {'id': 3, 'op': 'compile', 'language': 'cobol', 'source': ''},
+        {'id': 4, 'op': 'deploy', 'address': 'c1', 'bytecode': '600101'},
+        {'id': 5, 'op': 'execute', 'address': 'c1'},
+    ], lines=[b'not json'])
+    bad_line = [response for response in responses if 'id' not in response]
+    assert len(bad_line) == 1 and bad_line[0]['error'].startswith('Bad request')
+    responses = by_id(responses)
+    assert responses[1] == {'ok': False, 'id': 1, 'error': 'ValueError: Unknown op: bogus'}
+    assert responses[2]['error'] == 'ValueError: No code deployed at nowhere'
+    assert responses[3]['error'] == 'ValueError: Unknown language: cobol'
+    # A failed execution is a successful request
+    assert responses[5]['ok'] and not responses[5]['success']
+    assert 'error' in responses[5]
+
+
+def test_same_address_runs_are_serialized(tmp_path):
+    deploy = {'id': 0, 'op': 'deploy', 'address': 'a', 'language': 'py', 'source': COUNTER}
+    serve(tmp_path, [deploy, dict(deploy, id=1, address='b')])
+    requests = [{'id': i, 'op': 'execute', 'address': 'a', 'gas_limit': 10**6} for i in range(1, 6)]
+    requests.append({'id': 6, 'op': 'execute', 'address': 'b', 'gas_limit': 10**6})
+    responses, world_state = serve(tmp_path, requests)
+    order = [response['id'] for response in responses]
+    responses = by_id(responses)
+    # Each run on 'a' saw the one before it commit, in request order
+    assert [responses[i]['storage']['0'] for i in range(1, 6)] == [1, 2, 3, 4, 5]
+    assert world_state.get_storage('a')[0] == 5
+    # 'b' was time-sliced alongside, not queued behind 'a'
+    assert order.index(6) < order.index(2)
@@ -0,0 +1,122 @@
+# tests/test_sqlite.py
+"""SQLite world state: slot round trips, batch commits and reopening"""
+import os
+import sqlite3
+import subprocess
+import sys
+
+from bvm.opcodes import Opcode
+from state.cache import ACCOUNT_BYTES
+from state.sqlite import SqliteWorldState
+
+CODE = bytes([Opcode.PUSH1, 1, Opcode.PUSH1, 0, Opcode.SSTORE, Opcode.STOP])
+BIG = 1 << 200
+
+
+def rows(path):
+    """Storage rows as another connection sees them"""
+    db = sqlite3.connect(path)
+    try:
+        return sorted(db.execute("SELECT address, slot, value FROM storage"))
+    finally:
+        db.close()
+
+
+def test_update_slots_round_trip(tmp_path):
+    path = str(tmp_path / 'state.db')
+    state = SqliteWorldState(path)
+    state.update_slots('a', {0: 1, 1: 2, 2: 3, BIG: -BIG, 5: BIG})
+    state.update_slots('a', {1: 20, 6: 60}, deleted=[0, BIG, 99])
+    expected = {1: 20, 2: 3, 5: BIG, 6: 60}
+    assert state.get_storage('a') == expected
+    state.close()
+
+    assert rows(path) == [('a', 1, 20), ('a', 2, 3), ('a', 5, str(BIG)), ('a', 6, 60)]
+    state = SqliteWorldState(path)
+    assert state.get_storage('a') == expected
+    state.update_slots('a', {}, deleted=list(expected))
+    state.close()
+    assert rows(path) == []
+    state = SqliteWorldState(path)
+    assert state.get_storage('a') == {}
+    assert state.get_storage('nowhere') == {}
+    state.close()
+
+
+def test_update_storage_replaces_every_slot(tmp_path):
+    path = str(tmp_path / 'state.db')
+    state = SqliteWorldState(path)
+    state.update_slots('a', {0: 1, 1: 2})
+    state.update_storage('a', {'2': 3})
+    state.close()
+    assert rows(path) == [('a', 2, 3)]
+
+
+def test_code_survives_reopening(tmp_path):
+    path = str(tmp_path / 'state.db')
+    state = SqliteWorldState(path)
+    state.set_contract_code('a', CODE)
+    state.set_contract_code('b', bytes([Opcode.ADD]))
+    state.create_account('c')
+    state.close()
+    state = SqliteWorldState(path)
+    assert state.get_contract_code('a') == CODE
+    assert state.accounts['a']['verified'] is True
+    assert state.accounts['b']['verified'] is False
+    assert state.get_contract_code('c') == b''
+    assert state.get_contract_code('nowhere') == b''
+    state.close()
+
+
+def test_batch_commits_once_at_the_end(tmp_path):
+    path = str(tmp_path / 'state.db')
+    state = SqliteWorldState(path)
+    state.update_slots('a', {0: 1})
+    with state.batch():
+        state.update_slots('a', {0: 2})
+        with state.batch():
+            state.update_slots('b', {0: 3})
+        # Nothing is written until the outermost batch ends
+        assert rows(path) == [('a', 0, 1)]
+        assert not state.db.in_transaction
+    assert rows(path) == [('a', 0, 2), ('b', 0, 3)]
+    state.flush()
+    with state.batch():
+        state.update_slots('a', {1: 4})
+        state.flush()
+        assert rows(path) == [('a', 0, 2), ('a', 1, 4), ('b', 0, 3)]
+    state.close()
+
+
+# Fills a batch past the cache so evicted accounts are written into its
+# transaction, then dies before the batch commits
+CRASH = """
+import os, sqlite3, sys
+from state.sqlite import SqliteWorldState
+path, cache_bytes = sys.argv[1], int(sys.argv[2])
+state = SqliteWorldState(path, cache_bytes=cache_bytes)
+with state.batch():
+    for i in range(10):
+        state.update_slots(f'c{i}', {0: i})
+    state.update_slots('a', {0: 2}, deleted=[0])
+    assert state.cache_stats()['writebacks'] > 0 and state.db.in_transaction
+    other = sqlite3.connect(path)
+    assert other.execute("SELECT COUNT(*) FROM storage").fetchone()[0] == 1
+    os._exit(0)
+"""
+
+
+def test_uncommitted_batch_is_rolled_back(tmp_path):
+    path = str(tmp_path / 'state.db')
+    state = SqliteWorldState(path)
+    state.update_slots('a', {0: 1})
+    state.close()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    crash = subprocess.run([sys.executable, '-c', CRASH, path, str(2 * ACCOUNT_BYTES)], cwd=root)
+    assert crash.returncode == 0
+    state = SqliteWorldState(path)
+    assert state.get_storage('a') == {0: 1}
+    assert state.get_storage('c0') == {}
+    assert 'c0' not in state.accounts
+    state.close()
+    assert rows(path) == [('a', 0, 1)]
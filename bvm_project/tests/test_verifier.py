@@ -0,0 +1,100 @@
+# tests/test_verifier.py
+"""Static stack verification, and running verified code unchecked"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bvm.decoder import ProgramCache, decode
+from bvm.opcodes import Opcode
+from bvm.verifier import verify_stack
+from bvm.vm import (
+    DISPATCH_TABLE, UNCHECKED_DISPATCH_TABLE,
+    U256_DISPATCH_TABLE, U256_UNCHECKED_DISPATCH_TABLE,
+    PROGRAM_CACHE, U256_PROGRAM_CACHE,
+)
+from state.world_state import WorldState
+
+from .programs import random_programs, run, sample_programs
+
+SAMPLES = list(sample_programs())
+
+TABLES = {
+    'unbounded': (DISPATCH_TABLE, UNCHECKED_DISPATCH_TABLE),
+    'u256': (U256_DISPATCH_TABLE, U256_UNCHECKED_DISPATCH_TABLE),
+}
+
+
+def verifies(code):
+    return verify_stack(decode(bytes(code), DISPATCH_TABLE))
+
+
+@pytest.mark.parametrize('name, code', SAMPLES)
+def test_accepts_samples(name, code):
+    assert verifies(code)
+
+
+def test_rejects_underflow():
+    assert not verifies([Opcode.PUSH1, 1, Opcode.ADD, Opcode.STOP])
+
+
+def test_rejects_overflow():
+    assert verifies([Opcode.PUSH1, 1] * 1024)
+    assert not verifies([Opcode.PUSH1, 1] * 1025)
+
+
+def test_rejects_inconsistent_join_heights():
+    # The jump reaches the JUMPDEST with an empty stack, the fall-through
+    # with one item
+    assert not verifies([
+        Opcode.PUSH1, 0, Opcode.PUSH1, 7, Opcode.JUMPI,
+        Opcode.PUSH1, 9,
+        Opcode.JUMPDEST, Opcode.STOP,
+    ])
+
+
+def test_rejects_growing_loop():
+    assert not verifies([Opcode.PUSH1, 1, Opcode.JUMPDEST, Opcode.DUP1,
+                         Opcode.PUSH1, 2, Opcode.JUMP])
+
+
+def test_rejects_dynamic_jump():
+    # The destination comes from storage, so it cannot be checked
+    assert not verifies([Opcode.PUSH1, 0, Opcode.SLOAD, Opcode.JUMP,
+                         Opcode.JUMPDEST, Opcode.STOP])
+
+
+@pytest.mark.parametrize('arithmetic', sorted(TABLES))
+def test_unchecked_tables_match_checked(arithmetic):
+    checked_table, unchecked_table = TABLES[arithmetic]
+    checked = ProgramCache(checked_table)
+    unchecked = ProgramCache(checked_table, unchecked_table, verified=set())
+    jobs = [(code, gas_limit) for name, code in SAMPLES for gas_limit in (500000, 6000, 250)]
+    jobs += [job for job in random_programs(2000, seed=2) if unchecked.verify(job[0])]
+    assert len(jobs) > 300
+    for code, gas_limit in jobs:
+        assert unchecked.verify(code)
+        assert unchecked.get(code).verified
+        options = {'arithmetic': arithmetic, 'jit_threshold': None}
+        assert (run(code, gas_limit, unchecked, **options)
+                == run(code, gas_limit, checked, **options)), code.hex()
+
+
+def test_deployed_code_runs_unchecked_in_both_modes(tmp_path):
+    code = bytes([Opcode.PUSH1, 3, Opcode.PUSH1, 4, Opcode.ADD, Opcode.PUSH1, 0,
+                  Opcode.SSTORE, Opcode.STOP, Opcode.JUMPDEST])
+    assert not PROGRAM_CACHE.get(code).verified
+    state = WorldState(str(tmp_path / 'state.json'))
+    state.set_contract_code('a', code)
+    assert state.accounts['a']['verified']
+    assert PROGRAM_CACHE.get(code).verified
+    assert U256_PROGRAM_CACHE.get(code).verified
+    state.set_contract_code('b', [Opcode.ADD])
+    assert not state.accounts['b']['verified']
+
+
+def test_world_state_does_not_import_the_vm():
+    check = "import sys, state.world_state; sys.exit('bvm.vm' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, '-c', check], cwd=root).returncode == 0
@@ -0,0 +1,124 @@
+# tests/test_wal.py
+"""Write-ahead log world state: recovery and log growth"""
+import os
+
+import pytest
+
+from state.wal import WalWorldState
+
+
+def open_state(path):
+    return WalWorldState(str(path), fsync=False)
+
+
+def populated(path):
+    """A state with a snapshot and a log of later commits, closed"""
+    state = open_state(path)
+    state.set_contract_code('a', bytes([0x60, 1, 0x00]))
+    state.update_slots('a', {0: 1, 1: 2})
+    state.compact(wait=True)
+    with state.batch():
+        state.update_slots('a', {0: 10}, deleted=[1])
+        state.update_slots('b', {5: 50})
+    state.close()
+
+
+EXPECTED = {'a': {0: 10}, 'b': {5: 50}}
+
+
+def storages(state):
+    return {address: dict(account['storage']) for address, account in state.accounts.items()}
+
+
+def test_reopen_restores_accounts(tmp_path):
+    path = tmp_path / 'state.json'
+    populated(path)
+    state = open_state(path)
+    assert storages(state) == EXPECTED
+    assert state.get_contract_code('a') == bytes([0x60, 1, 0x00])
+    state.close()
+
+
+def test_torn_last_record_is_dropped(tmp_path):
+    path = tmp_path / 'state.json'
+    populated(path)
+    log = str(path) + '.wal'
+    size = os.path.getsize(log)
+    with open(log, 'ab') as f:
+        f.write(b'[["s","a",{"0":99')
+    state = open_state(path)
+    assert storages(state) == EXPECTED
+    assert os.path.getsize(log) == size
+    # Commits after recovery follow the last whole record
+    state.update_slots('a', {2: 3})
+    state.close()
+    state = open_state(path)
+    assert storages(state) == {'a': {0: 10, 2: 3}, 'b': {5: 50}}
+    state.close()
+
+
+def test_interrupted_compaction_is_finished(tmp_path):
+    # The log was rotated to .wal.old but no snapshot was written
+    path = tmp_path / 'state.json'
+    populated(path)
+    log = str(path) + '.wal'
+    os.replace(log, log + '.old')
+    state = open_state(path)
+    assert storages(state) == EXPECTED
+    assert not os.path.exists(log + '.old')
+    assert os.path.getsize(log) == 0
+    state.close()
+    state = open_state(path)
+    assert storages(state) == EXPECTED
+    state.close()
+
+
+def test_old_log_replayed_over_newer_snapshot(tmp_path):
+    # Compaction wrote its snapshot but died before removing .wal.old,
+    # and later commits went to the new log
+    path = tmp_path / 'state.json'
+    state = open_state(path)
+    state.update_slots('a', {0: 1, 1: 1})
+    state.update_slots('a', {0: 2})
+    log = str(path) + '.wal'
+    with open(log, 'rb') as f:
+        old_log = f.read()
+    state.compact(wait=True)
+    state.update_slots('a', {0: 3}, deleted=[1])
+    state.close()
+    with open(log + '.old', 'wb') as f:
+        f.write(old_log)
+    state = open_state(path)
+    assert storages(state) == {'a': {0: 3}}
+    state.close()
+
+
+def test_corrupt_record_before_the_end_is_an_error(tmp_path):
+    path = tmp_path / 'state.json'
+    populated(path)
+    log = str(path) + '.wal'
+    with open(log, 'rb') as f:
+        data = f.read()
+    with open(log, 'wb') as f:
+        f.write(b'not json\n' + data)
+    with pytest.raises(ValueError, match='Corrupt'):
+        open_state(path)
+
+
+def log_growth(path, slots):
+    """Bytes one single-slot commit adds to the log of a state holding slots"""
+    state = open_state(path)
+    state.update_slots('a', {slot: slot for slot in range(slots)})
+    state.compact(wait=True)
+    before = os.path.getsize(str(path) + '.wal')
+    state.update_slots('a', {0: 12345})
+    after = os.path.getsize(str(path) + '.wal')
+    state.close()
+    return after - before
+
+
+def test_log_grows_with_the_change_not_the_state(tmp_path):
+    small = log_growth(tmp_path / 'small.json', 10)
+    large = log_growth(tmp_path / 'large.json', 10000)
+    assert small == large
+    assert large < 100